@@ -0,0 +1,102 @@
+"""
+Benchmarks fetching the price of many assets with and without a pooled (keep-alive) HTTP session, against a local
+HTTP stub that mimics the Avanza API.
+
+Without pooling, every request opens a new connection (as the module-level `requests.get` does). With pooling,
+connections are reused between requests. The stub is plain HTTP on localhost, so only the TCP handshake is saved:
+against the real APIs, each new connection also pays a TLS handshake and a network round trip.
+
+Usage:
+    python benchmarks/http_session_pooling.py [--assets 50] [--latency 0.005] [--runs 3]
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import requests
+
+os.environ.setdefault("CMC_API_KEY", "benchmark")
+
+from investmentstk.data_feeds.avanza_feed import AvanzaFeed  # noqa: E402
+from investmentstk.models.source import Source, source_limiter  # noqa: E402
+from investmentstk.utils.concurrency import map_concurrently  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Supports keep-alive
+    disable_nagle_algorithm = True  # Otherwise, headers and body written separately wait for delayed ACKs
+    latency: float = 0.005
+    connections: set = set()
+
+    def do_GET(self):
+        StubHandler.connections.add(self.client_address)
+        time.sleep(self.latency)
+
+        body = json.dumps(dict(lastPrice=100.0, change=1.0, changePercent=1.0, tickerSymbol="STUB")).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def fetch_prices(assets: int) -> float:
+    start = time.perf_counter()
+
+    futures = map_concurrently(
+        lambda source_id: AvanzaFeed().retrieve_price(source_id),
+        [str(index) for index in range(assets)],
+        key=lambda source_id: Source.Avanza,
+        limiter=source_limiter,
+    )
+
+    for future in futures:
+        future.result()
+
+    return time.perf_counter() - start
+
+
+def measure(assets: int, runs: int) -> tuple[float, int]:
+    StubHandler.connections = set()
+    best = min(fetch_prices(assets) for _ in range(runs))
+
+    return best, len(StubHandler.connections)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated server latency per request, in seconds")
+    parser.add_argument("--runs", type=int, default=3, help="best of N runs")
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    AvanzaFeed.BASE_URL = f"http://127.0.0.1:{server.server_port}"
+
+    pooled_time, pooled_connections = measure(args.assets, args.runs)
+
+    # Same as before the shared sessions: a new connection per request
+    AvanzaFeed._http_session = lambda self, cached=False: SimpleNamespace(get=requests.get)  # type: ignore
+    unpooled_time, unpooled_connections = measure(args.assets, args.runs)
+
+    server.shutdown()
+
+    print(f"Assets: {args.assets}, latency per request: {args.latency}s, best of {args.runs} runs")
+    print(f"{'':>10} {'time (s)':>10} {'connections':>12}")
+    print(f"{'unpooled':>10} {unpooled_time:>10.3f} {unpooled_connections:>12}")
+    print(f"{'pooled':>10} {pooled_time:>10.3f} {pooled_connections:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Micro-benchmark of the conversion of data feed responses into OHLC dataframes: the previous path (one `Bar` per
+row, a set and then a dataframe) against the columnar one (the whole response at once).
+
+Usage:
+    python benchmarks/ohlc_parsing.py [--bars 5000] [--runs 5]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("CMC_API_KEY", "benchmark")
+
+from investmentstk.data_feeds.avanza_feed import AvanzaFeed  # noqa: E402
+from investmentstk.data_feeds.cmc_feed import CMCFeed  # noqa: E402
+from investmentstk.data_feeds.data_feed import TimeResolution  # noqa: E402
+from investmentstk.models.bar import Bar  # noqa: E402
+from investmentstk.data_feeds.kraken_feed import KrakenFeed  # noqa: E402
+from investmentstk.models.barset import barset_to_ohlc_dataframe  # noqa: E402
+
+
+def random_prices(bars: int) -> np.ndarray:
+    random = np.random.default_rng(42)
+    return np.round(100 + np.cumsum(random.normal(0, 1, bars)), 2)
+
+
+def avanza_payload(bars: int) -> list[dict]:
+    close = random_prices(bars)
+    timestamps = 946681200000 + np.arange(bars) * 86400000
+
+    return [
+        dict(timestamp=int(timestamp), open=price, high=price + 1, low=price - 1, close=price, totalVolumeTraded=1000)
+        for timestamp, price in zip(timestamps, close.tolist())
+    ]
+
+
+def cmc_payload(bars: int) -> list[dict]:
+    close = random_prices(bars)
+    timestamps = pd.date_range("2000-01-01 22:00", periods=bars, freq="D", tz="UTC")
+
+    return [
+        dict(t=timestamp.strftime("%Y-%m-%dT%H:%M:%S%z"), o=price, h=price + 1, l=price - 1, c=price)
+        for timestamp, price in zip(timestamps, close.tolist())
+    ]
+
+
+def kraken_payload(bars: int) -> list[list]:
+    close = random_prices(bars)
+    timestamps = 946684800 + np.arange(bars) * 86400
+
+    return [
+        [int(timestamp), str(price), str(price + 1), str(price - 1), str(price), str(price), "12.5", 100]
+        for timestamp, price in zip(timestamps, close.tolist())
+    ]
+
+
+def cmc_ohlc_to_bar(ohlc: dict) -> Bar:
+    """
+    The previous per-bar conversion of `CMCFeed` (daily resolution), which was replaced by `_ohlc_to_dataframe()`
+    """
+    ts = datetime.strptime(ohlc["t"], "%Y-%m-%dT%H:%M:%S%z")
+
+    if ts.hour > 12:
+        ts = ts + timedelta(days=1)
+        ts = ts.replace(hour=0, minute=0)
+
+    return Bar(time=ts, open=ohlc["o"], high=ohlc["h"], low=ohlc["l"], close=ohlc["c"])
+
+
+def best_time(function: Callable, runs: int) -> float:
+    times = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=5000, help="number of bars per response")
+    parser.add_argument("--runs", type=int, default=5, help="best of N runs")
+    args = parser.parse_args()
+
+    avanza = avanza_payload(args.bars)
+    cmc = cmc_payload(args.bars)
+    kraken = kraken_payload(args.bars)
+
+    cases = {
+        "Avanza": (
+            lambda: barset_to_ohlc_dataframe({AvanzaFeed._ohlc_to_bar(ohlc) for ohlc in avanza}),
+            lambda: AvanzaFeed._ohlc_to_dataframe(avanza),
+        ),
+        "CMC": (
+            lambda: barset_to_ohlc_dataframe({cmc_ohlc_to_bar(ohlc) for ohlc in cmc}),
+            lambda: CMCFeed._ohlc_to_dataframe(cmc, TimeResolution.day),
+        ),
+        "Kraken": (
+            lambda: barset_to_ohlc_dataframe({KrakenFeed._ohlc_to_bar(row) for row in kraken}),
+            lambda: KrakenFeed._ohlc_to_dataframe(kraken),
+        ),
+    }
+
+    print(f"Bars per response: {args.bars}, best of {args.runs} runs")
+    print(f"{'feed':>8} {'bars (ms)':>10} {'columnar (ms)':>14} {'speedup':>8}")
+
+    for feed, (bars_path, columnar_path) in cases.items():
+        bars_time = best_time(bars_path, args.runs)
+        columnar_time = best_time(columnar_path, args.runs)
+
+        print(f"{feed:>8} {bars_time * 1000:>10.1f} {columnar_time * 1000:>14.1f} {bars_time / columnar_time:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Micro-benchmark of a warm OHLC load: from the HTTP cache (reading and parsing the cached JSON response, then
+converting it to a dataframe) against the OHLC store (memory-mapping the stored arrays).
+
+Usage:
+    python benchmarks/ohlc_store.py [--bars 5000] [--runs 20]
+"""
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from ohlc_parsing import avanza_payload, best_time
+
+from investmentstk.data_feeds.avanza_feed import AvanzaFeed
+from investmentstk.persistence.ohlc_store import OhlcStore
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=5000, help="number of bars per response")
+    parser.add_argument("--runs", type=int, default=20, help="best of N runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Like a response cached by requests-cache (which also stores the headers and the request)
+        cached_response = Path(folder) / "response.json"
+        cached_response.write_text(json.dumps(dict(response=dict(ohlc=avanza_payload(args.bars)))))
+
+        store = OhlcStore(Path(folder) / "ohlc_store")
+        store.set("key", AvanzaFeed._ohlc_to_dataframe(avanza_payload(args.bars)), retrieved_at=0)
+
+        http_cache_time = best_time(
+            lambda: AvanzaFeed._ohlc_to_dataframe(json.loads(cached_response.read_text())["response"]["ohlc"]),
+            args.runs,
+        )
+        store_time = best_time(lambda: store.get("key"), args.runs)
+
+    print(f"Bars: {args.bars}, best of {args.runs} runs")
+    print(f"HTTP cache: {http_cache_time * 1000:.2f} ms")
+    print(f"OHLC store: {store_time * 1000:.2f} ms ({http_cache_time / store_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
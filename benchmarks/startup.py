@@ -0,0 +1,73 @@
+"""
+Benchmarks the cold start of the server: how long it takes to import `investmentstk.server` and to answer the
+first request. Each measurement runs in a fresh interpreter, as modules are only imported once per process.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MEASURE_FIRST_REQUEST = """
+import time
+start = time.perf_counter()
+import investmentstk.server
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(investmentstk.server.app)
+client_ready = time.perf_counter()
+client.get("/")
+done = time.perf_counter()
+print(imported - start, (imported - start) + (done - client_ready))
+"""
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "CMC_API_KEY": os.environ.get("CMC_API_KEY", "benchmark")}
+    return subprocess.run([sys.executable, *flags, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+
+def slowest_imports(top: int) -> list[tuple[int, str]]:
+    """
+    :return: the modules with the highest cumulative import time (in microseconds), using `python -X importtime`
+    """
+    stderr = run_python("import investmentstk.server", "-X", "importtime").stderr
+    imports = []
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, module = line.split("|")
+        imports.append((int(cumulative), module.rstrip()))
+
+    return sorted(imports, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to show")
+    args = parser.parse_args()
+
+    import_times, first_request_times = [], []
+
+    for _ in range(args.runs):
+        import_time, first_request_time = map(float, run_python(MEASURE_FIRST_REQUEST).stdout.split())
+        import_times.append(import_time)
+        first_request_times.append(first_request_time)
+
+    print(f"Import of investmentstk.server (median of {args.runs}): {statistics.median(import_times):.3f}s")
+    print(f"Time to first request (median of {args.runs}): {statistics.median(first_request_times):.3f}s")
+    print()
+    print("Slowest imports (cumulative):")
+
+    for cumulative, module in slowest_imports(args.top):
+        print(f"{cumulative / 1000:>10.1f}ms {module}")
+
+
+if __name__ == "__main__":
+    main()
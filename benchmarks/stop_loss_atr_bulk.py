@@ -0,0 +1,117 @@
+"""
+Benchmarks the throughput of the /stop_loss_atr_bulk endpoint against a local stubbed data feed.
+
+Compares the previous serial implementation (retrieve and calculate one asset at a time) with the pipelined one
+(retrievals overlapped on a thread pool, calculations on a process pool).
+
+Usage:
+    python benchmarks/stop_loss_atr_bulk.py [--latency 0.05] [--bars 150] [--sizes 10 100 500]
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("CMC_API_KEY", "benchmark")
+
+from investmentstk import server  # noqa: E402
+from investmentstk.data_feeds.data_feed import DataFeed, TimeResolution  # noqa: E402
+from investmentstk.models.asset import Asset  # noqa: E402
+from investmentstk.models.bar_array import BarArray  # noqa: E402
+from investmentstk.models.price import Price  # noqa: E402
+from investmentstk.models import asset as asset_module  # noqa: E402
+
+
+class StubFeed(DataFeed):
+    """
+    Simulates the network latency of an upstream and returns a random walk
+    """
+
+    latency: float = 0.05
+    bars: int = 150
+
+    def _retrieve_bars(
+        self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
+    ) -> BarArray:
+        raise NotImplementedError
+
+    def retrieve_ohlc(
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution = TimeResolution.day,
+        instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
+    ) -> pd.DataFrame:
+        time.sleep(self.latency)
+
+        random = np.random.default_rng(int(source_id))
+        close = 100 + np.cumsum(random.normal(0, 2, self.bars))
+        spread = np.abs(random.normal(0, 1, self.bars))
+
+        return pd.DataFrame(
+            dict(open=close - spread / 2, high=close + spread, low=close - spread, close=close),
+            index=pd.date_range("2010-01-01", periods=self.bars, freq="MS"),
+        )
+
+    def retrieve_asset_name(self, source_id: str, instrument_type: Optional[str] = None) -> str:
+        return source_id
+
+    def retrieve_price(self, source_id: str, instrument_type: Optional[str] = "stock") -> Price:
+        raise NotImplementedError
+
+
+def stub_from_id(fqn_id: str) -> Asset:
+    source, source_id = Asset.parse_fqn_id(fqn_id)
+    return Asset(source=source, source_id=source_id, name=source_id)
+
+
+def serial_stop_loss_atr_bulk(p: str) -> list:
+    return [{"fqn_id": fqn_id, "stop_loss_atr": server._stop_loss_atr_common(fqn_id)} for fqn_id in p.split(",")]
+
+
+def pipelined_stop_loss_atr_bulk(p: str):
+    return asyncio.run(server.stop_loss_atr_bulk(p, stream=False, accept=None))
+
+
+def measure(function, p: str) -> float:
+    start = time.perf_counter()
+    function(p)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated latency per request, in seconds")
+    parser.add_argument("--bars", type=int, default=150, help="number of monthly bars per asset")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    args = parser.parse_args()
+
+    StubFeed.latency = args.latency
+    StubFeed.bars = args.bars
+
+    # Avoids Firestore and the real data feeds
+    Asset.from_id = stub_from_id  # type: ignore
+    asset_module.build_data_feed_from_source = lambda source: StubFeed()  # type: ignore
+
+    # Warm up the process pool so the spawning time is not measured
+    pipelined_stop_loss_atr_bulk("AV:1")
+
+    print(f"Latency per request: {args.latency}s, bars per asset: {args.bars}")
+    print(f"{'assets':>8} {'serial (s)':>12} {'pipelined (s)':>14} {'assets/s':>10} {'speedup':>8}")
+
+    for size in args.sizes:
+        p = ",".join(f"AV:{index}" for index in range(size))
+
+        serial = measure(serial_stop_loss_atr_bulk, p)
+        pipelined = measure(pipelined_stop_loss_atr_bulk, p)
+
+        print(f"{size:>8} {serial:>12.2f} {pipelined:>14.2f} {size / pipelined:>10.1f} {serial / pipelined:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
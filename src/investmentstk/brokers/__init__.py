@@ -1,5 +1,25 @@
-from .avanza_broker import AvanzaBroker
-from .degiro_broker import DegiroBroker
-from .kraken_broker import KrakenBroker
+import importlib
+from typing import TYPE_CHECKING
+
+# Brokers are imported on first access (PEP 562) as their clients (avanza-api, degiro-connector) are heavy libraries
+_BROKER_MODULES = {
+    "AvanzaBroker": ".avanza_broker",
+    "DegiroBroker": ".degiro_broker",
+    "KrakenBroker": ".kraken_broker",
+}
+
+if TYPE_CHECKING:
+    from .avanza_broker import AvanzaBroker
+    from .degiro_broker import DegiroBroker
+    from .kraken_broker import KrakenBroker
+
+
+def __getattr__(name: str):
+    if name not in _BROKER_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = importlib.import_module(_BROKER_MODULES[name], __name__)
+    return getattr(module, name)
+
 
 __all__ = ["AvanzaBroker", "DegiroBroker", "KrakenBroker"]
@@ -4,6 +4,14 @@ from investmentstk.models import BrokerBalance, StopLoss
 
 
 class Broker(ABC):
+    @abstractmethod
+    def __init__(self, *, skip_cache: bool = False):
+        """
+        Usually authenticates against the broker.
+
+        :param skip_cache: whether to use a shorter cache for the authentication requests
+        """
+
     @property
     @abstractmethod
     def friendly_name(self):
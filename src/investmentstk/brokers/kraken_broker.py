@@ -6,12 +6,11 @@ import os
 import time
 import urllib
 
-import requests
-
 # Construct the request and print the result
 from investmentstk.brokers.broker import Broker
 from investmentstk.models import StopLoss, BrokerBalance
 from investmentstk.persistence.requests_cache import requests_cache_configured
+from investmentstk.utils.http_session import get_http_session
 
 
 class KrakenBroker(Broker):
@@ -106,6 +105,6 @@ class KrakenBroker(Broker):
         headers["API-Key"] = api_key
         headers["API-Sign"] = cls._get_kraken_signature(uri_path, data, api_sec)
 
-        req = requests.post((cls.API_URL + uri_path), headers=headers, data=data)
+        req = get_http_session(cls.__name__).post((cls.API_URL + uri_path), headers=headers, data=data)
 
         return req
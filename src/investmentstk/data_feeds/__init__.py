@@ -1,7 +1,29 @@
-from .avanza_feed import AvanzaFeed
-from .cmc_feed import CMCFeed
-from .data_feed import DataFeed
-from .degiro_feed import DegiroFeed
-from .kraken_feed import KrakenFeed
+import importlib
+from typing import TYPE_CHECKING
+
+# Feeds are imported on first access (PEP 562) as some of them depend on heavy libraries (like degiro-connector)
+_FEED_MODULES = {
+    "AvanzaFeed": ".avanza_feed",
+    "CMCFeed": ".cmc_feed",
+    "DataFeed": ".data_feed",
+    "DegiroFeed": ".degiro_feed",
+    "KrakenFeed": ".kraken_feed",
+}
+
+if TYPE_CHECKING:
+    from .avanza_feed import AvanzaFeed
+    from .cmc_feed import CMCFeed
+    from .data_feed import DataFeed
+    from .degiro_feed import DegiroFeed
+    from .kraken_feed import KrakenFeed
+
+
+def __getattr__(name: str):
+    if name not in _FEED_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = importlib.import_module(_FEED_MODULES[name], __name__)
+    return getattr(module, name)
+
 
 __all__ = ["AvanzaFeed", "CMCFeed", "DataFeed", "DegiroFeed", "KrakenFeed"]
@@ -1,14 +1,16 @@
 from zoneinfo import ZoneInfo
 
-import requests
+import pandas as pd
 from datetime import datetime
 from typing import Optional, Mapping
 
 from investmentstk.data_feeds.data_feed import DataFeed, TimeResolution
 from investmentstk.models.bar import Bar
-from investmentstk.models.barset import BarSet
+from investmentstk.models.bar_array import BarArray
+from investmentstk.models.barset import ohlc_columns_to_dataframe
 from investmentstk.models.price import Price
-from investmentstk.persistence.requests_cache import requests_cache_configured
+from investmentstk.utils.metrics import record_data_feed_metrics
+from investmentstk.utils.single_flight import single_flight
 
 TIME_RESOLUTION_TO_AVANZA_API_RESOLUTION_MAP = {
     TimeResolution.day: "day",
@@ -22,6 +24,19 @@ TIME_RESOLUTION_TO_AVANZA_API_TIME_RANGE_MAP = {
     TimeResolution.month: "infinity",
 }
 
+# Time ranges (how far back from today) for the daily bars used by `retrieve_ohlc()` for the day and week
+# resolutions (week is derived from them), from the shortest to the longest one we use
+AVANZA_API_DAILY_TIME_RANGES = [
+    ("one_month", pd.DateOffset(months=1)),
+    ("three_months", pd.DateOffset(months=3)),
+    ("one_year", pd.DateOffset(years=1)),
+    ("three_years", pd.DateOffset(years=3)),
+    ("five_years", pd.DateOffset(years=5)),
+]
+
+AVANZA_TIMEZONE_NAME = "Europe/Stockholm"
+AVANZA_TIMEZONE = ZoneInfo(AVANZA_TIMEZONE_NAME)
+
 
 class AvanzaFeed(DataFeed):
     """
@@ -32,40 +47,95 @@ class AvanzaFeed(DataFeed):
     * https://github.com/alrevuelta/avanzapy/blob/master/avanzapy/avanzapy.py
     """
 
-    @requests_cache_configured()
+    BASE_URL = "https://www.avanza.se"
+
     def _retrieve_bars(
         self,
         source_id: str,
         *,
         resolution: TimeResolution = TimeResolution.day,
         instrument_type: Optional[str] = "stock",
-    ) -> BarSet:
+    ) -> BarArray:
         """
         Uses the same public API used by their public price page.
         Example: https://www.avanza.se/aktier/om-aktien.html/5269/volvo-b
 
+        Not used by `retrieve_ohlc()`. The whole response is converted at once, as in `retrieve_ohlc()`.
+
         :param source_id: the internal ID used in Avanza
         :param instrument_type:
-        :return: a BarSet
+        :return: a BarArray
+        """
+        return BarArray.from_dataframe(
+            self._ohlc_to_dataframe(
+                self._retrieve_price_chart(source_id, resolution=resolution, instrument_type=instrument_type)
+            )
+        )
+
+    @single_flight
+    @record_data_feed_metrics
+    def retrieve_ohlc(
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution = TimeResolution.day,
+        instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Day and week bars are derived from the same daily bars (at most the last 5 years), so they share a single
+        download. Month bars are retrieved as they are, with the whole history (`min_bars` is ignored): 5 years
+        would only be about 60 bars. The whole response is converted at once, instead of bar by bar (see
+        `_ohlc_to_bar()`).
         """
-        response = requests.get(
-            f"https://www.avanza.se/_api/price-chart/{instrument_type}/{source_id}",
+        instrument_type = instrument_type or "stock"
+
+        if resolution == TimeResolution.month:
+            return self._retrieve_ohlc_incrementally(
+                source_id,
+                resolution=resolution,
+                instrument_type=instrument_type,
+                retrieve_all=lambda: self._ohlc_to_dataframe(
+                    self._retrieve_price_chart(source_id, resolution=resolution, instrument_type=instrument_type)
+                ),
+            )
+
+        return self._retrieve_ohlc_from_daily(
+            source_id, resolution=resolution, instrument_type=instrument_type, min_bars=min_bars
+        )
+
+    def _retrieve_daily_ohlc_from_source(
+        self, source_id: str, *, instrument_type: Optional[str] = None, since: Optional[pd.Timestamp] = None
+    ) -> pd.DataFrame:
+        time_period = self._smallest_time_range(since, AVANZA_API_DAILY_TIME_RANGES)
+
+        return self._ohlc_to_dataframe(
+            self._retrieve_price_chart(
+                source_id, resolution=TimeResolution.day, instrument_type=instrument_type, time_period=time_period
+            )
+        )
+
+    def _retrieve_price_chart(
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution,
+        instrument_type: Optional[str],
+        time_period: Optional[str] = None,
+    ) -> list:
+        response = self._http_session().get(
+            f"{self.BASE_URL}/_api/price-chart/{instrument_type}/{source_id}",
             params={
-                "timePeriod": TIME_RESOLUTION_TO_AVANZA_API_TIME_RANGE_MAP[resolution],
+                "timePeriod": time_period or TIME_RESOLUTION_TO_AVANZA_API_TIME_RANGE_MAP[resolution],
                 "resolution": TIME_RESOLUTION_TO_AVANZA_API_RESOLUTION_MAP[resolution],
             },
         )
         response.raise_for_status()
 
-        bars: BarSet = set()
-        data = response.json()
-
-        for ohlc in data["ohlc"]:
-            bars.add(self._ohlc_to_bar(ohlc))
+        return response.json()["ohlc"]
 
-        return bars
-
-    @requests_cache_configured()
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_asset_name(self, source_id: str, instrument_type: Optional[str] = "stock") -> str:
         """
         Retrieves the name of an asset
@@ -74,13 +144,15 @@ class AvanzaFeed(DataFeed):
         :param instrument_type:
         :return: the asset name (ticker)
         """
-        response = requests.get(f"https://www.avanza.se/_mobile/market/{instrument_type}/{source_id}")
+        response = self._http_session(cached=True).get(f"{self.BASE_URL}/_mobile/market/{instrument_type}/{source_id}")
         response.raise_for_status()
 
         return response.json()["tickerSymbol"]
 
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_price(self, source_id: str, instrument_type: Optional[str] = "stock") -> Price:
-        response = requests.get(f"https://www.avanza.se/_mobile/market/{instrument_type}/{source_id}")
+        response = self._http_session().get(f"{self.BASE_URL}/_mobile/market/{instrument_type}/{source_id}")
         response.raise_for_status()
 
         data = response.json()
@@ -105,12 +177,25 @@ class AvanzaFeed(DataFeed):
         with a timezone aware datetime, so I drop the timezone info.
         """
 
-        local_tz = ZoneInfo("Europe/Stockholm")
-
         return Bar(
-            time=datetime.fromtimestamp(ohlc["timestamp"] / 1000, tz=local_tz).replace(tzinfo=None),
+            time=datetime.fromtimestamp(ohlc["timestamp"] / 1000, tz=AVANZA_TIMEZONE).replace(tzinfo=None),
             open=ohlc["open"],
             high=ohlc["high"],
             low=ohlc["low"],
             close=ohlc["close"],
         )
+
+    @classmethod
+    def _ohlc_to_dataframe(cls, ohlc: list[Mapping]) -> pd.DataFrame:
+        """
+        Vectorized version of `_ohlc_to_bar()`, converting all the bars of a response at once.
+        Timestamps get the same treatment (converted to Stockholm time and then made timezone naive).
+        """
+        columns = pd.DataFrame.from_records(ohlc, columns=["timestamp", "open", "high", "low", "close"])
+
+        time = pd.DatetimeIndex(pd.to_datetime(columns["timestamp"], unit="ms", utc=True))
+        time = time.tz_convert(AVANZA_TIMEZONE_NAME).tz_localize(None)  # pandas does not support ZoneInfo yet
+
+        return ohlc_columns_to_dataframe(
+            time, columns["open"].values, columns["high"].values, columns["low"].values, columns["close"].values
+        )
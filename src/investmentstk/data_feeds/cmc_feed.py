@@ -1,13 +1,15 @@
 import os
-import requests
-from datetime import datetime, timedelta
 from typing import ClassVar, Optional, Mapping
 
+import pandas as pd
+
 from investmentstk.data_feeds.data_feed import DataFeed, TimeResolution
-from investmentstk.models.bar import Bar
-from investmentstk.models.barset import BarSet
+from investmentstk.models.bar_array import BarArray
+from investmentstk.models.barset import ohlc_columns_to_dataframe
 from investmentstk.models.price import Price
-from investmentstk.persistence.requests_cache import requests_cache_configured
+from investmentstk.utils import calendar
+from investmentstk.utils.metrics import record_data_feed_metrics
+from investmentstk.utils.single_flight import single_flight
 
 
 class CMCFeed(DataFeed):
@@ -18,10 +20,43 @@ class CMCFeed(DataFeed):
     # Public API key from just going to their website
     API_KEY: ClassVar[str] = os.environ["CMC_API_KEY"]
 
-    @requests_cache_configured()
+    BASE_URL = "https://oaf.cmcmarkets.com"
+
     def _retrieve_bars(
         self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
-    ) -> BarSet:
+    ) -> BarArray:
+        """
+        Not used by `retrieve_ohlc()`, which builds the dataframe directly from the response.
+        The bars are built from that same dataframe, so the timestamps are normalized in a single place.
+        """
+        dataframe = self._ohlc_to_dataframe(self._retrieve_price_rows(source_id, resolution=resolution), resolution)
+
+        return BarArray.from_dataframe(dataframe)
+
+    @single_flight
+    @record_data_feed_metrics
+    def retrieve_ohlc(
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution = TimeResolution.day,
+        instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        The API implies the size of the bars from the time range, so there's no shorter time range to only
+        retrieve the most recent bars: the whole history is retrieved when the stored one is not recent enough.
+        For the same reason, `min_bars` is ignored.
+        """
+        return self._retrieve_ohlc_incrementally(
+            source_id,
+            resolution=resolution,
+            retrieve_all=lambda: self._ohlc_to_dataframe(
+                self._retrieve_price_rows(source_id, resolution=resolution), resolution
+            ),
+        )
+
+    def _retrieve_price_rows(self, source_id: str, *, resolution: TimeResolution) -> list:
         """
         Uses the same public API used by their public price page.
         Example: https://www.cmcmarkets.com/en-gb/instruments/sugar-raw-cash
@@ -29,41 +64,38 @@ class CMCFeed(DataFeed):
         For daily interval, the maximum allowed number of months is 6.
         """
         if resolution == TimeResolution.day:
-            response = requests.get(
-                f"https://oaf.cmcmarkets.com/instruments/prices/{source_id}/MONTH/6",
+            response = self._http_session().get(
+                f"{self.BASE_URL}/instruments/prices/{source_id}/MONTH/6",
                 params={"key": self.API_KEY},
             )
         elif resolution == TimeResolution.week:
-            response = requests.get(
-                f"https://oaf.cmcmarkets.com/instruments/prices/{source_id}/YEAR/2",
+            response = self._http_session().get(
+                f"{self.BASE_URL}/instruments/prices/{source_id}/YEAR/2",
                 params={"key": self.API_KEY},
             )
         else:
             raise ValueError(f"{resolution} resolution not supported for {self.__class__.__name__} source")
 
         response.raise_for_status()
-        data = response.json()
-
-        bars: BarSet = set()
-
-        for ohlc in data:
-            bars.add(self._ohlc_to_bar(ohlc, resolution))
 
-        return bars
+        return response.json()
 
-    @requests_cache_configured()
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_asset_name(self, source_id: str, instrument_type: Optional[str] = None) -> str:
-        response = requests.get(
-            f"https://oaf.cmcmarkets.com/json/instruments/{source_id}_gb.json",
+        response = self._http_session(cached=True).get(
+            f"{self.BASE_URL}/json/instruments/{source_id}_gb.json",
             params={"key": self.API_KEY},
         )
         response.raise_for_status()
 
         return response.json()["name"]
 
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_price(self, source_id: str, instrument_type: Optional[str] = None) -> Price:
-        response = requests.get(
-            f"https://oaf.cmcmarkets.com//instruments/price/{source_id}",
+        response = self._http_session().get(
+            f"{self.BASE_URL}//instruments/price/{source_id}",
             params={"key": self.API_KEY},
         )
         response.raise_for_status()
@@ -74,10 +106,24 @@ class CMCFeed(DataFeed):
         return Price(last=mid_price, change=data["movement_point"], change_pct=data["movement_percentage"])
 
     @classmethod
-    def _ohlc_to_bar(cls, ohlc: Mapping, resolution: TimeResolution) -> Bar:
+    def _ohlc_to_dataframe(cls, ohlc: list[Mapping], resolution: TimeResolution) -> pd.DataFrame:
         """
-        Converts a bar OHLC representation from CMC Markets into our
-        representation.
+        Converts all the bars of a response at once. Timestamps are ISO 8601 strings with an UTC offset
+        (e.g. 2021-09-02T21:00:00+0000), which pandas parses without a format (much faster than with one).
+        """
+        columns = pd.DataFrame.from_records(ohlc, columns=["t", "o", "h", "l", "c"])
+
+        time = pd.DatetimeIndex(pd.to_datetime(columns["t"]))
+        time = cls._normalize_time(time, resolution)
+
+        return ohlc_columns_to_dataframe(
+            time, columns["o"].values, columns["h"].values, columns["l"].values, columns["c"].values
+        )
+
+    @classmethod
+    def _normalize_time(cls, time: pd.DatetimeIndex, resolution: TimeResolution) -> pd.DatetimeIndex:
+        """
+        Aligns the timestamps from CMC Markets with the days (or weeks) they refer to.
 
         I have had issues before with timezone and date misalignment with this data feed.
         Example: when retrieving daily bars, I would get timestamps starting at 9pm or 10pm on the day before,
@@ -85,20 +131,10 @@ class CMCFeed(DataFeed):
         """
 
         # This logic works both for daily and weekly resolution
-        ts = datetime.strptime(ohlc["t"], "%Y-%m-%dT%H:%M:%S%z")
-
-        if ts.hour > 12:
-            ts = ts + timedelta(days=1)
-            ts = ts.replace(hour=0, minute=0)
+        time = calendar.round_day_vectorized(time)
 
         # CMC starts the week on Sunday, but most other places do on Monday
         if resolution == TimeResolution.week:
-            ts = ts + timedelta(days=1)
-
-        return Bar(
-            time=ts,
-            open=ohlc["o"],
-            high=ohlc["h"],
-            low=ohlc["l"],
-            close=ohlc["c"],
-        )
+            time = time + pd.Timedelta(days=1)
+
+        return time
@@ -1,11 +1,39 @@
+import os
+import threading
+import time
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Optional
+from contextlib import nullcontext
+from datetime import datetime
+from typing import Callable, ContextManager, Hashable, Optional, Sequence, TypeVar
 
 import pandas as pd
+import requests
 
-from investmentstk.models.barset import BarSet, barset_to_ohlc_dataframe
+from investmentstk.models.bar_array import BarArray
+from investmentstk.models.barset import barset_to_ohlc_dataframe
 from investmentstk.models.price import Price
+from investmentstk.persistence.ohlc_store import OhlcStore
+from investmentstk.utils.concurrency import ConcurrencyLimiter, map_concurrently, run_in_io_pool
+from investmentstk.utils.dataframe import append_ohlc, convert_daily_ohlc_to_monthly, convert_daily_ohlc_to_weekly
+from investmentstk.utils.http_session import get_http_session
+from investmentstk.utils.logger import get_logger
+from investmentstk.utils.metrics import ohlc_refreshes, record_data_feed_metrics
+from investmentstk.utils.single_flight import single_flight
+
+logger = get_logger()
+
+T = TypeVar("T")
+
+# OHLC histories previously retrieved, by feed, source ID, resolution and instrument type
+# (see `DataFeed._retrieve_ohlc_incrementally()`)
+ohlc_store = OhlcStore()
+
+# The earliest start requested by the callers of `DataFeed._retrieve_stored_daily_ohlc()`, by feed, source ID and
+# instrument type (None: the longest history available). Kept out of its single-flight key, so calls needing
+# different lookbacks share the same download
+_requested_daily_starts: dict[tuple, Optional[pd.Timestamp]] = {}
+_requested_daily_starts_lock = threading.Lock()
 
 
 class TimeResolution(str, Enum):
@@ -14,17 +42,59 @@ class TimeResolution(str, Enum):
     month = "month"
 
 
+def resample_daily_ohlc(dataframe: pd.DataFrame, resolution: TimeResolution) -> pd.DataFrame:
+    """
+    Derives the bars of a coarser resolution from daily bars
+
+    :param dataframe: daily OHLC dataframe, indexed by time
+    :param resolution: the time resolution (day, week, month)
+    :return: a pandas dataframe (the same one, for daily resolution)
+    """
+    if resolution == TimeResolution.week:
+        return convert_daily_ohlc_to_weekly(dataframe)
+
+    if resolution == TimeResolution.month:
+        return convert_daily_ohlc_to_monthly(dataframe)
+
+    return dataframe
+
+
+def lookback_start(resolution: TimeResolution, bars: int, *, now: Optional[datetime] = None) -> pd.Timestamp:
+    """
+    The earliest time needed to have the given number of most recent bars, plus the current one (which may
+    still be open). Days are counted as business days.
+
+    :param resolution: the time resolution (day, week, month)
+    :param bars: the number of bars
+    :param now: defaults to the current time (UTC)
+    :return: a timezone naive timestamp, at the start of a day (and week or month)
+    """
+    today = pd.Timestamp(now or datetime.utcnow()).normalize()
+
+    if resolution == TimeResolution.week:
+        start = today - pd.DateOffset(weeks=bars)
+        return start - pd.Timedelta(days=start.weekday())
+
+    if resolution == TimeResolution.month:
+        return (today - pd.DateOffset(months=bars)).replace(day=1)
+
+    return today - pd.offsets.BDay(bars)
+
+
 class DataFeed(ABC):
     """
     Abstract class that every data feed client should implement.
 
     Individual instances be created by a factory method in `models/source.py`
+
+    Every method also has an async counterpart (prefixed with "a"), to be awaited from async code
+    (like FastAPI async endpoints) without blocking the event loop.
     """
 
     @abstractmethod
     def _retrieve_bars(
         self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
-    ) -> BarSet:
+    ) -> BarArray:
         """
         Retrieves bars. For now, very simple implementation and not flexible at all
         (in terms of time range).
@@ -32,11 +102,18 @@ class DataFeed(ABC):
         :param source_id: the ID for the asset in the source
         :param resolution: the time resolution (day, week, month)
         :param instrument_type: the type of instrument
-        :return: a BarSet
+        :return: a BarArray
         """
 
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_ohlc(
-        self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution = TimeResolution.day,
+        instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
     ) -> pd.DataFrame:
         """
         Retrieves OHLC data as a pandas dataframe.
@@ -44,6 +121,8 @@ class DataFeed(ABC):
         :param source_id: the ID for the asset in the source
         :param resolution: the time resolution (day, week, month)
         :param instrument_type: the type of instrument
+        :param min_bars: how many of the most recent bars are needed. Only a hint, so feeds can request a shorter
+        time range from the source: more bars may be returned. By default, the longest history available
         :return: a pandas dataframe
         """
         bars = self._retrieve_bars(source_id, resolution=resolution)
@@ -68,3 +147,256 @@ class DataFeed(ABC):
         :param instrument_type: the type of instrument
         :return: a Price object
         """
+
+    def retrieve_prices(
+        self,
+        source_ids: Sequence[str],
+        *,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        limiter_key: Hashable = None,
+    ) -> dict[str, Price]:
+        """
+        Retrieves the last price (and % variation) of many assets.
+
+        The default implementation calls `retrieve_price()` for each asset concurrently. Feeds that can retrieve
+        many prices with a single request override it.
+
+        :param source_ids: the IDs for the assets in the source
+        :param limiter: bounds the in-flight requests to the source (by default, at most 4 at the same time)
+        :param limiter_key: the key used with `limiter` (usually the `Source`)
+        :return: a Price object per source ID. Assets whose price could not be retrieved are logged and left out
+        """
+        source_ids = list(dict.fromkeys(source_ids))
+        futures = map_concurrently(
+            self.retrieve_price,
+            source_ids,
+            key=lambda source_id: limiter_key,
+            limiter=limiter or ConcurrencyLimiter(default_limit=4),
+        )
+
+        prices = {}
+
+        for source_id, future in zip(source_ids, futures):
+            try:
+                prices[source_id] = future.result()
+            except Exception as e:
+                logger.error(
+                    f"Exception raised. {type(e).__name__}: {e}",
+                    source_id=source_id,
+                    feed=self.__class__.__name__,
+                    error=type(e).__name__,
+                )
+
+        return prices
+
+    @staticmethod
+    def _limited(limiter: Optional[ConcurrencyLimiter], limiter_key: Hashable) -> ContextManager:
+        """
+        For overrides of `retrieve_prices()` making a single request: takes a slot of the limiter, if any
+        """
+        return limiter.limit(limiter_key) if limiter else nullcontext()
+
+    def _retrieve_ohlc_incrementally(
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution,
+        instrument_type: Optional[str] = None,
+        retrieve_all: Callable[[], pd.DataFrame],
+        retrieve_since: Optional[Callable[[pd.Timestamp], pd.DataFrame]] = None,
+        start: Optional[pd.Timestamp] = None,
+    ) -> pd.DataFrame:
+        """
+        Keeps the OHLC history previously retrieved in the OHLC store (see `persistence/ohlc_store.py`):
+
+        * If it was retrieved or updated less than `OHLC_STORE_MAX_AGE_MINUTES` ago (defaults to 60),
+          it's returned as it is, without calling the source.
+        * Otherwise, only the most recent bars are retrieved (usually a much smaller payload) and merged into it.
+
+        The whole history is retrieved again when there's no history yet, when the feed can't retrieve only the
+        most recent bars, when the update does not overlap the history (too long since the last call) and every
+        `OHLC_FULL_REFRESH_HOURS` (defaults to 24), so past bars that were revised upstream (e.g. adjusted
+        for splits) are eventually updated too. Setting it to 0 disables the incremental mode.
+
+        When only the bars from `start` onwards are needed, the history is retrieved from there (with
+        `retrieve_since`), unless the stored one is already at least as long. It's retrieved again (as long as needed)
+        when a longer history is needed.
+
+        :param retrieve_all: retrieves the whole history
+        :param retrieve_since: retrieves the bars from a given time (inclusive) onwards
+        :param start: the earliest time needed. By default, the whole history
+        :return: a pandas dataframe
+        """
+        feed = self.__class__.__name__
+        key = (feed, source_id, resolution, instrument_type)
+        max_age_seconds = float(os.environ.get("OHLC_STORE_MAX_AGE_MINUTES", 60)) * 60
+        full_refresh_seconds = float(os.environ.get("OHLC_FULL_REFRESH_HOURS", 24)) * 3600
+
+        if retrieve_since is None:
+            start = None
+
+        stored = ohlc_store.get(key)
+        now = time.time()
+
+        if stored is not None and not self._covers(stored.start, start):
+            logger.debug("Stored history is too short. Retrieving everything", source_id=source_id)
+            stored = None
+
+        if stored is not None:
+            # The next full retrievals keep the history as long as it is
+            start = stored.start
+
+        if stored is not None and now - stored.retrieved_at < full_refresh_seconds:
+            if now - stored.refreshed_at < max_age_seconds:
+                ohlc_refreshes.inc(feed=feed, mode="stored")
+                return stored.dataframe
+
+            history = stored.dataframe
+
+            if retrieve_since is not None and not history.empty:
+                last_time = history.index[-1]
+                update = retrieve_since(last_time)
+
+                if not update.empty and update.index[0] <= last_time:
+                    ohlc_refreshes.inc(feed=feed, mode="incremental")
+                    dataframe = append_ohlc(history, update)
+                    ohlc_store.set(key, dataframe, retrieved_at=stored.retrieved_at, refreshed_at=now, start=start)
+
+                    return dataframe
+
+                logger.debug("Update does not overlap the history. Retrieving everything", source_id=source_id)
+
+        ohlc_refreshes.inc(feed=feed, mode="full")
+        dataframe = retrieve_all() if start is None or retrieve_since is None else retrieve_since(start)
+        ohlc_store.set(key, dataframe, retrieved_at=now, start=start)
+
+        return dataframe
+
+    @staticmethod
+    def _covers(history_start: Optional[pd.Timestamp], start: Optional[pd.Timestamp]) -> bool:
+        """
+        Whether a history retrieved from `history_start` (None: the longest available) has the bars from `start`
+        (None: the longest history available) onwards
+        """
+        return history_start is None or (start is not None and history_start <= start)
+
+    @staticmethod
+    def _smallest_time_range(since: Optional[pd.Timestamp], time_ranges: Sequence[tuple[T, pd.DateOffset]]) -> T:
+        """
+        For sources that take time ranges relative to today: the smallest time range that includes `since`.
+
+        :param since: the earliest time needed. By default, the longest time range
+        :param time_ranges: pairs of time range (as used by the source) and how far back it goes, from the
+        smallest to the longest
+        :return: the time range. The longest one if none of them includes `since`
+        """
+        if since is not None:
+            today = pd.Timestamp(datetime.utcnow()).normalize()
+
+            for time_range, offset in time_ranges:
+                if today - offset <= since:
+                    return time_range
+
+        return time_ranges[-1][0]
+
+    def _retrieve_ohlc_from_daily(
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution,
+        instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        For feeds that implement `_retrieve_daily_ohlc_from_source()`: only the daily history is retrieved (and
+        stored) and the other resolutions are derived from it locally. The day, week and month bars of an asset
+        share a single download.
+        """
+        start = lookback_start(resolution, min_bars) if min_bars else None
+        key = (self.__class__.__name__, source_id, instrument_type)
+
+        while True:
+            with _requested_daily_starts_lock:
+                requested_start = _requested_daily_starts.get(key, start)
+                _requested_daily_starts[key] = (
+                    None if requested_start is None or start is None else min(requested_start, start)
+                )
+
+            dataframe, retrieved_start = self._retrieve_stored_daily_ohlc(source_id, instrument_type)
+
+            # Otherwise, joined a call that had already started with a shorter lookback
+            if self._covers(retrieved_start, start):
+                return resample_daily_ohlc(dataframe, resolution)
+
+    @single_flight
+    def _retrieve_stored_daily_ohlc(
+        self, source_id: str, instrument_type: Optional[str] = None
+    ) -> tuple[pd.DataFrame, Optional[pd.Timestamp]]:
+        """
+        Coalesces concurrent calls for different resolutions of the same asset, which need the same daily history.
+        The history is retrieved from the earliest start requested so far (see `_retrieve_ohlc_from_daily()`).
+
+        :return: the daily history and from when it has all the bars (None: the longest history available)
+        """
+        with _requested_daily_starts_lock:
+            start = _requested_daily_starts.pop((self.__class__.__name__, source_id, instrument_type), None)
+
+        dataframe = self._retrieve_ohlc_incrementally(
+            source_id,
+            resolution=TimeResolution.day,
+            instrument_type=instrument_type,
+            retrieve_all=lambda: self._retrieve_daily_ohlc_from_source(source_id, instrument_type=instrument_type),
+            retrieve_since=lambda since: self._retrieve_daily_ohlc_from_source(
+                source_id, instrument_type=instrument_type, since=since
+            ),
+            start=start,
+        )
+
+        return dataframe, start
+
+    def _retrieve_daily_ohlc_from_source(
+        self, source_id: str, *, instrument_type: Optional[str] = None, since: Optional[pd.Timestamp] = None
+    ) -> pd.DataFrame:
+        """
+        Retrieves daily OHLC data from the source. Used by `_retrieve_ohlc_from_daily()`.
+
+        :param source_id: the ID for the asset in the source
+        :param instrument_type: the type of instrument
+        :param since: if given, only the bars from this time (inclusive) onwards are needed. Otherwise, the longest
+        history available
+        :return: a pandas dataframe
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not derive resolutions from daily bars")
+
+    def _http_session(self, *, cached: bool = False) -> requests.Session:
+        """
+        The HTTP session shared by all the instances of the feed, to reuse connections between calls
+        """
+        return get_http_session(self.__class__.__name__, cached=cached)
+
+    async def aretrieve_ohlc(self, source_id: str, **kwargs) -> pd.DataFrame:
+        """
+        Async version of `retrieve_ohlc()`. Keyword arguments are forwarded as they are, so concurrent sync and
+        async calls with the same arguments are coalesced (see `single_flight`)
+        """
+        return await run_in_io_pool(self.retrieve_ohlc, source_id, **kwargs)
+
+    async def aretrieve_asset_name(self, source_id: str, **kwargs) -> str:
+        """
+        Async version of `retrieve_asset_name()`. Keyword arguments are forwarded, so each feed keeps
+        its own default `instrument_type`
+        """
+        return await run_in_io_pool(self.retrieve_asset_name, source_id, **kwargs)
+
+    async def aretrieve_price(self, source_id: str, **kwargs) -> Price:
+        """
+        Async version of `retrieve_price()`. Keyword arguments are forwarded, so each feed keeps
+        its own default `instrument_type`
+        """
+        return await run_in_io_pool(self.retrieve_price, source_id, **kwargs)
+
+    async def aretrieve_prices(self, source_ids: Sequence[str], **kwargs) -> dict[str, Price]:
+        """
+        Async version of `retrieve_prices()`
+        """
+        return await run_in_io_pool(self.retrieve_prices, source_ids, **kwargs)
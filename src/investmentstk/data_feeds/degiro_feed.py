@@ -5,15 +5,35 @@ from degiro_connector.quotecast.actions.action_get_chart import ChartHelper
 from degiro_connector.quotecast.api import API as QuotecastAPI
 from degiro_connector.quotecast.models.quotecast_pb2 import Chart
 from degiro_connector.trading.models.trading_pb2 import ProductsInfo
-from typing import Optional
+from typing import Hashable, Iterable, Optional, Sequence
 
 from investmentstk.brokers import DegiroBroker
 from investmentstk.data_feeds.data_feed import DataFeed, TimeResolution
-from investmentstk.models.barset import BarSet, format_ohlc_dataframe
+from investmentstk.models.bar_array import BarArray
+from investmentstk.models.barset import format_ohlc_dataframe
 from investmentstk.models.price import Price
+from investmentstk.persistence.product_index import ProductIndex
 from investmentstk.persistence.requests_cache import requests_cache_configured
 from investmentstk.utils import calendar
-from investmentstk.utils.dataframe import convert_daily_ohlc_to_weekly, convert_daily_ohlc_to_monthly
+from investmentstk.utils.concurrency import ConcurrencyLimiter
+from investmentstk.utils.logger import get_logger
+from investmentstk.utils.metrics import record_data_feed_metrics
+from investmentstk.utils.single_flight import single_flight
+
+# Fields of the products info kept in the product index. They never change for a given product
+PRODUCT_INDEX_FIELDS = ("vwdIdSecondary", "symbol")
+
+# Chart periods (how far back from today) for daily bars, from the shortest to the longest one we use
+CHART_PERIODS = [
+    (Chart.Interval.P1M, pd.DateOffset(months=1)),
+    (Chart.Interval.P3M, pd.DateOffset(months=3)),
+    (Chart.Interval.P6M, pd.DateOffset(months=6)),
+    (Chart.Interval.P1Y, pd.DateOffset(years=1)),
+    (Chart.Interval.P3Y, pd.DateOffset(years=3)),
+    (Chart.Interval.P5Y, pd.DateOffset(years=5)),
+]
+
+logger = get_logger()
 
 
 class DegiroFeed(DataFeed):
@@ -33,6 +53,9 @@ class DegiroFeed(DataFeed):
     For charting, Degiro uses another provider (vwd), which has 2 keys:
     * vwdId (vwd key): "MSFT.BATS,E"
     * vwdIdSecondary (issue id): "350015444"
+
+    As the translation never changes, it's kept in a durable product index and only products not seen before
+    require the authenticated endpoint.
     """
 
     culture = "en-US"
@@ -43,22 +66,25 @@ class DegiroFeed(DataFeed):
 
         self.quotecast_api = QuotecastAPI(user_token=credentials["user_token"])
         self.broker_client = DegiroBroker()
+        self.product_index = ProductIndex("degiro")
 
     def _retrieve_bars(
         self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
-    ) -> BarSet:
+    ) -> BarArray:
         raise NotImplementedError(
             "DegiroFeed uses degiro-connector which already provides methods to return a "
             "dataframe directly. Use retrieve_ohlc() instead."
         )
 
-    @requests_cache_configured()
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_ohlc(
         self,
         source_id: str,
         *,
         resolution: TimeResolution = TimeResolution.day,
         instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
     ) -> pd.DataFrame:
         """
         Using P1M as resolution returns today - 1 MONTH, and not calendar months.
@@ -68,37 +94,78 @@ class DegiroFeed(DataFeed):
         :param source_id: the internal ID used in Avanza
         :param resolution: time resolution
         :param instrument_type: not used in this Feed
+        :param min_bars: how many of the most recent bars are needed (up to 5 years)
         :return: a BarSet
         """
-        # Translate the ID
-        vwd_id = self._retrieve_vwd_id_from_product_id(int(source_id))
+        return self._retrieve_ohlc_from_daily(source_id, resolution=resolution, min_bars=min_bars)
+
+    def _retrieve_daily_ohlc_from_source(
+        self, source_id: str, *, instrument_type: Optional[str] = None, since: Optional[pd.Timestamp] = None
+    ) -> pd.DataFrame:
+        """
+        Uses the shortest chart period that includes `since` (the periods are relative to today)
+        """
+        period = self._smallest_time_range(since, CHART_PERIODS)
+
+        return self._retrieve_daily_ohlc(int(source_id), period=period)
+
+    def _retrieve_daily_ohlc(self, product_id: int, *, period: Chart.Interval) -> pd.DataFrame:
+        dataframes = self._retrieve_daily_ohlc_dataframes([product_id], period=period)
+
+        if product_id not in dataframes:
+            raise RuntimeError(f"No OHLC data returned for {product_id}")
+
+        return dataframes[product_id]
+
+    def _retrieve_daily_ohlc_dataframes(
+        self, product_ids: list[int], *, period: Chart.Interval
+    ) -> dict[int, pd.DataFrame]:
+        """
+        :param period: how far back from today
+        """
+        vwd_ids = self._retrieve_vwd_ids_from_product_ids(product_ids)
+
+        if not vwd_ids:
+            return {}
 
         # Prepare the request
         request = self._build_request()
         request.resolution = Chart.Interval.P1D
-        request.period = Chart.Interval.P5Y
-        request.series.append("ohlc:issueid:" + vwd_id)
+        request.period = period
+        request.series.extend("ohlc:issueid:" + vwd_id for vwd_id in vwd_ids.values())
 
         # Fetch the data
         chart = self.quotecast_api.get_chart(request=request, raw=False)
 
+        if chart is None:
+            raise RuntimeError("Something went wrong when retrieving the chart")
+
         # Format the data
         ChartHelper.format_chart(chart=chart, copy=False)
-        dataframe = ChartHelper.serie_to_df(serie=chart.series[0])
-        dataframe["time"] = pd.to_datetime(dataframe["timestamp"], unit="s")
-        dataframe["time"] = dataframe["time"].apply(calendar.round_day)
-        dataframe = dataframe.drop("timestamp", axis=1)
+        series = {serie.id: serie for serie in chart.series if serie.type == "ohlc"}
+        dataframes = {}
 
-        dataframe = format_ohlc_dataframe(dataframe)
+        for product_id, vwd_id in vwd_ids.items():
+            serie = series.get("ohlc:issueid:" + vwd_id)
 
-        if resolution == TimeResolution.week:
-            return convert_daily_ohlc_to_weekly(dataframe)
+            if serie is None:
+                logger.warning("No OHLC data returned", product_id=product_id, vwd_id=vwd_id)
+                continue
 
-        if resolution == TimeResolution.month:
-            return convert_daily_ohlc_to_monthly(dataframe)
+            dataframes[product_id] = self._serie_to_dataframe(serie)
 
-        return dataframe
+        return dataframes
 
+    @classmethod
+    def _serie_to_dataframe(cls, serie: Chart.Serie) -> pd.DataFrame:
+        dataframe = ChartHelper.serie_to_df(serie=serie)
+        dataframe["time"] = calendar.round_day_vectorized(pd.to_datetime(dataframe["timestamp"], unit="s"))
+        dataframe = dataframe.drop("timestamp", axis=1)
+
+        return format_ohlc_dataframe(dataframe)
+
+    @single_flight
+    @record_data_feed_metrics
     @requests_cache_configured()
     def retrieve_asset_name(self, source_id: str, instrument_type: Optional[str] = None) -> str:
         """
@@ -113,22 +180,73 @@ class DegiroFeed(DataFeed):
 
         return product_info["symbol"]
 
-    @requests_cache_configured(hours=0.5)
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_price(self, source_id: str, instrument_type: Optional[str] = "stock") -> Price:
-        # Translate the ID
-        vwd_id = self._retrieve_vwd_id_from_product_id(int(source_id))
+        prices = self._retrieve_prices([int(source_id)])
+
+        if int(source_id) not in prices:
+            raise RuntimeError(f"No price returned for {source_id}")
+
+        return prices[int(source_id)]
+
+    @record_data_feed_metrics
+    def retrieve_prices(
+        self,
+        source_ids: Sequence[str],
+        *,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        limiter_key: Hashable = None,
+    ) -> dict[str, Price]:
+        """
+        Same as `retrieve_price()`, but for many assets with a single chart request (one series per asset).
+
+        :param source_ids: the internal IDs (product IDs) used in Degiro
+        :param limiter: bounds the in-flight requests to Degiro
+        :param limiter_key: the key used with `limiter`
+        :return: a price per source ID. Assets without data in the response are left out
+        """
+        with self._limited(limiter, limiter_key):
+            prices = self._retrieve_prices([int(source_id) for source_id in source_ids])
+
+        return {source_id: prices[int(source_id)] for source_id in source_ids if int(source_id) in prices}
+
+    def _retrieve_prices(self, product_ids: list[int]) -> dict[int, Price]:
+        vwd_ids = self._retrieve_vwd_ids_from_product_ids(product_ids)
+
+        if not vwd_ids:
+            return {}
 
         # Prepare the request
         request = self._build_request()
         request.resolution = Chart.Interval.P1D
         request.period = Chart.Interval.P1W
-        request.series.append("issueid:" + vwd_id)
+        request.series.extend("issueid:" + vwd_id for vwd_id in vwd_ids.values())
 
-        # Format the data
+        # Fetch the data
         chart = self.quotecast_api.get_chart(request=request, raw=True)
 
+        if chart is None:
+            raise RuntimeError("Something went wrong when retrieving the chart")
+
         # Format the data
-        data = chart["series"][0]["data"]
+        series = {serie["id"]: serie for serie in chart["series"] if serie.get("type") == "object"}
+        prices = {}
+
+        for product_id, vwd_id in vwd_ids.items():
+            serie = series.get("issueid:" + vwd_id)
+
+            if serie is None:
+                logger.warning("No price returned", product_id=product_id, vwd_id=vwd_id)
+                continue
+
+            prices[product_id] = self._serie_to_price(serie)
+
+        return prices
+
+    @classmethod
+    def _serie_to_price(cls, serie: dict) -> Price:
+        data = serie["data"]
 
         # Even though it's called lastPrice, it seems to be the close price (without after-hours market)
         # API can return None when it's 0
@@ -138,24 +256,74 @@ class DegiroFeed(DataFeed):
 
         return Price(last=last, change=change, change_pct=change_pct)
 
-    def _retrieve_vwd_id_from_product_id(self, product_id: int) -> str:
+    def _retrieve_vwd_ids_from_product_ids(self, product_ids: Iterable[int]) -> dict[int, str]:
         """
-        Translates the product ID to the vwd_id necessary for most quotecast_api operations
+        Translates the product IDs to the vwd_ids necessary for most quotecast_api operations
+
+        :return: the vwd_ids, by product ID. Unknown products are left out
         """
-        product_info = self._retrieve_product_info(product_id)
+        products_info = self._retrieve_products_info(product_ids)
 
-        return product_info["vwdIdSecondary"]
+        return {product_id: product_info["vwdIdSecondary"] for product_id, product_info in products_info.items()}
 
     def _retrieve_product_info(self, product_id: int) -> dict:
+        products_info = self._retrieve_products_info([product_id])
+
+        if product_id not in products_info:
+            raise RuntimeError(f"No product info returned for {product_id}")
+
+        return products_info[product_id]
+
+    def _retrieve_products_info(self, product_ids: Iterable[int]) -> dict[int, dict]:
+        """
+        Retrieves the products info (only the fields in `PRODUCT_INDEX_FIELDS`) from the product index.
+        Products not indexed yet are retrieved with a single request and added to the index.
+
+        :return: the products info, by product ID. Products left out of the response (e.g. delisted or unknown)
+        are left out too, so they don't fail the other products of the batch
+        """
+        product_ids = list(dict.fromkeys(product_ids))
+        products_info = self.product_index.get_many(str(product_id) for product_id in product_ids)
+        missing = [product_id for product_id in product_ids if str(product_id) not in products_info]
+
+        if missing:
+            response = self._get_products_info(missing)
+
+            retrieved = {
+                product_id: {field: product_info.get(field) for field in PRODUCT_INDEX_FIELDS}
+                for product_id, product_info in response["data"].items()
+            }
+
+            self.product_index.update(retrieved)
+            products_info.update(retrieved)
+
+            for product_id in missing:
+                if str(product_id) not in retrieved:
+                    logger.warning("No product info returned", product_id=product_id)
+
+        return {
+            product_id: products_info[str(product_id)] for product_id in product_ids if str(product_id) in products_info
+        }
+
+    def _get_products_info(self, product_ids: list[int]) -> dict:
+        """
+        The trading session is kept between calls (see `build_data_feed_from_source`) and expires after a while.
+        The connector returns None on errors (such as an expired session): in that case, logs in again and retries once.
+        """
         request = ProductsInfo.Request()
-        request.products.extend([product_id])
+        request.products.extend(product_ids)
 
-        products_info = self.broker_client.api_client.get_products_info(
-            request=request,
-            raw=True,
-        )
+        response = self.broker_client.api_client.get_products_info(request=request, raw=True)
+
+        if response is None:
+            logger.info("Products info request failed. Logging in again")
+            self.broker_client.api_client.connect()
+            response = self.broker_client.api_client.get_products_info(request=request, raw=True)
+
+        if response is None:
+            raise RuntimeError("Something went wrong when retrieving the products info")
 
-        return products_info["data"][str(product_id)]
+        return response
 
     def _build_request(self) -> Chart.Request:
         request = Chart.Request()
@@ -1,17 +1,19 @@
+import numpy as np
 import pandas as pd
-import requests
-import time
-from datetime import datetime, timedelta
-from typing import Optional, Mapping
+from datetime import datetime
+from typing import Hashable, Mapping, Optional, Sequence
 
 from investmentstk.data_feeds.data_feed import DataFeed, TimeResolution
 
 # Measured in minutes
 from investmentstk.models.bar import Bar
-from investmentstk.models.barset import BarSet, barset_to_ohlc_dataframe
+from investmentstk.models.bar_array import BarArray
+from investmentstk.models.barset import ohlc_columns_to_dataframe
 from investmentstk.models.price import Price
-from investmentstk.persistence.requests_cache import requests_cache_configured
-from investmentstk.utils.dataframe import convert_daily_ohlc_to_weekly, convert_daily_ohlc_to_monthly
+from investmentstk.utils.concurrency import ConcurrencyLimiter
+from investmentstk.utils.logger import get_logger
+from investmentstk.utils.metrics import record_data_feed_metrics
+from investmentstk.utils.single_flight import single_flight
 
 TIME_RESOLUTION_TO_KRAKEN_API_RESOLUTION_MAP = {
     TimeResolution.day: 24 * 60,  # Maximum (720 bars)
@@ -25,6 +27,8 @@ TIME_RESOLUTION_TO_KRAKEN_API_TIME_RANGE_MAP = {
     TimeResolution.month: -1,  # Not supported by the API
 }
 
+logger = get_logger()
+
 
 class KrakenFeed(DataFeed):
     """
@@ -35,58 +39,67 @@ class KrakenFeed(DataFeed):
     converts the results to week or month depending using pandas resample().
     """
 
-    @requests_cache_configured()
+    BASE_URL = "https://api.kraken.com"
+
     def _retrieve_bars(
         self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
-    ) -> BarSet:
+    ) -> BarArray:
         """
         https://docs.kraken.com/rest/#operation/getOHLCData
+
+        Not used by `retrieve_ohlc()`. The whole response is converted at once, as in `retrieve_ohlc()`.
+        """
+        return BarArray.from_dataframe(
+            self._ohlc_to_dataframe(self._retrieve_ohlc_rows(source_id, resolution=resolution))
+        )
+
+    def _retrieve_ohlc_rows(self, source_id: str, *, resolution: TimeResolution, since: int = 0) -> list[list]:
+        """
+        :param since: only bars from this UNIX timestamp (exclusive) onwards. The API returns at most 720 bars
         """
         if resolution == TimeResolution.month:
             raise NotImplementedError("Kraken feed API does not support monthly OHLC")
 
-        response = requests.get(
-            "https://api.kraken.com/0/public/OHLC",
-            params=dict(
-                pair=source_id, interval=str(TIME_RESOLUTION_TO_KRAKEN_API_RESOLUTION_MAP[resolution]), since="0"
+        data = self._get_public(
+            "OHLC",
+            dict(
+                pair=source_id, interval=str(TIME_RESOLUTION_TO_KRAKEN_API_RESOLUTION_MAP[resolution]), since=str(since)
             ),
         )
 
-        response.raise_for_status()
-        data = response.json()
-
-        if data["error"]:
-            raise RuntimeError(f'Something went wrong: {data["error"]}')
-
-        bars: BarSet = set()
-        data = data["result"]
-
         # Result has only 2 keys: "last" and an internal id of the asset. If we drop "last", only
         # what we need is left
         data.pop("last")
-        data = list(data.values())[0]
-
-        for ohlc in data:
-            bars.add(self._ohlc_to_bar(ohlc))
 
-        return bars
+        return list(data.values())[0]
 
-    @requests_cache_configured()
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_ohlc(
-        self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution = TimeResolution.day,
+        instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
     ) -> pd.DataFrame:
-        bars = self._retrieve_bars(source_id, resolution=TimeResolution.day)
-        df = barset_to_ohlc_dataframe(bars)
-
-        if resolution == TimeResolution.week:
-            return convert_daily_ohlc_to_weekly(df)
+        """
+        The API returns at most the last 720 days, so `min_bars` only makes a difference for shorter lookbacks
+        """
+        return self._retrieve_ohlc_from_daily(source_id, resolution=resolution, min_bars=min_bars)
 
-        if resolution == TimeResolution.month:
-            return convert_daily_ohlc_to_monthly(df)
+    def _retrieve_daily_ohlc_from_source(
+        self, source_id: str, *, instrument_type: Optional[str] = None, since: Optional[pd.Timestamp] = None
+    ) -> pd.DataFrame:
+        # One second before, so the last bar we have (which may still have been open) is included
+        since_timestamp = int(since.timestamp()) - 1 if since is not None else 0
 
-        return df
+        return self._ohlc_to_dataframe(
+            self._retrieve_ohlc_rows(source_id, resolution=TimeResolution.day, since=since_timestamp)
+        )
 
-    @requests_cache_configured()
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_asset_name(self, source_id: str, instrument_type: Optional[str] = None) -> str:
         """
         I couldn't find any API endpoint that returns a more descriptive name of the asset,
@@ -96,19 +109,69 @@ class KrakenFeed(DataFeed):
 
         return source_id
 
+    @single_flight
+    @record_data_feed_metrics
     def retrieve_price(self, source_id: str, instrument_type: Optional[str] = None) -> Price:
         """
-        There's no endpoint that already gives us the 24h change in % or absolute, so we use the
-        OHLC endpoint and request hourly data for the last 24 hours.
+        Uses the ticker, which has the last price and the opening price of the day (00:00 UTC).
+        The change is relative to the opening price.
+        """
+        return self._retrieve_tickers([source_id])[source_id]
+
+    @record_data_feed_metrics
+    def retrieve_prices(
+        self,
+        source_ids: Sequence[str],
+        *,
+        limiter: Optional[ConcurrencyLimiter] = None,
+        limiter_key: Hashable = None,
+    ) -> dict[str, Price]:
+        """
+        Same as `retrieve_price()`, but for many pairs with a single ticker request.
 
+        The API rejects the whole request when any of the pairs is unknown. In that case, it falls back
+        to one request per pair, so only the unknown ones are left out.
         """
-        one_day_ago = datetime.utcnow() - timedelta(hours=24)
-        since = time.mktime(one_day_ago.utctimetuple())
+        source_ids = list(dict.fromkeys(source_ids))
 
-        response = requests.get(
-            "https://api.kraken.com/0/public/OHLC",
-            params=dict(pair=source_id, interval="60", since=str(since)),  # hourly
-        )
+        try:
+            with self._limited(limiter, limiter_key):
+                return self._retrieve_tickers(source_ids)
+        except RuntimeError as e:
+            logger.warning(f"Retrieving the prices one by one. {e}", source_ids=source_ids)
+
+            return super().retrieve_prices(source_ids, limiter=limiter, limiter_key=limiter_key)
+
+    def _retrieve_tickers(self, source_ids: list[str]) -> dict[str, Price]:
+        """
+        https://docs.kraken.com/rest/#operation/getTickerInformation
+        """
+        tickers = self._get_public("Ticker", dict(pair=",".join(source_ids)))
+
+        # The result uses the pair names (e.g. XXBTZEUR), which are not always the ones requested (e.g. XBTEUR)
+        if not all(source_id in tickers for source_id in source_ids):
+            pair_names = self._retrieve_pair_names(source_ids)
+            tickers = {source_id: tickers[pair_names[source_id]] for source_id in source_ids}
+
+        return {source_id: self._ticker_to_price(tickers[source_id]) for source_id in source_ids}
+
+    def _retrieve_pair_names(self, source_ids: list[str]) -> dict[str, str]:
+        """
+        https://docs.kraken.com/rest/#operation/getTradableAssetPairs
+
+        :return: the pair name per pair name or alternative name (e.g. XBTEUR -> XXBTZEUR)
+        """
+        asset_pairs = self._get_public("AssetPairs", dict(pair=",".join(source_ids)), cached=True)
+        pair_names = {}
+
+        for name, asset_pair in asset_pairs.items():
+            pair_names[name] = name
+            pair_names[asset_pair["altname"]] = name
+
+        return {source_id: pair_names[source_id] for source_id in source_ids}
+
+    def _get_public(self, endpoint: str, params: dict, *, cached: bool = False) -> dict:
+        response = self._http_session(cached=cached).get(f"{self.BASE_URL}/0/public/{endpoint}", params=params)
 
         response.raise_for_status()
         data = response.json()
@@ -116,31 +179,41 @@ class KrakenFeed(DataFeed):
         if data["error"]:
             raise RuntimeError(f'Something went wrong: {data["error"]}')
 
-        data = data["result"]
-
-        # Result has only 2 keys: "last" and an internal id of the asset. If we drop "last", only
-        # what we need is left
-        data.pop("last")
-        data = list(data.values())[0]
+        return data["result"]
 
-        price_24h_ago = float(data[0][3])
-        price_now = float(data[-1][3])
+    @classmethod
+    def _ticker_to_price(cls, ticker: Mapping) -> Price:
+        last = float(ticker["c"][0])
+        opening = float(ticker["o"])
 
-        change = price_now - price_24h_ago
-        change_pct = change / price_24h_ago * 100
+        change = last - opening
+        change_pct = change / opening * 100
 
-        return Price(last=price_now, change=change, change_pct=change_pct)
+        return Price(last=last, change=change, change_pct=change_pct)
 
     @classmethod
-    def _ohlc_to_bar(cls, ohlc: Mapping) -> Bar:
+    def _ohlc_to_bar(cls, ohlc: Sequence) -> Bar:
         """
         Converts a bar OHLC representation from Kraken into our
         representation.
         """
         return Bar(
-            time=datetime.fromtimestamp(ohlc[0]),
+            time=datetime.utcfromtimestamp(ohlc[0]),
             open=float(ohlc[1]),
             high=float(ohlc[2]),
             low=float(ohlc[3]),
             close=float(ohlc[4]),
         )
+
+    @classmethod
+    def _ohlc_to_dataframe(cls, rows: list[list]) -> pd.DataFrame:
+        """
+        Vectorized version of `_ohlc_to_bar()`, converting all the rows of a response at once.
+        Each row is [time, open, high, low, close, vwap, volume, count], with the prices encoded as strings.
+        """
+        columns = np.array(rows, dtype=object).reshape(len(rows), 8)  # Also when there are no rows
+        prices = columns[:, 1:5].astype(float)
+
+        time = pd.DatetimeIndex(pd.to_datetime(columns[:, 0].astype(np.int64), unit="s"))
+
+        return ohlc_columns_to_dataframe(time, prices[:, 0], prices[:, 1], prices[:, 2], prices[:, 3])
@@ -39,13 +39,16 @@ import numpy as np
 import pandas as pd
 from pandas import DataFrame
 
+from investmentstk.data_feeds.data_feed import TimeResolution
 from investmentstk.models.asset import Asset
 from investmentstk.strategy.brito_trend_following import (
     PERIODICITY_PER_BROKER,
     ATR_MULTIPLIER_PER_PERIODICITY,
     ATR_PERIOD,
+    ATR_LOOKBACK_BARS,
 )
 from investmentstk.utils.calendar import is_last_bar_closed
+from investmentstk.utils.metrics import timed_stage
 
 
 def average_true_range(dataframe: DataFrame, periods: int = 14) -> pd.Series:
@@ -81,6 +84,7 @@ def average_true_range(dataframe: DataFrame, periods: int = 14) -> pd.Series:
     return atr
 
 
+@timed_stage("atr")
 def average_true_range_trailing_stop(dataframe: pd.DataFrame, periods: int = 14, multiplier: float = 3) -> pd.DataFrame:
     """
     Calculates a trailing stop using the ATR formula.
@@ -135,21 +139,53 @@ def average_true_range_trailing_stop(dataframe: pd.DataFrame, periods: int = 14,
     return dataframe
 
 
-def atr_stop_loss_from_asset(asset: Asset) -> pd.DataFrame:
+def atr_stop_loss_from_asset(asset: Asset, min_bars: int = ATR_LOOKBACK_BARS) -> pd.DataFrame:
     """
     Convenience function to calculate the ATR stop loss from an asset.
 
     Retrieves the barset with the appropriate resolution depending on the source
     and excludes the current bar if it's not the end of the week/month.
 
+    :param min_bars: how many of the most recent bars to retrieve (see `retrieve_ohlc_for_atr_stop_loss()`)
     :return: a BarSet dataframe with the ATR and ATR stop loss
     """
+    dataframe, resolution = retrieve_ohlc_for_atr_stop_loss(asset, min_bars)
 
+    return atr_stop_loss_from_ohlc(dataframe, resolution)
+
+
+def retrieve_ohlc_for_atr_stop_loss(
+    asset: Asset, min_bars: int = ATR_LOOKBACK_BARS
+) -> tuple[pd.DataFrame, TimeResolution]:
+    """
+    Retrieves the OHLC data with the appropriate resolution (depending on the source) to calculate the stop loss.
+    Split from the calculation itself so the (IO bound) retrieval and the (CPU bound) calculation
+    can run on different executors.
+
+    :param min_bars: how many of the most recent bars are needed. By default, enough for the latest stop loss.
+    To use more than the latest stops, add the bars needed for the ATR to warm up (`ATR_PERIOD`)
+    """
     resolution = PERIODICITY_PER_BROKER[asset.source]
+
+    return asset.retrieve_ohlc(resolution=resolution, min_bars=min_bars), resolution
+
+
+def atr_stop_loss_from_ohlc(dataframe: pd.DataFrame, resolution: TimeResolution) -> pd.DataFrame:
+    """
+    Calculates the ATR stop loss using the multiplier of the given resolution and excludes the current bar
+    if it's not the end of the week/month.
+    """
     multiplier = ATR_MULTIPLIER_PER_PERIODICITY[resolution]
 
     offset = None if is_last_bar_closed(resolution) else -1
 
-    dataframe = asset.retrieve_ohlc(resolution=resolution)
     dataframe = average_true_range_trailing_stop(dataframe, periods=ATR_PERIOD, multiplier=multiplier)
     return dataframe[0:offset]
+
+
+def latest_atr_stop_loss_from_ohlc(dataframe: pd.DataFrame, resolution: TimeResolution) -> float:
+    """
+    Same as `atr_stop_loss_from_ohlc()`, but only returns the stop loss of the latest closed bar.
+    Cheaper to send back when running on a process pool.
+    """
+    return atr_stop_loss_from_ohlc(dataframe, resolution)["stop"][-1]
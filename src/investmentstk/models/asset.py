@@ -2,15 +2,20 @@ import dataclasses
 from dataclasses import dataclass
 
 import pandas as pd
-from typing import Optional, Mapping
+from typing import Optional, Mapping, Sequence
 
 from investmentstk.data_feeds.data_feed import TimeResolution
 from investmentstk.models.source import Source, build_data_feed_from_source
 from investmentstk.persistence import asset_cache
+from investmentstk.persistence.price_cache import CachedPrice, build_price_cache
+from investmentstk.utils.concurrency import run_in_io_pool
 from investmentstk.utils.logger import get_logger, logger_autobind_from_args
 
 logger = get_logger()
 
+# The last prices retrieved, by source and source ID
+price_cache = build_price_cache()
+
 
 @dataclass(frozen=True)
 class Asset:
@@ -47,16 +52,69 @@ class Asset:
 
             return asset
 
-    def retrieve_ohlc(self, resolution: TimeResolution = TimeResolution.day) -> pd.DataFrame:
+    def retrieve_ohlc(
+        self, resolution: TimeResolution = TimeResolution.day, min_bars: Optional[int] = None
+    ) -> pd.DataFrame:
+        """
+        :param min_bars: how many of the most recent bars are needed (see `DataFeed.retrieve_ohlc()`)
+        """
+        client = build_data_feed_from_source(self.source)
+        return client.retrieve_ohlc(self.source_id, resolution=resolution, min_bars=min_bars)
+
+    async def aretrieve_ohlc(
+        self, resolution: TimeResolution = TimeResolution.day, min_bars: Optional[int] = None
+    ) -> pd.DataFrame:
         client = build_data_feed_from_source(self.source)
-        return client.retrieve_ohlc(self.source_id, resolution=resolution)
+        return await client.aretrieve_ohlc(self.source_id, resolution=resolution, min_bars=min_bars)
 
     def retrieve_price(self) -> dict:
+        """
+        Served from the price cache (see `persistence/price_cache.py`) when recent enough
+
+        :return: the price details, with how old the price is (in seconds) as "age_seconds"
+        """
         client = build_data_feed_from_source(self.source)
+        cached = price_cache.get(self.source, self.source_id, client.retrieve_price)
+
+        return self._price_to_dict(cached)
+
+    async def aretrieve_price(self) -> dict:
+        return await run_in_io_pool(self.retrieve_price)
+
+    @classmethod
+    def retrieve_prices(cls, assets: Sequence["Asset"], **kwargs) -> dict[str, dict]:
+        """
+        Retrieves the prices of many assets from the same source, with the bulk method of its data feed.
+
+        :param assets: assets from the same source
+        :param kwargs: passed to `DataFeed.retrieve_prices()`
+        :return: the prices by FQN ID. Assets whose price could not be retrieved are left out
+        """
+        sources = {asset.source for asset in assets}
+
+        if not sources:
+            return {}
+
+        if len(sources) > 1:
+            raise ValueError(f"Expected assets from a single source, got {sorted(source.name for source in sources)}")
+
+        source = sources.pop()
+        client = build_data_feed_from_source(source)
+        prices = price_cache.get_many(
+            source,
+            [asset.source_id for asset in assets],
+            lambda source_ids: client.retrieve_prices(source_ids, **kwargs),
+        )
+
+        return {
+            asset.fqn_id: asset._price_to_dict(prices[asset.source_id]) for asset in assets if asset.source_id in prices
+        }
 
+    def _price_to_dict(self, cached: CachedPrice) -> dict:
         output = dict(fqn_id=self.fqn_id, name=self.name)
 
-        output.update(dataclasses.asdict(client.retrieve_price(self.source_id)))
+        output.update(dataclasses.asdict(cached.price))
+        output["age_seconds"] = round(cached.age, 1)
 
         return output
 
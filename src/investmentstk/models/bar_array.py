@@ -0,0 +1,191 @@
+from datetime import datetime
+from typing import Iterable, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from investmentstk.models.bar import Bar
+
+COMPONENTS = ["open", "high", "low", "close"]
+
+
+class BarArray:
+    """
+    A columnar container of price bars: one contiguous NumPy array per component (time as datetime64, OHLC as
+    float64), sorted by time and with one bar per time. Replaces sets of `Bar` objects, which pay for validation,
+    hashing and memory per bar and have to be sorted again on every conversion.
+
+    Timezone aware times are stored in UTC, with the timezone kept aside. Instances are immutable (the arrays are
+    read-only): operations return new instances.
+
+    Iterating over it yields `Bar` objects, for code still expecting them.
+    """
+
+    __slots__ = ("time", "tz", "_values")
+
+    def __init__(
+        self,
+        time: Union[pd.DatetimeIndex, np.ndarray, Iterable],
+        open: Iterable[float],
+        high: Iterable[float],
+        low: Iterable[float],
+        close: Iterable[float],
+        *,
+        tz: Optional[str] = None,
+    ):
+        """
+        Bars with the same time are deduplicated, keeping the last one.
+
+        :param time: the times of the bars. If timezone aware, `tz` is taken from it
+        :param tz: the timezone of `time`, when given as UTC datetime64 values
+        """
+        index = pd.DatetimeIndex(time)
+
+        if index.tz is not None:
+            tz = str(index.tz)
+            index = index.tz_convert("UTC").tz_localize(None)
+
+        times = index.to_numpy(dtype="datetime64[ns]", copy=True)
+        values = np.vstack([np.asarray(column, dtype=np.float64) for column in (open, high, low, close)])
+
+        if values.shape[1] != len(times):
+            raise ValueError(f"Expected {len(times)} values per component, got {values.shape[1]}")
+
+        # Most sources return the bars sorted, in which case nothing has to be copied
+        if len(times) > 1 and not (times[1:] > times[:-1]).all():
+            order = np.argsort(times, kind="stable")
+            times = times[order]
+            values = values[:, order]
+
+            # The last bar of each time
+            last = np.append(times[1:] != times[:-1], True)
+            times = times[last]
+            values = values[:, last]
+
+        self.time: np.ndarray = times
+        self.tz = tz
+        self._values = np.ascontiguousarray(values)
+
+        self.time.flags.writeable = False
+        self._values.flags.writeable = False
+
+    @property
+    def open(self) -> np.ndarray:
+        return self._values[0]
+
+    @property
+    def high(self) -> np.ndarray:
+        return self._values[1]
+
+    @property
+    def low(self) -> np.ndarray:
+        return self._values[2]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self._values[3]
+
+    @classmethod
+    def from_bars(cls, bars: Iterable[Bar]) -> "BarArray":
+        bars = list(bars)
+
+        return cls(
+            pd.DatetimeIndex([bar.time for bar in bars]),
+            [bar.open for bar in bars],
+            [bar.high for bar in bars],
+            [bar.low for bar in bars],
+            [bar.close for bar in bars],
+        )
+
+    @classmethod
+    def from_dataframe(cls, dataframe: pd.DataFrame) -> "BarArray":
+        """
+        :param dataframe: OHLC dataframe, indexed by time
+        """
+        return cls(dataframe.index, *(dataframe[component].to_numpy() for component in COMPONENTS))
+
+    @classmethod
+    def from_csv_string(cls, csv_string: str) -> "BarArray":
+        """
+        Expected format:
+        date,open,high,low,close
+
+        without headers
+        """
+        rows = [[value.strip() for value in row.split(",")] for row in csv_string.strip().split("\n")]
+        time, open, high, low, close = zip(*rows)
+
+        return cls(pd.to_datetime(list(time)), open, high, low, close)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        The dataframe is indexed by time and each component of the bar (OHLC) becomes a column. The values are not
+        copied: the dataframe is a read-only view of the same arrays. Use `copy()` on it to modify it.
+        """
+        index = pd.DatetimeIndex(self.time, name="time")
+
+        if self.tz:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+
+        return pd.DataFrame(self._values.T, index=index, columns=COMPONENTS, copy=False)
+
+    def merge(self, other: "BarArray") -> "BarArray":
+        """
+        All the bars of both. For the same time, the bar from `other` is kept
+        """
+        self._check_same_tz(other)
+
+        return BarArray(
+            np.concatenate([self.time, other.time]),
+            *np.hstack([self._values, other._values]),
+            tz=self.tz,
+        )
+
+    def append(self, other: "BarArray") -> "BarArray":
+        """
+        Merges newly retrieved bars (see `utils.dataframe.append_ohlc()`): bars from `other` replace the ones with
+        the same or a later time
+        """
+        self._check_same_tz(other)
+
+        if not len(other):
+            return self
+
+        kept = self.time < other.time[0]
+
+        return BarArray(
+            np.concatenate([self.time[kept], other.time]),
+            *np.hstack([self._values[:, kept], other._values]),
+            tz=self.tz,
+        )
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def __getitem__(self, position: int) -> Bar:
+        return Bar(
+            time=self._datetime(self.time[position]),
+            open=self._values[0, position],
+            high=self._values[1, position],
+            low=self._values[2, position],
+            close=self._values[3, position],
+        )
+
+    def __iter__(self) -> Iterator[Bar]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def __repr__(self) -> str:
+        return f"BarArray({len(self)} bars)"
+
+    def _datetime(self, time: np.datetime64) -> datetime:
+        timestamp = pd.Timestamp(time)
+
+        if self.tz:
+            timestamp = timestamp.tz_localize("UTC").tz_convert(self.tz)
+
+        return timestamp.to_pydatetime()
+
+    def _check_same_tz(self, other: "BarArray") -> None:
+        if self.tz != other.tz:
+            raise ValueError(f"Can't combine bars with different timezones: {self.tz} and {other.tz}")
@@ -1,7 +1,12 @@
+import json
+import os
+import threading
 from enum import Enum
 from typing import Type
 
-from investmentstk.data_feeds import AvanzaFeed, CMCFeed, DataFeed, KrakenFeed, DegiroFeed
+from investmentstk import data_feeds
+from investmentstk.data_feeds.data_feed import DataFeed
+from investmentstk.utils.concurrency import ConcurrencyLimiter
 
 
 class Source(str, Enum):
@@ -17,21 +22,65 @@ class Source(str, Enum):
     Nordnet = "NN"
 
 
-SOURCES_DATA_FEED_MAP: dict[Source, Type[DataFeed]] = {
-    Source.Avanza: AvanzaFeed,
-    Source.CMC: CMCFeed,
-    Source.Degiro: DegiroFeed,
-    Source.Kraken: KrakenFeed,
-    Source.Nordnet: AvanzaFeed,  # TODO: Not very elegant and very specific to my needs
+# Names of the classes in `investmentstk.data_feeds`, only imported when a source is used for the first time
+SOURCES_DATA_FEED_MAP: dict[Source, str] = {
+    Source.Avanza: "AvanzaFeed",
+    Source.CMC: "CMCFeed",
+    Source.Degiro: "DegiroFeed",
+    Source.Kraken: "KrakenFeed",
+    Source.Nordnet: "AvanzaFeed",  # TODO: Not very elegant and very specific to my needs
 }
 
 
+# Instances already built, per class name. Feeds hold no per-call state, so a single instance can be shared
+_data_feeds: dict[str, DataFeed] = {}
+
+# Per class name, so a slow feed to build (e.g. logging in to Degiro) does not block the other ones
+_data_feed_locks: dict[str, threading.Lock] = {}
+_data_feed_locks_lock = threading.Lock()
+
+
 def build_data_feed_from_source(source: Source) -> DataFeed:
     """
     Returns an instance of the `DataFeed` implementation associated
     with the given `Source`.
 
+    The instance is built on the first call and reused afterwards (including by sources sharing the same
+    implementation), keeping its clients (and their connections, logins, etc) alive between calls.
+
     :param source:
     :return:
     """
-    return SOURCES_DATA_FEED_MAP[source]()
+    class_name = SOURCES_DATA_FEED_MAP[source]
+    data_feed = _data_feeds.get(class_name)
+
+    if data_feed is not None:
+        return data_feed
+
+    with _data_feed_locks_lock:
+        lock = _data_feed_locks.setdefault(class_name, threading.Lock())
+
+    with lock:
+        if class_name not in _data_feeds:
+            data_feed_class: Type[DataFeed] = getattr(data_feeds, class_name)
+            _data_feeds[class_name] = data_feed_class()
+
+    return _data_feeds[class_name]
+
+
+def _build_source_limiter() -> ConcurrencyLimiter:
+    """
+    Maximum number of in-flight requests per source, shared by all the requests to our server.
+
+    Optionally configured as a JSON object (to keep the same format as the other settings), using the source
+    short names as keys. Example: {"default": 4, "DG": 2}
+    """
+    settings = json.loads(os.environ.get("MAX_IN_FLIGHT_REQUESTS_PER_SOURCE", "{}"))
+    default_limit = settings.pop("default", 4)
+
+    return ConcurrencyLimiter(
+        default_limit=default_limit, limits={Source(source): limit for source, limit in settings.items()}
+    )
+
+
+source_limiter = _build_source_limiter()
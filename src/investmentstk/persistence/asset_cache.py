@@ -1,12 +1,15 @@
 import os
 from dataclasses import dataclass
-from typing import Optional, Mapping
+from typing import Optional, Mapping, TYPE_CHECKING
 
-from google.cloud import firestore
+import wrapt
 
 from investmentstk.models import asset
 from investmentstk.utils.logger import get_logger
 
+if TYPE_CHECKING:
+    from google.cloud import firestore
+
 GCP_PROJECT_NAME = os.environ.get("GCP_PROJECT_NAME")
 CACHE_COLLECTION_NAME = "cache"
 ASSETS_CACHE_DOCUMENT_NAME = "assets"
@@ -21,14 +24,19 @@ class AssetCache:
     """
 
     assets: Optional[Mapping[str, "asset.Asset"]]
-    remote_db: firestore.Client
-    assets_ref: firestore.DocumentReference
+    remote_db: "firestore.Client"
+    assets_ref: "firestore.DocumentReference"
 
     __instance = None
 
     # Singleton pattern: https://python-3-patterns-idioms-test.readthedocs.io/en/latest/Singleton.html
+    # Synchronized since bulk endpoints resolve assets from multiple threads
+    @wrapt.synchronized
     def __new__(cls):
         if AssetCache.__instance is None:
+            # Imported here as it's a heavy dependency that slows down the server cold start
+            from google.cloud import firestore
+
             logger.debug("Creating a new instance")
             AssetCache.__instance = object.__new__(cls)
 
@@ -78,6 +86,8 @@ class AssetCache:
             logger.debug("Cache is disabled")
             return None
 
+        from google.cloud import firestore
+
         self.assets_ref.update({firestore.Client.field_path(asset.fqn_id): asset.to_dict()})
 
         # Invalidates the cache
@@ -0,0 +1,132 @@
+"""
+A local store of OHLC dataframes, in a columnar format that can be loaded without parsing.
+
+Each entry is made of two files:
+
+* `<digest>.npy`: a numpy array with one row per column (time as int64 nanoseconds, then open, high, low and close
+  as float64), memory-mapped when loaded. Prices become the dataframe values and times its index without
+  being copied.
+* `<digest>.json`: the metadata (the key, the columns, the timezone of the index, when it was retrieved and from
+  when it was requested)
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Hashable, Optional
+
+import numpy as np
+import pandas as pd
+
+from investmentstk.utils.logger import get_logger
+
+current_folder = Path(__file__).resolve().parent
+ohlc_store_folder = current_folder / "../../.." / "cache" / "ohlc_store"
+
+logger = get_logger()
+
+
+@dataclass(frozen=True)
+class StoredOhlc:
+    dataframe: pd.DataFrame
+    # UNIX times of the last time the whole history was retrieved and of the last time it was updated
+    retrieved_at: float
+    refreshed_at: float
+    # The earliest time requested when retrieving it, or None if the longest history available was requested
+    start: Optional[pd.Timestamp] = None
+
+
+class OhlcStore:
+    """
+    Stores OHLC dataframes (indexed by time, with float columns) on disk, with when they were retrieved.
+
+    Loaded dataframes are copy-on-write memory maps of the stored arrays: they can be modified by the callers,
+    without affecting the store or each other.
+    """
+
+    def __init__(self, folder: Path = ohlc_store_folder):
+        self.folder = folder
+
+    def get(self, key: Hashable) -> Optional[StoredOhlc]:
+        try:
+            metadata = json.loads(self._path(key, ".json").read_text())
+            array = np.load(self._path(key, ".npy"), mmap_mode="c")
+        except FileNotFoundError:
+            return None
+
+        # Protects against (unlikely) hash collisions
+        if metadata["key"] != repr(key):
+            return None
+
+        # The files are read without a lock: a concurrent `set()` of the same key may have replaced the array after
+        # the metadata was read
+        if array.shape != (len(metadata["columns"]) + 1, metadata["bars"]):
+            logger.debug("Metadata does not match the array. Ignoring it", key=metadata["key"])
+            return None
+
+        index = pd.DatetimeIndex(array[0].view("datetime64[ns]"), name=metadata["index_name"])
+
+        if metadata["tz"]:
+            index = index.tz_localize("UTC").tz_convert(metadata["tz"])
+
+        dataframe = pd.DataFrame(array[1:].T, index=index, columns=metadata["columns"], copy=False)
+
+        start = pd.Timestamp(metadata["start"]) if metadata.get("start") else None
+
+        return StoredOhlc(
+            dataframe, retrieved_at=metadata["retrieved_at"], refreshed_at=metadata["refreshed_at"], start=start
+        )
+
+    def set(
+        self,
+        key: Hashable,
+        dataframe: pd.DataFrame,
+        *,
+        retrieved_at: float,
+        refreshed_at: Optional[float] = None,
+        start: Optional[pd.Timestamp] = None,
+    ) -> None:
+        index = pd.DatetimeIndex(dataframe.index)
+        tz = str(index.tz) if index.tz else None
+
+        # Timezone aware times are stored in UTC
+        times = (index.tz_convert("UTC").tz_localize(None) if tz else index).asi8
+        array = np.vstack([times.view(np.float64), dataframe.to_numpy(dtype=np.float64).T])
+
+        metadata = dict(
+            key=repr(key),
+            columns=list(dataframe.columns),
+            index_name=index.name,
+            tz=tz,
+            retrieved_at=retrieved_at,
+            refreshed_at=refreshed_at or retrieved_at,
+            start=start.isoformat() if start is not None else None,
+            bars=len(dataframe),
+        )
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+        # The array first: an entry is only visible once its metadata is written
+        self._write(self._path(key, ".npy"), lambda file: np.save(file, array))
+        self._write(self._path(key, ".json"), lambda file: file.write(json.dumps(metadata).encode()))
+
+    def clear(self) -> None:
+        for file_path in [*self.folder.glob("*.json"), *self.folder.glob("*.npy")]:
+            os.remove(file_path)
+
+    def _path(self, key: Hashable, suffix: str) -> Path:
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return self.folder / f"{digest}{suffix}"
+
+    @staticmethod
+    def _write(path: Path, write) -> None:
+        # Write and rename, so concurrent readers never see a partially written file
+        temp_path = path.with_suffix(f".{threading.get_ident()}.{time.monotonic_ns()}.tmp")
+
+        with open(temp_path, "wb") as file:
+            write(file)
+
+        temp_path.replace(path)
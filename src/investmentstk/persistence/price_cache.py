@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Hashable, Mapping, Optional, Sequence
+
+from investmentstk.models.price import Price
+from investmentstk.models.source import Source
+from investmentstk.utils.concurrency import get_io_thread_pool
+from investmentstk.utils.logger import get_logger
+
+logger = get_logger()
+
+# Retrieves the prices of many assets of a source, by source ID. Assets without a price are left out
+RetrievePrices = Callable[[list[str]], Mapping[str, Price]]
+
+# Per source short name, and "default" for the ones not listed
+DEFAULT_TTL_SECONDS = {"default": 15, "DG": 60}
+
+
+@dataclass(frozen=True)
+class CachedPrice:
+    price: Price
+    # UNIX time of when the price was requested from the source
+    retrieved_at: float
+
+    @property
+    def age(self) -> float:
+        """
+        How old the price is, in seconds
+        """
+        return time.time() - self.retrieved_at
+
+
+class PriceCache:
+    """
+    Keeps the last prices retrieved in memory, for a short time (TTL) configured per source. Meant for dashboards
+    polling the same prices over and over.
+
+    Stale-while-revalidate: for `max_stale` seconds after expiring, a price is still served immediately, while
+    it's refreshed in the background (once at a time per asset). Prices older than that are retrieved before
+    being served. A TTL of 0 disables the cache for the source.
+    """
+
+    def __init__(self, *, default_ttl: float, ttls: Optional[Mapping[Hashable, float]] = None, max_stale: float):
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.max_stale = max_stale
+
+        self._entries: dict[tuple[Hashable, str], CachedPrice] = {}
+        self._refreshing: set[tuple[Hashable, str]] = set()
+        self._lock = threading.Lock()
+
+    def ttl_for(self, source: Hashable) -> float:
+        return self.ttls.get(source, self.default_ttl)
+
+    def get(self, source: Hashable, source_id: str, retrieve: Callable[[str], Price]) -> CachedPrice:
+        """
+        :param retrieve: retrieves the price from the source. Exceptions are raised as they are
+        """
+        cached = self.get_many(
+            source, [source_id], lambda source_ids: {source_id: retrieve(source_id) for source_id in source_ids}
+        )
+
+        return cached[source_id]
+
+    def get_many(
+        self, source: Hashable, source_ids: Sequence[str], retrieve_many: RetrievePrices
+    ) -> dict[str, CachedPrice]:
+        """
+        :param retrieve_many: retrieves the prices from the source, called only for the assets not in the cache
+        :return: the prices by source ID. Assets without a price are left out
+        """
+        ttl = self.ttl_for(source)
+        now = time.time()
+
+        found: dict[str, CachedPrice] = {}
+        stale: list[str] = []
+        missing: list[str] = []
+
+        with self._lock:
+            for source_id in dict.fromkeys(source_ids):
+                cached = self._entries.get((source, source_id)) if ttl > 0 else None
+
+                if cached is None or now - cached.retrieved_at >= ttl + self.max_stale:
+                    missing.append(source_id)
+                    continue
+
+                found[source_id] = cached
+
+                if now - cached.retrieved_at >= ttl and (source, source_id) not in self._refreshing:
+                    stale.append(source_id)
+                    self._refreshing.add((source, source_id))
+
+        if stale:
+            logger.debug("Refreshing stale prices in the background", source=source, source_ids=stale)
+            get_io_thread_pool().submit(self._refresh, source, stale, retrieve_many)
+
+        if missing:
+            found.update(self._retrieve(source, missing, retrieve_many))
+
+        return found
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _retrieve(
+        self, source: Hashable, source_ids: list[str], retrieve_many: RetrievePrices
+    ) -> dict[str, CachedPrice]:
+        retrieved_at = time.time()
+        prices = retrieve_many(source_ids)
+        cached = {source_id: CachedPrice(price, retrieved_at) for source_id, price in prices.items()}
+
+        if self.ttl_for(source) > 0:
+            with self._lock:
+                self._entries.update(((source, source_id), price) for source_id, price in cached.items())
+
+        return cached
+
+    def _refresh(self, source: Hashable, source_ids: list[str], retrieve_many: RetrievePrices) -> None:
+        """
+        Runs in the background. On errors, the stale prices are kept (until they are too old to be served)
+        """
+        try:
+            self._retrieve(source, source_ids, retrieve_many)
+        except Exception as e:
+            logger.error(f"Exception raised. {type(e).__name__}: {e}", source=source, error=type(e).__name__)
+        finally:
+            with self._lock:
+                self._refreshing.difference_update((source, source_id) for source_id in source_ids)
+
+
+def build_price_cache() -> PriceCache:
+    """
+    Builds a price cache configured through environment variables:
+
+    * PRICE_CACHE_TTL_SECONDS: TTL per source, as a JSON object using the source short names as keys and "default"
+      for the ones not listed. Merged into the defaults ({"default": 15, "DG": 60})
+    * PRICE_CACHE_MAX_STALE_SECONDS: how long after expiring a price can still be served while it's refreshed
+      (defaults to 300)
+    """
+    settings = {**DEFAULT_TTL_SECONDS, **json.loads(os.environ.get("PRICE_CACHE_TTL_SECONDS", "{}"))}
+    default_ttl = settings.pop("default")
+    max_stale = float(os.environ.get("PRICE_CACHE_MAX_STALE_SECONDS", 300))
+
+    return PriceCache(
+        default_ttl=default_ttl,
+        ttls={Source(source): ttl for source, ttl in settings.items()},
+        max_stale=max_stale,
+    )
@@ -0,0 +1,66 @@
+import json
+import threading
+from pathlib import Path
+from typing import Iterable, Mapping, Optional
+
+from investmentstk.utils.logger import get_logger
+
+current_folder = Path(__file__).resolve().parent
+product_index_folder = current_folder / "../../.." / "cache" / "product_index"
+
+logger = get_logger()
+
+
+class ProductIndex:
+    """
+    A durable index of metadata that never changes for a given product ID (such as the IDs used by another
+    provider to identify it), so translating an ID requires a network call only once.
+
+    Entries are kept in memory and in a JSON file, which is loaded on the first lookup and survives restarts
+    of the server. Unlike `requests_cache`, entries do not expire.
+    """
+
+    def __init__(self, name: str, *, folder: Path = product_index_folder):
+        self.name = name
+        self.path = folder / f"{name}.json"
+
+        self._entries: Optional[dict[str, dict]] = None
+        self._lock = threading.Lock()
+
+    def get(self, product_id: str) -> Optional[dict]:
+        return self.get_many([product_id]).get(product_id)
+
+    def get_many(self, product_ids: Iterable[str]) -> dict[str, dict]:
+        """
+        :return: the entries found, by product ID. Product IDs not in the index are left out
+        """
+        with self._lock:
+            entries = self._load()
+
+            return {product_id: entries[product_id] for product_id in product_ids if product_id in entries}
+
+    def update(self, entries: Mapping[str, dict]) -> None:
+        if not entries:
+            return
+
+        with self._lock:
+            self._load().update(entries)
+            self._write()
+
+    def _load(self) -> dict[str, dict]:
+        if self._entries is None:
+            try:
+                self._entries = json.loads(self.path.read_text())
+                logger.debug(f"Loaded with size {len(self._entries)}", index=self.name)
+            except FileNotFoundError:
+                self._entries = {}
+
+        return self._entries
+
+    def _write(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write and rename, so concurrent readers (e.g. another process) never see a partially written file
+        temp_path = self.path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp_path.write_text(json.dumps(self._entries, sort_keys=True))
+        temp_path.replace(self.path)
@@ -9,6 +9,7 @@ import requests_cache
 from requests_cache import json_serializer
 
 from investmentstk.utils.logger import get_logger
+from investmentstk.utils.metrics import record_http_cache_lookup
 
 current_folder = Path(__file__).resolve().parent
 http_cache_folder = current_folder / "../../.." / "cache" / "http_cache"
@@ -27,6 +28,18 @@ def avoid_caching_google_api_requests(response: requests.Response) -> bool:
     return True
 
 
+class InstrumentedCachedSession(requests_cache.CachedSession):
+    """
+    Records whether each request was served from the cache, to follow the hit rate on the `/metrics` endpoint
+    """
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        record_http_cache_lookup(getattr(response, "from_cache", False))
+
+        return response
+
+
 def cache_default_options(hours: float = 24):
     """
     Default cache options for a filesystem backend.
@@ -47,12 +60,20 @@ def requests_cache_configured(*, hours: float = 1, **kwargs):
     """
     Wrapper around a configured requests_cache context manager
     """
-    args = {**cache_default_options(hours=hours), **kwargs}
+    args = {**cache_default_options(hours=hours), "session_factory": InstrumentedCachedSession, **kwargs}
 
     with requests_cache.enabled(**args):
         yield
 
 
+def build_cached_session(*, hours: float = 1) -> InstrumentedCachedSession:
+    """
+    A session with the same cache as `requests_cache_configured()`, but that can be kept and shared instead
+    of being installed globally. The expiration can still be changed per request with `expire_after`.
+    """
+    return InstrumentedCachedSession(**cache_default_options(hours=hours))
+
+
 def delete_cached_requests() -> list[str]:
     deleted_and_valid = []
 
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+from investmentstk.utils.logger import get_logger
+
+current_folder = Path(__file__).resolve().parent
+result_cache_folder = current_folder / "../../.." / "cache" / "result_cache"
+
+logger = get_logger()
+
+
+class ResultCache:
+    """
+    A cache for derived results (such as a rendered correlation matrix), as opposed to `requests_cache`,
+    which caches the raw HTTP responses used to calculate them.
+
+    Keeps the most recently used results in memory, bounded by an approximate size in bytes (least recently used
+    results are evicted first). Optionally, results are also written to disk, which survives restarts of the server
+    and is used as a second tier when a result is not in memory anymore. Files older than `disk_max_age` (in seconds)
+    are deleted when a new result is written, so the disk tier does not grow forever.
+    """
+
+    def __init__(
+        self, name: str, *, max_bytes: int, disk_folder: Optional[Path] = None, disk_max_age: Optional[float] = None
+    ):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.disk_folder = disk_folder / name if disk_folder else None
+        self.disk_max_age = disk_max_age
+
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                logger.debug("Found in memory", cache=self.name)
+                return self._entries[key][0]
+
+        value = self._read_from_disk(key)
+
+        if value is not None:
+            logger.debug("Found on disk", cache=self.name)
+            self._add_to_memory(key, value)
+
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._add_to_memory(key, value)
+        self._write_to_disk(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+        if self.disk_folder:
+            for file_path in self.disk_folder.glob("*.pickle"):
+                os.remove(file_path)
+
+    def _add_to_memory(self, key: Hashable, value: Any) -> None:
+        size = sys.getsizeof(value)
+
+        # Too large to be cached, it would evict everything else
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._size -= self._entries.pop(key)[1]
+
+            self._entries[key] = (value, size)
+            self._size += size
+
+            while self._size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def _disk_path(self, key: Hashable) -> Path:
+        assert self.disk_folder
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return self.disk_folder / f"{digest}.pickle"
+
+    def _read_from_disk(self, key: Hashable) -> Optional[Any]:
+        if not self.disk_folder:
+            return None
+
+        try:
+            stored_key, value = pickle.loads(self._disk_path(key).read_bytes())
+        except FileNotFoundError:
+            return None
+
+        # Protects against (unlikely) hash collisions
+        return value if stored_key == key else None
+
+    def _write_to_disk(self, key: Hashable, value: Any) -> None:
+        if not self.disk_folder:
+            return
+
+        self.disk_folder.mkdir(parents=True, exist_ok=True)
+
+        # Write and rename, so concurrent readers never see a partially written file
+        path = self._disk_path(key)
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        temp_path.write_bytes(pickle.dumps((key, value)))
+        temp_path.replace(path)
+
+        self._delete_expired_from_disk()
+
+    def _delete_expired_from_disk(self) -> None:
+        if not self.disk_folder or self.disk_max_age is None:
+            return
+
+        oldest = time.time() - self.disk_max_age
+
+        for file_path in self.disk_folder.glob("*.pickle"):
+            try:
+                if file_path.stat().st_mtime < oldest:
+                    os.remove(file_path)
+            except FileNotFoundError:
+                # Deleted concurrently
+                pass
+
+
+def build_result_cache(name: str) -> ResultCache:
+    """
+    Builds a result cache configured through environment variables:
+
+    * RESULT_CACHE_MAX_MB: maximum size kept in memory per cache (defaults to 32)
+    * RESULT_CACHE_ON_DISK: set to "true" to also store results on disk (defaults to false)
+    * RESULT_CACHE_DISK_MAX_AGE_HOURS: how long results are kept on disk (defaults to 96)
+    """
+    max_bytes = int(float(os.environ.get("RESULT_CACHE_MAX_MB", 32)) * 1024 * 1024)
+    on_disk = os.environ.get("RESULT_CACHE_ON_DISK", "false").lower() == "true"
+    disk_max_age = float(os.environ.get("RESULT_CACHE_DISK_MAX_AGE_HOURS", 96)) * 3600
+
+    return ResultCache(
+        name,
+        max_bytes=max_bytes,
+        disk_folder=result_cache_folder if on_disk else None,
+        disk_max_age=disk_max_age,
+    )
@@ -0,0 +1,105 @@
+"""
+Renders the stop loss report in-process, without executing the notebook in `templates/stop_loss_report.ipynb`.
+
+Produces the same content as the notebook (one section per asset with the candlestick chart and a table with
+the latest stops), but using a Jinja template. This avoids starting a Jupyter kernel and converting the notebook
+on every request.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from plotly.offline import get_plotlyjs_version
+
+from investmentstk.figures import candlestick
+from investmentstk.formulas.average_true_range import atr_stop_loss_from_asset
+from investmentstk.models.asset import Asset
+from investmentstk.models.source import source_limiter
+from investmentstk.strategy.brito_trend_following import ATR_PERIOD, PERIODICITY_PER_BROKER
+from investmentstk.utils.calendar import is_last_bar_closed
+from investmentstk.utils.concurrency import map_concurrently
+
+templates_folder = Path(__file__).resolve().parent.parent / "templates"
+
+environment = Environment(loader=FileSystemLoader(templates_folder), autoescape=select_autoescape(["html", "j2"]))
+
+BARS_IN_FIGURE = 100
+BARS_IN_TABLE = 5
+
+# Enough for a stop in every bar of the figure: the ATR needs `ATR_PERIOD` bars to warm up, and the current bar
+# is left out when it's not closed yet
+REPORT_LOOKBACK_BARS = BARS_IN_FIGURE + ATR_PERIOD + 1
+
+
+@dataclass(frozen=True)
+class ReportSection:
+    asset: Asset
+    figure_html: str
+    table_html: str
+
+
+def generate_stop_loss_report(assets_fqn: list[str], show_all: bool = False) -> str:
+    """
+    Generates the HTML report with stop losses for all the assets provided.
+
+    :param assets_fqn: list of asset IDs, in the format AV:XXXX
+    :param show_all: whether to include all assets or only the relevant ones
+               (weekends only showing weekly-based assets, monthly only showing monthly-based assets)
+    :return: a standalone HTML page
+    """
+    futures = map_concurrently(
+        lambda fqn_id: _build_section(fqn_id, show_all),
+        assets_fqn,
+        key=lambda fqn_id: Asset.parse_fqn_id(fqn_id)[0],
+        limiter=source_limiter,
+    )
+    sections = [section for section in (future.result() for future in futures) if section]
+
+    template = environment.get_template("stop_loss_report.html.j2")
+
+    return template.render(sections=sections, plotly_version=get_plotlyjs_version())
+
+
+def _build_section(fqn_id: str, show_all: bool) -> Optional[ReportSection]:
+    asset = Asset.from_id(fqn_id)
+
+    # Hide asset if it's not time to update it's stop loss
+    if not show_all:
+        resolution = PERIODICITY_PER_BROKER[asset.source]
+        if not is_last_bar_closed(resolution):
+            return None
+
+    dataframe = atr_stop_loss_from_asset(asset, min_bars=REPORT_LOOKBACK_BARS)
+    dataframe = dataframe[-BARS_IN_FIGURE:]
+
+    figure = candlestick.generate_figure(dataframe, asset)
+    figure.update_layout(width=950, height=600)
+    figure_html = figure.to_html(include_plotlyjs=False, full_html=False)
+
+    table = format_stop_loss_table(dataframe)
+    table_html = table.drop(["open", "high", "low"], axis=1).tail(BARS_IN_TABLE).to_html(classes="dataframe")
+
+    return ReportSection(asset=asset, figure_html=figure_html, table_html=table_html)
+
+
+def format_stop_loss_table(dataframe: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the change of the stop loss (absolute, % and direction) between bars and rounds the values
+    to be displayed.
+    """
+    dataframe = dataframe.copy()
+
+    dataframe["stop_change"] = dataframe["stop"] - dataframe["stop"].shift(1)
+    dataframe["stop_change_pct"] = dataframe["stop_change"] / dataframe["close"] * 100
+    dataframe.loc[dataframe["stop_change"] > 0, "stop_change_direction"] = "↗️️"
+    dataframe.loc[dataframe["stop_change"] < 0, "stop_change_direction"] = "↘️️"
+    dataframe.loc[dataframe["stop_change"] == 0, "stop_change_direction"] = "=️️"
+
+    dataframe = dataframe.round({"atr": 3, "stop_distance": 2, "stop_change": 2, "stop_change_pct": 2})
+
+    dataframe["stop_change"] = dataframe["stop_change"].astype(str).replace(["0", "0.0"], "")
+    dataframe["stop_change_pct"] = dataframe["stop_change_pct"].astype(str).replace(["0", "0.0"], "")
+
+    return dataframe
@@ -1,28 +1,51 @@
+import asyncio
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, as_completed
+from dataclasses import dataclass
 from enum import Enum
 
 import json
-import nbformat
-import papermill
+import os
 import requests
 import requests.exceptions
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse, PlainTextResponse
-from nbconvert import HTMLExporter
+from fastapi import FastAPI, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from pandas import DataFrame
 from pathlib import Path
+from pydantic import BaseModel
 from tempfile import SpooledTemporaryFile, NamedTemporaryFile
-from typing import Iterable, Union
-
-from investmentstk.brokers import AvanzaBroker, KrakenBroker, DegiroBroker
-from investmentstk.data_feeds.data_feed import TimeResolution
-from investmentstk.figures import correlation
-from investmentstk.figures.correlation import cluster_by_correlation
-from investmentstk.formulas.average_true_range import atr_stop_loss_from_asset
-from investmentstk.models.asset import Asset
+from typing import Any, Callable, Iterable, Iterator, Optional, Type, Union
+
+from investmentstk.brokers.broker import Broker
+from investmentstk.data_feeds.data_feed import TimeResolution, ohlc_store
+from investmentstk.formulas.average_true_range import (
+    atr_stop_loss_from_asset,
+    atr_stop_loss_from_ohlc,
+    latest_atr_stop_loss_from_ohlc,
+    retrieve_ohlc_for_atr_stop_loss,
+)
+from investmentstk.models.asset import Asset, price_cache
 from investmentstk.models.barset import ohlc_to_single_column_dataframe
+from investmentstk.models.source import Source, source_limiter
 from investmentstk.persistence.requests_cache import delete_cached_requests
+from investmentstk.persistence.result_cache import build_result_cache
+from investmentstk.strategy.brito_trend_following import ATR_LOOKBACK_BARS, PERIODICITY_PER_BROKER
+from investmentstk.utils.concurrency import (
+    get_io_thread_pool,
+    get_process_pool,
+    map_concurrently,
+    map_with_timeout,
+    run_in_io_pool,
+    submit_when_done,
+)
+from investmentstk.utils.calendar import last_closed_trading_day
 from investmentstk.utils.dataframe import convert_to_pct_change, merge_dataframes
 from investmentstk.utils.logger import get_logger
+from investmentstk.utils.metrics import registry as metrics_registry, timed_stage
+
+# Heavy dependencies (papermill, nbconvert, plotly, scipy, broker clients, etc) are only imported inside the
+# endpoints that need them. On Cloud Run, instances are scaled down to zero and every cold start pays for what is
+# imported at module load, even for the simple endpoints (like /price).
 
 app = FastAPI()
 
@@ -30,12 +53,56 @@ current_folder = Path(__file__).resolve().parent
 
 logger = get_logger()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# The correlations are calculated over the last year of daily bars (in business days)
+CORRELATION_BARS = 261
+
+# Errors that only drop the failing asset from the output of the bulk endpoints
+BULK_HANDLED_EXCEPTIONS = (json.JSONDecodeError, requests.exceptions.HTTPError)
+
+BROKER_TIMEOUT_SECONDS = float(os.environ.get("BROKER_TIMEOUT_SECONDS", 20))
+
+correlations_cache = build_result_cache("correlations")
+
 
 class OutputFormat(str, Enum):
     Graph = "g"
     CSV = "csv"
 
 
+class ReportEngine(str, Enum):
+    Native = "native"
+    Notebook = "notebook"
+
+
+class BatchComputation(str, Enum):
+    Price = "price"
+    StopLossATR = "stop_loss_atr"
+    StopLossATRSeries = "stop_loss_atr_series"
+    Correlations = "correlations"
+
+
+class BatchRequest(BaseModel):
+    assets: list[str]
+    computations: list[BatchComputation]
+    external: list[str] = []
+
+
+@dataclass
+class BatchAssetData:
+    """
+    Everything retrieved for an asset of a batch, shared by all the computations requested
+    """
+
+    asset: Asset
+    price: Optional[dict] = None
+    stop_loss_ohlc: Optional[DataFrame] = None
+    stop_loss_resolution: Optional[TimeResolution] = None
+    daily_ohlc: Optional[DataFrame] = None
+
+
 @app.get("/")
 async def root():
     """
@@ -47,41 +114,94 @@ async def root():
 
 
 @app.get("/price/{fqn_id}")
-def price(fqn_id: str) -> dict:
+async def price(fqn_id: str) -> dict:
     """
     Returns price details (last price, % chance) of a given asset
 
     :param fqn_id: example: AV:XXXXX
     :return: a Price object
     """
+    asset = await run_in_io_pool(Asset.from_id, fqn_id)
 
-    return _price_common(fqn_id)
+    return await asset.aretrieve_price()
 
 
 @app.get("/price_bulk")
-def price_bulk(p: str) -> list:
+async def price_bulk(
+    p: str, stream: bool = False, accept: Optional[str] = Header(None)
+) -> Union[list, StreamingResponse]:
+    """
+    Returns price details of multiple assets.
+
+    :param p: CSV of assets, in the format AV:XXXX,AV:YYYY,CMC:ZZZZ
+    :param stream: whether to stream the output as NDJSON, one line per asset as soon as it is ready (not in the input
+    order). Also enabled with an "Accept: application/x-ndjson" header
+    :return: a list of Price objects (or a NDJSON stream of them)
+    """
     assets_fqn = _parse_input_list(p)
-    output = []
+    futures = _retrieve_prices_per_source(assets_fqn)
 
-    for asset_fqn in assets_fqn:
-        try:
-            price = _price_common(asset_fqn)
+    if _should_stream(stream, accept):
+        return _stream_bulk_output(assets_fqn, futures, lambda asset_fqn, price: price)
 
-            output.append(price)
-        except (json.JSONDecodeError, requests.HTTPError) as e:
-            source, _ = Asset.parse_fqn_id(asset_fqn)
-            logger.error(
-                f"Exception raised. {type(e).__name__}: {e}", asset_id=asset_fqn, source=source, error=type(e).__name__
-            )
+    return await _collect_bulk_output(assets_fqn, futures, lambda asset_fqn, price: price)
 
-    return output
 
+def _retrieve_prices_per_source(assets_fqn: list[str]) -> list[Future]:
+    """
+    Retrieves the prices with one bulk call per source (see `DataFeed.retrieve_prices`), so feeds that support it
+    retrieve the prices of all their assets with a single request. The sources are called concurrently, on the IO
+    thread pool.
+
+    Returns one future per asset, in the same order as `assets_fqn`, resolved once the call of its source is done.
+    Assets whose price could not be retrieved are resolved with None.
+    """
+    futures: dict[str, Future] = {asset_fqn: Future() for asset_fqn in assets_fqn}
+    assets_fqn_per_source: dict[Source, list[str]] = {}
+
+    for asset_fqn in futures:
+        assets_fqn_per_source.setdefault(_source_from_fqn_id(asset_fqn), []).append(asset_fqn)
+
+    for source, source_assets_fqn in assets_fqn_per_source.items():
+        source_futures = {asset_fqn: futures[asset_fqn] for asset_fqn in source_assets_fqn}
+        get_io_thread_pool().submit(_retrieve_source_prices, source, source_futures)
+
+    return [futures[asset_fqn] for asset_fqn in assets_fqn]
 
-def _price_common(asset_fqn: str) -> dict:
-    asset = Asset.from_id(asset_fqn)
-    price = asset.retrieve_price()
 
-    return price
+def _retrieve_source_prices(source: Source, futures: dict[str, Future]) -> None:
+    """
+    Resolves the futures (by FQN ID) of the assets of a single source.
+
+    Runs on the IO thread pool, where an exception would go unnoticed: any unexpected one is set on the futures not
+    resolved yet, so the request waiting for them does not hang.
+    """
+    try:
+        assets: dict[str, Asset] = {}
+        asset_futures = map_concurrently(Asset.from_id, list(futures), key=lambda _: source, limiter=source_limiter)
+
+        for asset_fqn, asset_future in zip(futures, asset_futures):
+            try:
+                assets[asset_fqn] = asset_future.result()
+            except Exception as e:
+                futures[asset_fqn].set_exception(e)
+
+        try:
+            prices = Asset.retrieve_prices(list(assets.values()), limiter=source_limiter, limiter_key=source)
+        except Exception as e:
+            for asset_fqn in assets:
+                futures[asset_fqn].set_exception(e)
+
+            return
+
+        for asset_fqn, asset in assets.items():
+            futures[asset_fqn].set_result(prices.get(asset.fqn_id))
+    except BaseException as e:
+        logger.error(f"Exception raised. {type(e).__name__}: {e}", source=source, error=type(e).__name__)
+
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(e)
 
 
 @app.get("/stop_losses_broker")
@@ -91,35 +211,45 @@ def stop_losses_broker(skip_cache: bool = False) -> list:
 
     :return: JSON object with fqn_id's and the stop loss price
     """
-    brokers = [AvanzaBroker, DegiroBroker, KrakenBroker]
 
-    output = []
-
-    for broker_class in brokers:
-        try:
-            stop_losses = broker_class(skip_cache=skip_cache).retrieve_stop_losses()
-            stop_losses = [stop_loss.to_response() for stop_loss in stop_losses]
-            output.extend(stop_losses)
-        except requests.HTTPError as e:
-            logger.error(
-                f"Exception raised. {type(e).__name__}: {e}", client=broker_class.__name__, error=type(e).__name__
-            )
+    def retrieve_stop_losses(broker_class: Type[Broker]) -> list:
+        stop_losses = broker_class(skip_cache=skip_cache).retrieve_stop_losses()
+        return [stop_loss.to_response() for stop_loss in stop_losses]
 
-    return output
+    return _query_brokers(retrieve_stop_losses)
 
 
 @app.get("/balance_brokers")
 def balance_brokers(skip_cache: bool = False):
-    brokers = [AvanzaBroker, DegiroBroker, KrakenBroker]
+    def retrieve_balance(broker_class: Type[Broker]) -> list:
+        broker = broker_class(skip_cache=skip_cache)
+        balance = broker.retrieve_balance()
+        return [{"broker": broker.friendly_name, **balance.dict()}]
+
+    return _query_brokers(retrieve_balance)
+
 
+def _query_brokers(query: Callable[[Type[Broker]], list]) -> list:
+    """
+    Runs the same query against all the brokers concurrently, each one with its own session (login + data call).
+    A broker that fails or takes longer than `BROKER_TIMEOUT_SECONDS` only drops its own rows from the output.
+
+    :param query: receives a broker class and returns a list of rows
+    :return: the rows of all the brokers, in the order of `_brokers()`
+    """
     output = []
+    brokers = _brokers()
+
+    futures = map_with_timeout(query, brokers, timeout=BROKER_TIMEOUT_SECONDS)
 
-    for broker_class in brokers:
+    for broker_class, future in zip(brokers, futures):
         try:
-            broker = broker_class(skip_cache=skip_cache)
-            balance = broker.retrieve_balance()
-            output.append({"broker": broker.friendly_name, **balance.dict()})
-        except requests.HTTPError as e:
+            output.extend(future.result(timeout=0))
+        except FutureTimeoutError:
+            logger.error(
+                f"Timed out after {BROKER_TIMEOUT_SECONDS} seconds", client=broker_class.__name__, error="TimeoutError"
+            )
+        except Exception as e:
             logger.error(
                 f"Exception raised. {type(e).__name__}: {e}", client=broker_class.__name__, error=type(e).__name__
             )
@@ -127,6 +257,12 @@ def balance_brokers(skip_cache: bool = False):
     return output
 
 
+def _brokers() -> list[Type[Broker]]:
+    from investmentstk.brokers import AvanzaBroker, DegiroBroker, KrakenBroker
+
+    return [AvanzaBroker, DegiroBroker, KrakenBroker]
+
+
 @app.get("/stop_loss_atr/{fqn_id}")
 def stop_loss_atr(fqn_id: str) -> float:
     """
@@ -140,22 +276,33 @@ def stop_loss_atr(fqn_id: str) -> float:
 
 
 @app.get("/stop_loss_atr_bulk")
-def stop_loss_atr_bulk(p: str) -> list:
+async def stop_loss_atr_bulk(
+    p: str, stream: bool = False, accept: Optional[str] = Header(None)
+) -> Union[list, StreamingResponse]:
+    """
+    Returns the stop losses (calculated using an ATR trailing stop) of multiple assets.
+
+    :param p: CSV of assets, in the format AV:XXXX,AV:YYYY,CMC:ZZZZ
+    :param stream: whether to stream the output as NDJSON, one line per asset as soon as it is ready (not in the input
+    order). Also enabled with an "Accept: application/x-ndjson" header
+    :return: a list of objects with the fqn_id and the stop loss price (or a NDJSON stream of them)
+    """
     assets_fqn = _parse_input_list(p)
-    output = []
 
-    for asset_fqn in assets_fqn:
-        try:
-            asset_data = {"fqn_id": asset_fqn, "stop_loss_atr": _stop_loss_atr_common(asset_fqn)}
+    # Retrieving the data is IO bound and calculating the stop is CPU bound. Both are overlapped: the calculation
+    # of an asset starts on the process pool as soon as its data is available
+    ohlc_futures = map_concurrently(
+        _retrieve_stop_loss_ohlc, assets_fqn, key=_source_from_fqn_id, limiter=source_limiter
+    )
+    stop_loss_futures = submit_when_done(ohlc_futures, get_process_pool(), latest_atr_stop_loss_from_ohlc)
 
-            output.append(asset_data)
-        except (json.JSONDecodeError, requests.exceptions.HTTPError) as e:
-            source, _ = Asset.parse_fqn_id(asset_fqn)
-            logger.error(
-                f"Exception raised. {type(e).__name__}: {e}", asset_id=asset_fqn, source=source, error=type(e).__name__
-            )
+    def format_row(asset_fqn: str, stop_loss: float) -> dict:
+        return {"fqn_id": asset_fqn, "stop_loss_atr": stop_loss}
 
-    return output
+    if _should_stream(stream, accept):
+        return _stream_bulk_output(assets_fqn, stop_loss_futures, format_row)
+
+    return await _collect_bulk_output(assets_fqn, stop_loss_futures, format_row)
 
 
 def _stop_loss_atr_common(asset_fqn: str):
@@ -166,27 +313,51 @@ def _stop_loss_atr_common(asset_fqn: str):
     return stop_loss["stop"][-1]
 
 
+def _retrieve_stop_loss_ohlc(asset_fqn: str) -> tuple[DataFrame, TimeResolution]:
+    asset = Asset.from_id(asset_fqn)
+    return retrieve_ohlc_for_atr_stop_loss(asset)
+
+
 @app.get("/stop_losses_report")
-def stop_losses_report(p: str, all: bool = False):
+def stop_losses_report(p: str, all: bool = False, engine: ReportEngine = ReportEngine.Native):
     """
     Generates a HTML report with stop losses for all the assets provided.
 
     :param p: CSV of assets in the portfolio, in the format AV:XXXX,AV:YYYY,CMC:ZZZZ
     :param all: whether to include all assets or only the relevant ones
                (weekends only showing weekly-based assets, monthly only showing monthly-based assets)
+    :param engine: either "native" (rendered in-process from a HTML template) or "notebook" (executes
+    the notebook template with papermill and converts it to HTML)
     :return:
     """
-    template_path = current_folder / "templates" / "stop_loss_report.ipynb"
-
     assets_fqn = _parse_input_list(p)
 
+    if engine == ReportEngine.Notebook:
+        return HTMLResponse(_notebook_stop_losses_report(assets_fqn, all))
+
+    from investmentstk.reports.stop_loss_report import generate_stop_loss_report
+
+    return HTMLResponse(generate_stop_loss_report(assets_fqn, show_all=all))
+
+
+def _notebook_stop_losses_report(assets_fqn: list[str], show_all: bool) -> str:
+    """
+    Executes the notebook template, which starts a Jupyter kernel, and exports it as HTML.
+    Slower and heavier than the native report, but useful when iterating on the report in Jupyter.
+    """
+    import nbformat
+    import papermill
+    from nbconvert import HTMLExporter
+
+    template_path = current_folder / "templates" / "stop_loss_report.ipynb"
+
     with NamedTemporaryFile(mode="w+") as temp_file:
         # Use the given list of assets as a parameter in the notebook
         papermill.execute_notebook(
             template_path,
             temp_file.name,
             progress_bar=False,
-            parameters=dict(assets=assets_fqn, show_all=all),
+            parameters=dict(assets=assets_fqn, show_all=show_all),
             report_mode=True,  # Add metadata to input cells
         )
 
@@ -199,7 +370,7 @@ def stop_losses_report(p: str, all: bool = False):
         notebook = nbformat.read(temp_file, as_version=4)
         (body, resources) = html_exporter.from_notebook_node(notebook)
 
-        return HTMLResponse(body)
+        return body
 
 
 @app.get("/correlations")
@@ -221,31 +392,300 @@ def correlations(p: str, e: str = "", f: OutputFormat = OutputFormat.CSV):
     text with CSV
     :return: either a CSV with the raw correlations or a HTML page with the Plotly graph
     """
-    portfolio: list[Asset] = _input_list_to_assets(p)
-    external: list[Asset] = _input_list_to_assets(e)
+    portfolio_fqn = _parse_input_list(p)
+    external_fqn = _parse_input_list(e)
+
+    cache_key = _correlations_cache_key(portfolio_fqn, external_fqn, f)
+    output = correlations_cache.get(cache_key)
+
+    if output is None:
+        output = _calculate_correlations(portfolio_fqn, external_fqn, f)
+        correlations_cache.set(cache_key, output)
+
+    return _build_response(output, f)
+
+
+def _correlations_cache_key(portfolio_fqn: list[str], external_fqn: list[str], format: OutputFormat) -> tuple:
+    """
+    The portfolio assets are sorted, so the same portfolio in a different order shares the same cache entry (the
+    order in the output comes from the clustering). The external assets are appended to the output as they were
+    requested, so their order is part of the key.
+    """
+    # Daily correlations only change once per trading day
+    return tuple(sorted(portfolio_fqn)), tuple(external_fqn), last_closed_trading_day().isoformat(), format.value
+
+
+def _calculate_correlations(portfolio_fqn: list[str], external_fqn: list[str], format: OutputFormat) -> str:
+    portfolio: list[Asset] = [Asset.from_id(fqn_id) for fqn_id in portfolio_fqn]
+    external: list[Asset] = [Asset.from_id(fqn_id) for fqn_id in external_fqn]
+
+    portfolio_df = _prepare_dataframe(portfolio)
+    external_df = _prepare_dataframe(external) if external else None
+
+    # Handles both output formats
+    return _format_output(_correlation_matrix(portfolio_df, external_df), format)
+
+
+@timed_stage("correlation")
+def _correlation_matrix(portfolio_df: DataFrame, external_df: Optional[DataFrame] = None) -> DataFrame:
+    """
+    Clusters the portfolio assets by correlation and, if provided, appends the external assets after the clustering.
+
+    :param portfolio_df: close prices of the portfolio assets (one column per asset), as returned by `_merge_ohlc`
+    :param external_df: close prices of the external assets, in the same format
+    :return: the correlation matrix
+    """
+    from investmentstk.figures.correlation import cluster_by_correlation
 
     # Prepare portfolio dataframe
-    dataframe = _prepare_dataframe(portfolio)
-    dataframe = convert_to_pct_change(dataframe)
+    dataframe = convert_to_pct_change(portfolio_df)
     clustered_dataframe = cluster_by_correlation(dataframe)
 
     # Prepare and merge interest dataframe
-    if external:
-        external_df = _prepare_dataframe(external)
+    if external_df is not None:
         external_df = convert_to_pct_change(external_df)
         clustered_dataframe = merge_dataframes([clustered_dataframe, external_df])
 
-    clustered_df_corr = clustered_dataframe.corr()
+    return clustered_dataframe.corr()
 
-    # Handles both output formats
-    return _format_output(clustered_df_corr, f)
+
+@app.post("/batch")
+def batch(request: BatchRequest) -> dict:
+    """
+    Calculates several outputs for the same assets in a single request, retrieving the data of each asset only once
+    and sharing it between all the requested computations. As the assets are sent in the body, the list is not
+    limited by the maximum length of an URL.
+
+    Example body:
+    {"assets": ["AV:5442", "CMC:X-ABCDE"], "computations": ["price", "stop_loss_atr"], "external": ["KR:XXBTZEUR"]}
+
+    :param request: the assets (in the format AV:XXXX), the computations ("price", "stop_loss_atr",
+    "stop_loss_atr_series" and "correlations") and, optionally, external assets appended to the correlation matrix
+    :return: an object with one entry per asset (with the asset computations) under "assets" and, if requested,
+    the correlation matrix (as in /correlations?f=csv) under "correlations". Assets that failed are left out
+    """
+    computations = set(request.computations)
+    assets_fqn = list(dict.fromkeys(request.assets))
+    external_fqn = [fqn_id for fqn_id in dict.fromkeys(request.external) if fqn_id not in assets_fqn]
+
+    correlations_output = None
+    correlations_cache_key = _correlations_cache_key(assets_fqn, external_fqn, OutputFormat.CSV)
+
+    if BatchComputation.Correlations in computations:
+        correlations_output = correlations_cache.get(correlations_cache_key)
+
+    needs_daily_ohlc = BatchComputation.Correlations in computations and correlations_output is None
+    asset_computations = computations if needs_daily_ohlc else computations - {BatchComputation.Correlations}
+
+    computations_per_asset = {fqn_id: asset_computations for fqn_id in assets_fqn}
+
+    # The external assets are only used in the correlation matrix
+    if needs_daily_ohlc:
+        computations_per_asset.update({fqn_id: {BatchComputation.Correlations} for fqn_id in external_fqn})
+
+    data = _retrieve_batch_data(computations_per_asset)
+    stop_losses = _calculate_batch_stop_losses(data)
+
+    output: dict[str, Any] = {"assets": []}
+
+    for fqn_id in assets_fqn:
+        if fqn_id not in data:
+            continue
+
+        row: dict[str, Any] = {"fqn_id": fqn_id, "name": data[fqn_id].asset.name}
+
+        if BatchComputation.Price in computations:
+            row["price"] = data[fqn_id].price
+
+        if fqn_id in stop_losses and BatchComputation.StopLossATR in computations:
+            row["stop_loss_atr"] = stop_losses[fqn_id]["stop"][-1]
+
+        if fqn_id in stop_losses and BatchComputation.StopLossATRSeries in computations:
+            stops = stop_losses[fqn_id]["stop"].dropna()
+            row["stop_loss_atr_series"] = [{"time": time, "stop": stop} for time, stop in stops.items()]
+
+        output["assets"].append(row)
+
+    portfolio_df = _merge_batch_daily_ohlc(assets_fqn, data) if needs_daily_ohlc else None
+
+    if portfolio_df is not None:
+        external_df = _merge_batch_daily_ohlc(external_fqn, data)
+        correlations_output = _format_output(_correlation_matrix(portfolio_df, external_df), OutputFormat.CSV)
+
+        # A matrix missing some of the assets is not cached, so they are retried on the next request
+        if len(data) == len(computations_per_asset):
+            correlations_cache.set(correlations_cache_key, correlations_output)
+
+    if correlations_output is not None:
+        output["correlations"] = correlations_output
+
+    return output
+
+
+def _retrieve_batch_data(computations_per_asset: dict[str, set[BatchComputation]]) -> dict[str, BatchAssetData]:
+    """
+    Retrieves, concurrently, the data needed by the computations of each asset.
+    Assets that failed are logged and left out.
+    """
+    assets_fqn = list(computations_per_asset)
+    futures = map_concurrently(
+        lambda fqn_id: _retrieve_batch_asset_data(fqn_id, computations_per_asset[fqn_id]),
+        assets_fqn,
+        key=_source_from_fqn_id,
+        limiter=source_limiter,
+    )
+
+    data = {}
+
+    for asset_fqn, future in zip(assets_fqn, futures):
+        try:
+            data[asset_fqn] = future.result()
+        except BULK_HANDLED_EXCEPTIONS as e:
+            _log_bulk_exception(asset_fqn, e)
+
+    return data
+
+
+def _retrieve_batch_asset_data(asset_fqn: str, computations: set[BatchComputation]) -> BatchAssetData:
+    asset = Asset.from_id(asset_fqn)
+    data = BatchAssetData(asset=asset)
+
+    # Each resolution is only retrieved once, even if needed by more than one computation
+    ohlc: dict[TimeResolution, DataFrame] = {}
+
+    def retrieve_ohlc(resolution: TimeResolution, min_bars: int) -> DataFrame:
+        if resolution not in ohlc:
+            ohlc[resolution] = asset.retrieve_ohlc(resolution=resolution, min_bars=min_bars)
+
+        return ohlc[resolution]
+
+    if BatchComputation.Price in computations:
+        data.price = asset.retrieve_price()
+
+    if computations & {BatchComputation.StopLossATR, BatchComputation.StopLossATRSeries}:
+        data.stop_loss_resolution = PERIODICITY_PER_BROKER[asset.source]
+        data.stop_loss_ohlc = retrieve_ohlc(data.stop_loss_resolution, ATR_LOOKBACK_BARS)
+
+    if BatchComputation.Correlations in computations:
+        data.daily_ohlc = retrieve_ohlc(TimeResolution.day, CORRELATION_BARS)
+
+    return data
+
+
+def _merge_batch_daily_ohlc(assets_fqn: list[str], data: dict[str, BatchAssetData]) -> Optional[DataFrame]:
+    """
+    Same as `_prepare_dataframe`, but using the data already retrieved. Returns None if no asset was retrieved.
+    """
+    retrieved = [data[fqn_id] for fqn_id in assets_fqn if fqn_id in data]
+
+    if not retrieved:
+        return None
+
+    return _merge_ohlc((asset_data.asset, asset_data.daily_ohlc) for asset_data in retrieved)
+
+
+def _calculate_batch_stop_losses(data: dict[str, BatchAssetData]) -> dict[str, DataFrame]:
+    """
+    Calculates the ATR stop losses on the process pool, for the assets that have the data for it.
+    """
+    futures = {
+        fqn_id: get_process_pool().submit(
+            atr_stop_loss_from_ohlc, asset_data.stop_loss_ohlc, asset_data.stop_loss_resolution
+        )
+        for fqn_id, asset_data in data.items()
+        if asset_data.stop_loss_ohlc is not None
+    }
+
+    return {fqn_id: future.result() for fqn_id, future in futures.items()}
+
+
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    """
+    Exposes the metrics (data feed calls, errors, latency, HTTP cache hits and duration of CPU bound calculations)
+    in the Prometheus text format
+
+    :return: plain text in the Prometheus exposition format
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
 
 
 @app.get("/clear_cache")
 def clear_cache() -> list[str]:
+    correlations_cache.clear()
+    ohlc_store.clear()
+    price_cache.clear()
+
     return delete_cached_requests()
 
 
+def _should_stream(stream: bool, accept: Optional[str]) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in (accept or "")
+
+
+async def _collect_bulk_output(
+    assets_fqn: list[str], futures: list[Future], format_row: Callable[[str, Any], dict]
+) -> list:
+    """
+    Waits for the results of all the assets (without blocking the event loop) and returns them in the input order.
+    Assets that failed (or without a result) are left out. Failures are logged.
+    """
+    output = []
+
+    for asset_fqn, future in zip(assets_fqn, futures):
+        try:
+            result = await asyncio.wrap_future(future)
+        except BULK_HANDLED_EXCEPTIONS as e:
+            _log_bulk_exception(asset_fqn, e)
+            continue
+
+        if result is not None:
+            output.append(format_row(asset_fqn, result))
+
+    return output
+
+
+def _stream_bulk_output(
+    assets_fqn: list[str], futures: list[Future], format_row: Callable[[str, Any], dict]
+) -> StreamingResponse:
+    """
+    Streams the results as NDJSON (one JSON object per line), in the order they are completed.
+    Assets that failed (or without a result) are left out. Failures are logged.
+    """
+    # The same future can be shared by more than one position (e.g. an asset repeated in the input): each position
+    # gets its own line, as in the list output
+    future_to_assets_fqn: dict[Future, list[str]] = {}
+
+    for asset_fqn, future in zip(assets_fqn, futures):
+        future_to_assets_fqn.setdefault(future, []).append(asset_fqn)
+
+    def generate_lines() -> Iterator[str]:
+        for future in as_completed(future_to_assets_fqn):
+            # Releases the result as soon as it is sent, keeping the memory flat for large lists
+            future_assets_fqn = future_to_assets_fqn.pop(future)
+
+            for asset_fqn in future_assets_fqn:
+                try:
+                    result = future.result()
+                except BULK_HANDLED_EXCEPTIONS as e:
+                    _log_bulk_exception(asset_fqn, e)
+                    continue
+
+                if result is None:
+                    continue
+
+                yield json.dumps(jsonable_encoder(format_row(asset_fqn, result))) + "\n"
+
+    return StreamingResponse(generate_lines(), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _log_bulk_exception(asset_fqn: str, e: Exception) -> None:
+    source, _ = Asset.parse_fqn_id(asset_fqn)
+    logger.error(
+        f"Exception raised. {type(e).__name__}: {e}", asset_id=asset_fqn, source=source, error=type(e).__name__
+    )
+
+
 def _parse_input_list(input_list: str) -> list[str]:
     """
     Converts a CSV list of assets IDs into a list of parsed IDs (but not Asset objects)
@@ -253,20 +693,19 @@ def _parse_input_list(input_list: str) -> list[str]:
     return [fqn_id for fqn_id in input_list.split(",") if fqn_id != "" and fqn_id != ":"]
 
 
-def _input_list_to_assets(input_list: str) -> list[Asset]:
-    """
-    Converts a CSV list of asset IDs into Asset objects
-    """
-    parsed_input = _parse_input_list(input_list)
-    return [Asset.from_id(fqn_id) for fqn_id in parsed_input]
+def _source_from_fqn_id(fqn_id: str) -> Source:
+    source, _ = Asset.parse_fqn_id(fqn_id)
+    return source
 
 
-def _format_output(dataframe: DataFrame, format: OutputFormat) -> Union[PlainTextResponse, HTMLResponse]:
+def _format_output(dataframe: DataFrame, format: OutputFormat) -> str:
     """
     Formats a dataframe into one of the supported output formats.
     """
     if format != OutputFormat.Graph:
-        return PlainTextResponse(dataframe.to_csv(sep=";"))
+        return dataframe.to_csv(sep=";")
+
+    from investmentstk.figures import correlation
 
     figure = correlation.generate_binned_figure(dataframe)
 
@@ -274,22 +713,40 @@ def _format_output(dataframe: DataFrame, format: OutputFormat) -> Union[PlainTex
         figure.write_html(in_memory_file, include_plotlyjs="cdn", full_html=True, auto_open=False)
         in_memory_file.seek(0)
 
-        return HTMLResponse(in_memory_file.read())
+        return in_memory_file.read()
+
+
+def _build_response(output: str, format: OutputFormat) -> Union[PlainTextResponse, HTMLResponse]:
+    """
+    Wraps an output formatted by `_format_output` in the response class of its format.
+    """
+    if format != OutputFormat.Graph:
+        return PlainTextResponse(output)
+
+    return HTMLResponse(output)
 
 
 def _prepare_dataframe(portfolio: Iterable[Asset]) -> DataFrame:
     """
     Takes a list of Assets and returns a single dataframe with them merged
     """
+    return _merge_ohlc(
+        (asset, asset.retrieve_ohlc(resolution=TimeResolution.day, min_bars=CORRELATION_BARS)) for asset in portfolio
+    )
+
+
+def _merge_ohlc(assets_ohlc: Iterable[tuple[Asset, DataFrame]]) -> DataFrame:
+    """
+    Takes the daily OHLC dataframes of a list of Assets and returns a single dataframe with their close prices merged
+    """
     dataframes = []
 
-    for asset in portfolio:
-        dataframe = asset.retrieve_ohlc(resolution=TimeResolution.day)
+    for asset, dataframe in assets_ohlc:
         dataframe = ohlc_to_single_column_dataframe(dataframe, asset)
         dataframes.append(dataframe)
 
     merged_dataframe = merge_dataframes(dataframes)
     merged_dataframe = merged_dataframe.sort_index()
-    merged_dataframe = merged_dataframe.tail(261)  # business days in a year
+    merged_dataframe = merged_dataframe.tail(CORRELATION_BARS)
 
     return merged_dataframe
@@ -24,3 +24,9 @@ false trend reversals.
 ATR_MULTIPLIER_PER_PERIODICITY = {TimeResolution.month: 2.5, TimeResolution.week: 3}
 
 ATR_PERIOD = 21
+
+"""
+How many bars are retrieved to calculate the ATR stop loss. The ATR is a smoothed moving average (alpha = 1 / period),
+where bars older than 5 periods weight less than 1%. The stop loss report needs more (see `REPORT_LOOKBACK_BARS`).
+"""
+ATR_LOOKBACK_BARS = 5 * ATR_PERIOD
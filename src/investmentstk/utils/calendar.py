@@ -1,9 +1,15 @@
 import datetime
-from typing import Optional
+from typing import Optional, TypeVar, Union
+
+import numpy as np
+import pandas as pd
 
 # From: https://stackoverflow.com/a/64885601/3950305
 from investmentstk.data_feeds.data_feed import TimeResolution
 
+# The vectorized functions accept a DatetimeIndex or a Series of datetimes, and return the same type
+Datetimes = TypeVar("Datetimes", pd.DatetimeIndex, pd.Series)
+
 
 def is_end_of_month(dt: datetime.datetime) -> bool:
     """
@@ -70,6 +76,75 @@ def is_weekend(dt) -> bool:
     return weekday == 6 or weekday == 7
 
 
+def round_day_vectorized(times: Datetimes) -> Datetimes:
+    """
+    Vectorized version of `round_day()`
+    """
+    fields = _datetime_fields(times)
+    time_of_day = (
+        pd.to_timedelta(np.asarray(fields.hour), unit="h")
+        + pd.to_timedelta(np.asarray(fields.minute), unit="min")
+        + pd.to_timedelta(np.asarray(fields.second), unit="s")
+    )
+    next_day = pd.to_timedelta(np.where(fields.hour > 12, 1, 0), unit="D")
+
+    # As arrays, so a Series keeps its index and name
+    return times - np.asarray(time_of_day) + np.asarray(next_day)
+
+
+def is_saturday_vectorized(times: Union[pd.DatetimeIndex, pd.Series]) -> np.ndarray:
+    """
+    Vectorized version of `is_saturday()`
+    """
+    return np.asarray(_datetime_fields(times).dayofweek == 5)
+
+
+def is_sunday_vectorized(times: Union[pd.DatetimeIndex, pd.Series]) -> np.ndarray:
+    """
+    Vectorized version of `is_sunday()`
+    """
+    return np.asarray(_datetime_fields(times).dayofweek == 6)
+
+
+def is_weekend_vectorized(times: Union[pd.DatetimeIndex, pd.Series]) -> np.ndarray:
+    """
+    Vectorized version of `is_weekend()`
+    """
+    return np.asarray(_datetime_fields(times).dayofweek >= 5)
+
+
+def is_end_of_month_vectorized(times: Union[pd.DatetimeIndex, pd.Series]) -> np.ndarray:
+    """
+    Vectorized version of `is_end_of_month()`
+    """
+    return np.asarray(_datetime_fields(times).is_month_end)
+
+
+def _datetime_fields(times: Union[pd.DatetimeIndex, pd.Series]):
+    """
+    The datetime fields (hour, dayofweek...) are directly on a DatetimeIndex, but under `.dt` on a Series
+    """
+    return times.dt if isinstance(times, pd.Series) else times
+
+
+def last_closed_trading_day(now: Optional[datetime.datetime] = None) -> datetime.date:
+    """
+    Returns the last week day before the current day (holidays are not taken into account).
+    Daily bars up to that day are not expected to change anymore.
+
+    Useful as part of cache keys for results that only change once per trading day.
+    """
+    if not now:
+        now = datetime.datetime.utcnow()
+
+    day = now.date() - datetime.timedelta(days=1)
+
+    while day.isoweekday() in (6, 7):
+        day = day - datetime.timedelta(days=1)
+
+    return day
+
+
 def is_last_bar_closed(resolution: TimeResolution, now: Optional[datetime.datetime] = None) -> bool:
     """
     On weekly resolution, returns true if it's weekend (no more trading will happen)
@@ -0,0 +1,223 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Hashable, Iterator, Mapping, Optional, Sequence, TypeVar
+
+import wrapt
+
+from investmentstk.utils.metrics import call_collecting_stage_timings, observe_stage_timings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_io_thread_pool: Optional[ThreadPoolExecutor] = None
+
+
+class ConcurrencyLimiter:
+    """
+    Bounds how many calls can be in-flight at the same time for a given key (usually a `Source`).
+
+    The semaphores are shared by every thread using the same limiter, so the limit holds across
+    concurrent HTTP requests to our server and not only within a single bulk request.
+    """
+
+    def __init__(self, default_limit: int, limits: Optional[Mapping[Hashable, int]] = None):
+        self.default_limit = default_limit
+        self.limits = dict(limits or {})
+
+        self._semaphores: dict[Hashable, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def limit_for(self, key: Hashable) -> int:
+        return self.limits.get(key, self.default_limit)
+
+    @contextmanager
+    def limit(self, key: Hashable) -> Iterator[None]:
+        """
+        Blocks until there is a free slot for the given key
+        """
+        with self._semaphore(key):
+            yield
+
+    def _semaphore(self, key: Hashable) -> threading.BoundedSemaphore:
+        with self._lock:
+            if key not in self._semaphores:
+                self._semaphores[key] = threading.BoundedSemaphore(self.limit_for(key))
+
+            return self._semaphores[key]
+
+
+def map_concurrently(
+    function: Callable[[T], R],
+    items: Sequence[T],
+    *,
+    key: Callable[[T], Hashable],
+    limiter: ConcurrencyLimiter,
+) -> list["Future[R]"]:
+    """
+    Calls `function` for every item on a thread pool, respecting the limits of `limiter`
+    for the key of each item.
+
+    Returns one future per item, in the same order as `items`. Exceptions raised by `function`
+    are not swallowed: they are raised when calling `result()` on the respective future.
+
+    The pool is sized so that every key can use all of its slots at the same time. This makes
+    the wall-clock time close to the slowest item instead of the sum of all of them.
+    """
+    if not items:
+        return []
+
+    keys = [key(item) for item in items]
+    max_workers = min(len(items), sum(limiter.limit_for(item_key) for item_key in set(keys)))
+
+    def limited_call(item: T, item_key: Hashable) -> R:
+        with limiter.limit(item_key):
+            return function(item)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = [executor.submit(limited_call, item, item_key) for item, item_key in zip(items, keys)]
+
+    # Do not block here. Callers decide whether to wait for all the results (in order) or to consume them as soon
+    # as they are completed. The worker threads exit once the submitted calls are done.
+    executor.shutdown(wait=False)
+
+    return futures
+
+
+def map_with_timeout(function: Callable[[T], R], items: Sequence[T], *, timeout: float) -> list["Future[R]"]:
+    """
+    Calls `function` for every item, each one on its own thread, and waits at most `timeout` seconds for all of them.
+
+    Returns one future per item, in the same order as `items`. Calls that did not finish in time are not interrupted
+    (Python threads can't be killed), but they are abandoned: calling `result(timeout=0)` on their futures raises
+    `concurrent.futures.TimeoutError` and their results are discarded whenever they finish.
+    """
+    if not items:
+        return []
+
+    executor = ThreadPoolExecutor(max_workers=len(items))
+    futures = [executor.submit(function, item) for item in items]
+    executor.shutdown(wait=False)
+
+    wait(futures, timeout=timeout)
+
+    return futures
+
+
+def submit_when_done(
+    futures: Sequence["Future[Any]"], executor: Executor, function: Callable[..., R]
+) -> list["Future[R]"]:
+    """
+    Pipelines two stages: as soon as each of the given futures is done, submits `function` to `executor`,
+    unpacking the result of the future (expected to be a tuple) as the arguments.
+
+    Useful to overlap an IO bound stage (like retrieving data from a data feed on a thread pool) with a CPU bound
+    one (like calculating an indicator on a process pool). Returns one future per input future, in the same order.
+    An exception on the first stage is propagated to the respective returned future.
+    """
+    chained_futures: list["Future[R]"] = [Future() for _ in futures]
+
+    for future, chained_future in zip(futures, chained_futures):
+        future.add_done_callback(
+            functools.partial(_submit_chained, chained=chained_future, executor=executor, function=function)
+        )
+
+    return chained_futures
+
+
+def _submit_chained(done: "Future[Any]", chained: "Future[R]", executor: Executor, function: Callable[..., R]) -> None:
+    try:
+        second_stage = executor.submit(function, *done.result())
+    except BaseException as e:
+        chained.set_exception(e)
+        return
+
+    second_stage.add_done_callback(functools.partial(_copy_future_outcome, target=chained))
+
+
+def _copy_future_outcome(source: "Future[R]", target: "Future[R]") -> None:
+    exception = source.exception()
+
+    if exception is not None:
+        target.set_exception(exception)
+    else:
+        target.set_result(source.result())
+
+
+class StageTimingProcessPoolExecutor(ProcessPoolExecutor):
+    """
+    A process pool that brings back the CPU stage timings (see `utils/metrics.py`) recorded while running each call,
+    as metrics recorded on the worker processes would not be visible to the `/metrics` endpoint.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        future = super().submit(call_collecting_stage_timings, fn, *args, **kwargs)
+        result_future: Future = Future()
+
+        future.add_done_callback(functools.partial(_unwrap_stage_timings, target=result_future))
+
+        return result_future
+
+
+def _unwrap_stage_timings(source: Future, target: Future) -> None:
+    exception = source.exception()
+
+    if exception is not None:
+        target.set_exception(exception)
+        return
+
+    result, timings = source.result()
+    observe_stage_timings(timings)
+    target.set_result(result)
+
+
+@wrapt.synchronized
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Lazily creates a process pool shared by the whole application, to run CPU bound work without being limited
+    by the GIL. The number of processes can be configured with `PROCESS_POOL_WORKERS` (defaults to the number of CPUs).
+
+    Uses "spawn" instead of the default "fork" on Linux, as forking a process that is running multiple threads
+    (such as our HTTP server) can leave locks in an inconsistent state in the child.
+    """
+    global _process_pool
+
+    if _process_pool is None:
+        max_workers = int(os.environ.get("PROCESS_POOL_WORKERS", os.cpu_count() or 1))
+        _process_pool = StageTimingProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    return _process_pool
+
+
+@wrapt.synchronized
+def get_io_thread_pool() -> ThreadPoolExecutor:
+    """
+    Lazily creates a thread pool shared by the whole application, for blocking IO (like the HTTP requests of the data
+    feeds) called from async code. The number of threads can be configured with `IO_THREAD_POOL_WORKERS`
+    (defaults to 32).
+
+    Unlike the pools created by `map_concurrently`, it lives as long as the application, so its threads are reused.
+    """
+    global _io_thread_pool
+
+    if _io_thread_pool is None:
+        max_workers = int(os.environ.get("IO_THREAD_POOL_WORKERS", 32))
+        _io_thread_pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="io")
+
+    return _io_thread_pool
+
+
+async def run_in_io_pool(function: Callable[..., R], *args, **kwargs) -> R:
+    """
+    Awaits a blocking call running on the IO thread pool, without blocking the event loop
+    """
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(get_io_thread_pool(), functools.partial(function, *args, **kwargs))
@@ -1,6 +1,8 @@
 import pandas as pd
 from pandas.tseries.frequencies import to_offset
 
+from investmentstk.utils.metrics import timed_stage
+
 RESAMPLE_LOGIC = {"open": "first", "high": "max", "low": "min", "close": "last"}
 
 
@@ -36,6 +38,7 @@ def merge_dataframes(dataframes: list[pd.DataFrame], join: str = "outer") -> pd.
     return dataframe
 
 
+@timed_stage("resampling")
 def convert_daily_ohlc_to_weekly(dataframe: pd.DataFrame) -> pd.DataFrame:
     # From:
     # https://stackoverflow.com/questions/34597926/converting-daily-stock-data-to-weekly-based-via-pandas-in-python
@@ -48,6 +51,7 @@ def convert_daily_ohlc_to_weekly(dataframe: pd.DataFrame) -> pd.DataFrame:
     return dataframe
 
 
+@timed_stage("resampling")
 def convert_daily_ohlc_to_monthly(dataframe: pd.DataFrame) -> pd.DataFrame:
     dataframe = dataframe.resample("M").apply(RESAMPLE_LOGIC)
 
@@ -56,3 +60,18 @@ def convert_daily_ohlc_to_monthly(dataframe: pd.DataFrame) -> pd.DataFrame:
     dataframe.index = dataframe.index + to_offset(offset)
 
     return dataframe
+
+
+def append_ohlc(history: pd.DataFrame, update: pd.DataFrame) -> pd.DataFrame:
+    """
+    Merges newly retrieved bars into a previously retrieved OHLC history. Bars in the update replace the ones
+    with the same or a later time in the history (the last bar of the history may still have been open).
+
+    :param history: OHLC dataframe, indexed by time
+    :param update: OHLC dataframe with the most recent bars
+    :return: a new dataframe
+    """
+    if update.empty:
+        return history.copy()
+
+    return pd.concat([history[history.index < update.index[0]], update])
@@ -0,0 +1,54 @@
+"""
+Long-lived HTTP sessions, shared by all the calls (and threads) of the same client. Reusing a session reuses its
+pooled connections (keep-alive), avoiding a new TCP and TLS handshake for every request.
+"""
+import os
+
+import requests
+import wrapt
+from requests.adapters import HTTPAdapter
+from requests_cache.patcher import OriginalSession
+from urllib3.util.retry import Retry
+
+from investmentstk.persistence.requests_cache import build_cached_session
+
+_adapters: dict[str, HTTPAdapter] = {}
+_sessions: dict[tuple[str, bool], requests.Session] = {}
+
+
+@wrapt.synchronized
+def get_http_session(name: str, *, cached: bool = False) -> requests.Session:
+    """
+    Returns the shared session of a client (usually the name of a data feed or broker class).
+
+    The cached and the non-cached sessions of the same client share the same connection pool. The size of the pool
+    can be configured with `HTTP_POOL_MAXSIZE` (defaults to 10) and should not be lower than the maximum number of
+    concurrent requests to the same host (see `MAX_IN_FLIGHT_REQUESTS_PER_SOURCE`), otherwise the extra connections
+    are closed instead of being reused.
+
+    :param name: the name of the client
+    :param cached: whether the session uses the HTTP cache (see `persistence/requests_cache.py`)
+    :return: a requests session
+    """
+    if (name, cached) not in _sessions:
+        if name not in _adapters:
+            _adapters[name] = _build_adapter()
+
+        # Not `requests.Session()`, which is replaced by a cached session while `requests_cache_configured()` is active
+        session = build_cached_session() if cached else OriginalSession()
+        session.mount("https://", _adapters[name])
+        session.mount("http://", _adapters[name])
+
+        _sessions[(name, cached)] = session
+
+    return _sessions[(name, cached)]
+
+
+def _build_adapter() -> HTTPAdapter:
+    pool_maxsize = int(os.environ.get("HTTP_POOL_MAXSIZE", 10))
+
+    # Idle keep-alive connections can be closed by the server at any time. Retrying (only idempotent requests)
+    # on connection errors avoids failing when a dead connection is picked from the pool
+    retries = Retry(total=2, connect=2, read=2, status=0, backoff_factor=0.1, allowed_methods=["GET", "HEAD"])
+
+    return HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retries)
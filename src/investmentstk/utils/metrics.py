@@ -0,0 +1,292 @@
+"""
+A minimal implementation of Prometheus metrics (counters and histograms), rendered in the text exposition format:
+https://prometheus.io/docs/instrumenting/exposition_formats/
+
+The official client (prometheus-client) would also do the job, but this small subset is enough for our needs
+and avoids one more dependency.
+"""
+import contextlib
+import functools
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional, Sequence, Tuple, TypeVar
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+LabelValues = Tuple[str, ...]
+
+M = TypeVar("M", bound="Metric")
+
+
+class Metric:
+    """
+    Base class for metrics with a fixed set of labels. Values are stored per combination of label values.
+    """
+
+    type: str
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Expected labels {self.labelnames} for {self.name}, got {tuple(labels)}")
+
+        return tuple(str(labels[labelname]) for labelname in self.labelnames)
+
+    def _format_labels(self, label_values: LabelValues, **extra_labels: str) -> str:
+        pairs = list(zip(self.labelnames, label_values)) + list(extra_labels.items())
+
+        if not pairs:
+            return ""
+
+        return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}", *self._render_samples()]
+
+    def _render_samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        label_values = self._label_values(labels)
+
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._label_values(labels), 0)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+
+        return [
+            f"{self.name}{self._format_labels(label_values)} {_format_value(value)}" for label_values, value in values
+        ]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+        # Per combination of labels: the count of each bucket (not cumulative), the sum and the count of observations
+        self._bucket_counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        label_values = self._label_values(labels)
+        bucket_index = next((index for index, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+
+        with self._lock:
+            bucket_counts = self._bucket_counts.setdefault(label_values, [0] * (len(self.buckets) + 1))
+            bucket_counts[bucket_index] += 1
+            self._sums[label_values] = self._sums.get(label_values, 0) + value
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            return sum(self._bucket_counts.get(self._label_values(labels), []))
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        Observes the duration (in seconds) of the code block, even if it raises an exception
+        """
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self) -> list[str]:
+        with self._lock:
+            snapshot = sorted(
+                (label_values, list(counts), self._sums[label_values])
+                for label_values, counts in self._bucket_counts.items()
+            )
+
+        lines = []
+
+        for label_values, counts, total in snapshot:
+            cumulative = 0
+
+            for bound, count in zip([*self.buckets, math.inf], counts):
+                cumulative += count
+                labels = self._format_labels(label_values, le=_format_value(bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+
+            lines.append(f"{self.name}_sum{self._format_labels(label_values)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(label_values)} {cumulative}")
+
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: M) -> M:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+
+            self._metrics[metric.name] = metric
+
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+data_feed_calls = registry.register(
+    Counter("investmentstk_data_feed_calls_total", "Calls to the data feeds", ["feed", "operation"])
+)
+data_feed_errors = registry.register(
+    Counter(
+        "investmentstk_data_feed_errors_total", "Calls to the data feeds that raised", ["feed", "operation", "error"]
+    )
+)
+data_feed_duration = registry.register(
+    Histogram(
+        "investmentstk_data_feed_duration_seconds", "Duration of the calls to the data feeds", ["feed", "operation"]
+    )
+)
+http_cache_requests = registry.register(
+    Counter(
+        "investmentstk_http_cache_requests_total",
+        "HTTP requests made through requests-cache by the data feeds, by result (hit or miss)",
+        ["feed", "operation", "result"],
+    )
+)
+ohlc_refreshes = registry.register(
+    Counter(
+        "investmentstk_ohlc_refreshes_total",
+        "OHLC histories served by the data feeds, by mode (stored, incremental or full)",
+        ["feed", "mode"],
+    )
+)
+cpu_stage_duration = registry.register(
+    Histogram("investmentstk_cpu_stage_duration_seconds", "Duration of CPU bound calculations", ["stage"])
+)
+
+# The data feed call running on the current thread, used to label the HTTP requests it makes
+_current_data_feed_call: ContextVar[Optional[tuple[str, str]]] = ContextVar("current_data_feed_call", default=None)
+
+# When set, stage timings are collected here instead of being observed (see `call_collecting_stage_timings`)
+_stage_timings_collector = threading.local()
+
+
+def record_data_feed_metrics(wrapped: Callable) -> Callable:
+    """
+    Decorator for data feed methods. Records the calls, errors and duration labelled by the feed class and the
+    method name. HTTP requests made during the call are also labelled with them (see `record_http_cache_lookup`).
+    """
+
+    @functools.wraps(wrapped)
+    def wrapper(self, *args, **kwargs):
+        labels = dict(feed=self.__class__.__name__, operation=wrapped.__name__)
+        token = _current_data_feed_call.set((labels["feed"], labels["operation"]))
+
+        data_feed_calls.inc(**labels)
+
+        try:
+            with data_feed_duration.time(**labels):
+                return wrapped(self, *args, **kwargs)
+        except Exception as e:
+            data_feed_errors.inc(**labels, error=type(e).__name__)
+            raise
+        finally:
+            _current_data_feed_call.reset(token)
+
+    return wrapper
+
+
+def record_http_cache_lookup(from_cache: bool) -> None:
+    feed, operation = _current_data_feed_call.get() or ("none", "none")
+    http_cache_requests.inc(feed=feed, operation=operation, result="hit" if from_cache else "miss")
+
+
+def timed_stage(stage: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator that observes the duration of a CPU bound stage (like calculating an indicator)
+    """
+
+    def decorator(wrapped: Callable) -> Callable:
+        @functools.wraps(wrapped)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+
+            try:
+                return wrapped(*args, **kwargs)
+            finally:
+                _observe_stage(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def _observe_stage(stage: str, seconds: float) -> None:
+    collector = getattr(_stage_timings_collector, "timings", None)
+
+    if collector is not None:
+        collector.append((stage, seconds))
+    else:
+        cpu_stage_duration.observe(seconds, stage=stage)
+
+
+def call_collecting_stage_timings(function: Callable, *args, **kwargs) -> tuple:
+    """
+    Calls `function` and returns its result together with the stage timings recorded during the call, instead
+    of observing them. Used to bring back the timings of calls executed in another process (the process pool),
+    where the metrics would not be visible to the `/metrics` endpoint.
+    """
+    _stage_timings_collector.timings = []
+
+    try:
+        return function(*args, **kwargs), _stage_timings_collector.timings
+    finally:
+        _stage_timings_collector.timings = None
+
+
+def observe_stage_timings(timings: Sequence[tuple[str, float]]) -> None:
+    for stage, seconds in timings:
+        cpu_stage_duration.observe(seconds, stage=stage)
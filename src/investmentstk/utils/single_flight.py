@@ -0,0 +1,118 @@
+"""
+Single-flight (a.k.a. request coalescing): concurrent calls with the same key share the same in-flight execution
+instead of each one executing it independently.
+
+Inspired by Go's golang.org/x/sync/singleflight.
+"""
+import copy
+import functools
+import threading
+from collections import Counter
+from typing import Any, Callable, Hashable, Optional
+
+from investmentstk.utils.logger import get_logger
+
+logger = get_logger()
+
+
+class _Call:
+    """
+    An in-flight call, waited by the callers that arrive while it's running
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        # A copy of the leader's result, taken before the followers are released (only if there are any): the
+        # leader may modify its result as soon as it's returned
+        self.result: Any = None
+        self.exception: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key.
+
+    The first caller (the leader) executes the function and the callers that arrive while it's still running wait for
+    it and get the same outcome (result or exception). Results are not cached: once the leader is done, the next
+    call executes the function again.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+        # Counts per operation (the first element of the key)
+        self.executed: Counter = Counter()
+        self.coalesced: Counter = Counter()
+
+    def do(self, key: tuple, function: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.executed[key[0]] += 1
+            else:
+                call.followers += 1
+                self.coalesced[key[0]] += 1
+
+        if not is_leader:
+            logger.debug("Waiting for an identical in-flight call", operation=key[0])
+            call.done.wait()
+
+            if call.exception:
+                raise call.exception
+
+            # Each caller gets its own copy, so a caller modifying its result (e.g. adding a column to a
+            # dataframe) does not affect the others
+            return copy.deepcopy(call.result)
+
+        result = None
+
+        try:
+            result = function(*args, **kwargs)
+            return result
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            # No follower can join once the call is removed
+            with self._lock:
+                del self._calls[key]
+
+            # A call without followers returns its result without copying it (e.g. a memory-mapped dataframe)
+            if call.followers and call.exception is None:
+                call.result = copy.deepcopy(result)
+
+            call.done.set()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        :return: per operation, how many calls were executed and how many were coalesced into an in-flight call
+        """
+        with self._lock:
+            return {
+                operation: dict(executed=self.executed[operation], coalesced=self.coalesced[operation])
+                for operation in self.executed.keys() | self.coalesced.keys()
+            }
+
+
+data_feed_single_flight = SingleFlight()
+
+
+def single_flight(wrapped: Callable) -> Callable:
+    """
+    Decorator for data feed methods. Concurrent calls to the same method, on the same feed class and with the same
+    arguments, share a single execution.
+    """
+
+    @functools.wraps(wrapped)
+    def wrapper(self, *args, **kwargs):
+        operation = f"{self.__class__.__name__}.{wrapped.__name__}"
+        key = (operation, args, tuple(sorted(kwargs.items())))
+
+        return data_feed_single_flight.do(key, wrapped, self, *args, **kwargs)
+
+    return wrapper
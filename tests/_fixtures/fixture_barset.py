@@ -1,6 +1,6 @@
 import pytest
 
-from investmentstk.models.barset import barset_from_csv_string
+from investmentstk.models.bar_array import BarArray
 
 
 @pytest.fixture
@@ -52,4 +52,4 @@ def barset_volvo_2_months():
     2021-08-31,198.08,198.38,194.44,195.14
     """
 
-    return barset_from_csv_string(csv_string)
+    return BarArray.from_csv_string(csv_string)
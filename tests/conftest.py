@@ -1 +1,22 @@
+import pytest
+
+from investmentstk.data_feeds.data_feed import ohlc_store
+from investmentstk.models.asset import price_cache
+
 pytest_plugins = ["_fixtures.fixture_barset"]
+
+
+@pytest.fixture(autouse=True)
+def empty_ohlc_store(tmp_path, monkeypatch):
+    """
+    The OHLC history is kept between calls to the data feeds (see `DataFeed._retrieve_ohlc_incrementally()`)
+    """
+    monkeypatch.setattr(ohlc_store, "folder", tmp_path / "ohlc_store")
+
+
+@pytest.fixture(autouse=True)
+def empty_price_cache():
+    """
+    The last prices are kept between calls to `Asset` (see `persistence/price_cache.py`)
+    """
+    price_cache.clear()
@@ -1,8 +1,11 @@
+import pandas as pd
 import pytest
+from pandas.testing import assert_frame_equal
 
 from investmentstk.data_feeds import AvanzaFeed
 from investmentstk.data_feeds.data_feed import TimeResolution
 from investmentstk.models.asset import Asset
+from investmentstk.models.barset import barset_to_ohlc_dataframe
 from investmentstk.models.source import Source
 
 
@@ -47,3 +50,68 @@ def test_retrieve_price(subject, volvo):
     assert 100 <= price.last <= 300
     assert -10 <= price.change <= 10
     assert -10 <= price.change_pct <= 10
+
+
+@pytest.fixture
+def price_chart_ohlc() -> list[dict]:
+    """
+    Bars around the DST change (2021-03-28), in the format returned by the price chart API. Includes a duplicated bar
+    """
+    timestamps = [1616713200000, 1616972400000, 1616972400000, 1617058800000, 1616626800000, 1630620000000]
+
+    return [
+        dict(timestamp=timestamp, open=10 + index, high=12.5 + index, low=9 + index, close=11, totalVolumeTraded=100)
+        for index, timestamp in enumerate(timestamps)
+        if index != 2
+    ] + [dict(timestamp=1616972400000, open=11, high=13.5, low=10, close=11, totalVolumeTraded=100)]
+
+
+def test_ohlc_to_dataframe_same_as_bars(price_chart_ohlc):
+    bars = {AvanzaFeed._ohlc_to_bar(ohlc) for ohlc in price_chart_ohlc}
+
+    dataframe = AvanzaFeed._ohlc_to_dataframe(price_chart_ohlc)
+
+    assert_frame_equal(dataframe, barset_to_ohlc_dataframe(bars))
+    assert [str(time.date()) for time in dataframe.index] == [
+        "2021-03-25",
+        "2021-03-26",
+        "2021-03-29",
+        "2021-03-30",
+        "2021-09-03",
+    ]
+
+
+def test_retrieve_ohlc_derives_week_from_daily(subject, price_chart_ohlc, monkeypatch):
+    requests = []
+
+    def retrieve_price_chart(source_id, *, resolution, instrument_type, time_period=None):
+        requests.append((resolution, time_period))
+        return price_chart_ohlc
+
+    monkeypatch.setattr(subject, "_retrieve_price_chart", retrieve_price_chart)
+
+    subject.retrieve_ohlc("5269", resolution=TimeResolution.day)
+    weekly = subject.retrieve_ohlc("5269", resolution=TimeResolution.week)
+
+    assert requests == [(TimeResolution.day, "five_years")]
+    assert [str(time.date()) for time in weekly.dropna().index] == ["2021-03-22", "2021-03-29", "2021-08-30"]
+
+
+def test_retrieve_ohlc_month_keeps_the_whole_history(subject, monkeypatch):
+    requests = []
+
+    # Month bars since 2000, longer than the 5 years of daily bars
+    timestamps = pd.date_range("2000-01-01", "2021-10-01", freq="MS", tz="Europe/Stockholm").asi8 // 10 ** 6
+    price_chart_ohlc = [dict(timestamp=timestamp, open=10, high=12, low=9, close=11) for timestamp in timestamps]
+
+    def retrieve_price_chart(source_id, *, resolution, instrument_type, time_period=None):
+        requests.append((resolution, time_period))
+        return price_chart_ohlc
+
+    monkeypatch.setattr(subject, "_retrieve_price_chart", retrieve_price_chart)
+
+    monthly = subject.retrieve_ohlc("5269", resolution=TimeResolution.month, min_bars=105)
+
+    assert requests == [(TimeResolution.month, None)]
+    assert len(monthly) == len(timestamps)
+    assert str(monthly.index[0].date()) == "2000-01-01"
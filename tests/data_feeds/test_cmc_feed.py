@@ -1,8 +1,11 @@
+import pandas as pd
 import pytest
+from pandas.testing import assert_frame_equal
 
 from investmentstk.data_feeds import CMCFeed
 from investmentstk.data_feeds.data_feed import TimeResolution
 from investmentstk.models.asset import Asset
+from investmentstk.models.barset import barset_to_ohlc_dataframe
 from investmentstk.models.source import Source
 
 
@@ -60,3 +63,61 @@ def test_retrieve_price(subject, nasdaq):
     assert 10000 <= price.last <= 20000
     assert -1000 <= price.change <= 1000
     assert -10 <= price.change_pct <= 10
+
+
+@pytest.mark.parametrize(
+    "resolution, times, expected_times",
+    [
+        # Bars starting on the evening before (21h during DST, 22h otherwise) belong to the next day
+        (
+            TimeResolution.day,
+            ["2021-03-25T22:00:00+0000", "2021-03-28T21:00:00+0000", "2021-09-02T21:00:00+0000"],
+            ["2021-03-26", "2021-03-29", "2021-09-03"],
+        ),
+        (TimeResolution.day, ["2021-09-03T00:00:00+0000"], ["2021-09-03"]),
+        # Weeks start on Sunday on CMC, but on Monday for us
+        (
+            TimeResolution.week,
+            ["2021-03-20T22:00:00+0000", "2021-08-28T21:00:00+0000", "2021-09-05T00:00:00+0000"],
+            ["2021-03-22", "2021-08-30", "2021-09-06"],
+        ),
+    ],
+)
+def test_normalize_time(resolution, times, expected_times):
+    time = CMCFeed._normalize_time(pd.DatetimeIndex(pd.to_datetime(times, format="%Y-%m-%dT%H:%M:%S%z")), resolution)
+
+    assert list(time) == list(pd.DatetimeIndex(expected_times, tz="UTC"))
+
+
+@pytest.fixture
+def ohlc() -> list[dict]:
+    return [
+        dict(t="2021-09-02T21:00:00+0000", o=15475.1, h=15563.4, l=15454.2, c=15520.3),
+        dict(t="2021-09-01T21:00:00+0000", o=15610, h=15628.8, l=15440.8, c=15475.1),
+        dict(t="2021-10-31T22:00:00+0000", o=15850.5, h=15900.1, l=15800.8, c=15890),
+    ]
+
+
+def test_ohlc_to_dataframe(ohlc):
+    dataframe = CMCFeed._ohlc_to_dataframe(ohlc, TimeResolution.day)
+
+    expected = pd.DataFrame(
+        dict(
+            open=[15610, 15475.1, 15850.5],
+            high=[15628.8, 15563.4, 15900.1],
+            low=[15440.8, 15454.2, 15800.8],
+            close=[15475.1, 15520.3, 15890],
+        ),
+        index=pd.DatetimeIndex(["2021-09-02", "2021-09-03", "2021-11-01"], tz="UTC", name="time"),
+        dtype=float,
+    )
+    assert_frame_equal(dataframe, expected)
+
+
+@pytest.mark.parametrize("resolution", [TimeResolution.day, TimeResolution.week])
+def test_retrieve_bars_same_as_dataframe(subject, ohlc, resolution, monkeypatch):
+    monkeypatch.setattr(subject, "_retrieve_price_rows", lambda source_id, resolution: ohlc)
+
+    bars = subject._retrieve_bars("X-ABFMB", resolution=resolution)
+
+    assert_frame_equal(barset_to_ohlc_dataframe(bars), CMCFeed._ohlc_to_dataframe(ohlc, resolution))
@@ -0,0 +1,295 @@
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from investmentstk.data_feeds.data_feed import DataFeed, TimeResolution, lookback_start, ohlc_store
+from investmentstk.models.bar_array import BarArray
+from investmentstk.models.price import Price
+from investmentstk.utils.single_flight import data_feed_single_flight
+
+
+def daily_ohlc(start: str, closes: list[float]) -> pd.DataFrame:
+    return pd.DataFrame(
+        dict(open=closes, high=closes, low=closes, close=closes),
+        dtype=float,
+        # Without a frequency, like the dataframes from the feeds
+        index=pd.DatetimeIndex(list(pd.date_range(start, periods=len(closes), freq="D")), name="time"),
+    )
+
+
+class IncrementalFeed(DataFeed):
+    """
+    Serves `upstream`, recording whether the whole history or only the most recent bars were requested
+    """
+
+    def __init__(self, upstream: pd.DataFrame):
+        self.upstream = upstream
+        self.requests: list[Optional[pd.Timestamp]] = []
+
+    def _retrieve_bars(
+        self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
+    ) -> BarArray:
+        raise NotImplementedError
+
+    def retrieve_ohlc(
+        self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
+    ) -> pd.DataFrame:
+        return self._retrieve_ohlc_incrementally(
+            source_id, resolution=resolution, retrieve_all=self._retrieve_all, retrieve_since=self._retrieve_since
+        )
+
+    def _retrieve_all(self) -> pd.DataFrame:
+        self.requests.append(None)
+        return self.upstream
+
+    def _retrieve_since(self, since: pd.Timestamp) -> pd.DataFrame:
+        self.requests.append(since)
+
+        # A short window, like the most recent month
+        return self.upstream.tail(3)
+
+    def retrieve_asset_name(self, source_id: str, instrument_type: Optional[str] = None) -> str:
+        raise NotImplementedError
+
+    def retrieve_price(self, source_id: str, instrument_type: Optional[str] = "stock") -> Price:
+        raise NotImplementedError
+
+
+@pytest.fixture
+def subject() -> IncrementalFeed:
+    return IncrementalFeed(daily_ohlc("2021-10-01", [1, 2, 3, 4, 5]))
+
+
+@pytest.fixture
+def without_max_age(monkeypatch):
+    monkeypatch.setenv("OHLC_STORE_MAX_AGE_MINUTES", "0")
+
+
+def test_retrieve_ohlc_stored(subject):
+    subject.retrieve_ohlc("X")
+    subject.upstream = daily_ohlc("2021-10-01", [1, 2, 3, 4, 5.5, 6])
+
+    # Recent enough to not call the source again
+    assert_frame_equal(subject.retrieve_ohlc("X"), daily_ohlc("2021-10-01", [1, 2, 3, 4, 5]))
+    assert subject.requests == [None]
+
+
+@pytest.mark.usefixtures("without_max_age")
+def test_retrieve_ohlc_incrementally(subject):
+    assert_frame_equal(subject.retrieve_ohlc("X"), subject.upstream)
+
+    # The last bar changes (it was still open) and a new one is added
+    subject.upstream = daily_ohlc("2021-10-01", [1, 2, 3, 4, 5.5, 6])
+
+    assert_frame_equal(subject.retrieve_ohlc("X"), subject.upstream)
+    assert subject.requests == [None, pd.Timestamp("2021-10-05")]
+
+    # Kept per source ID
+    subject.retrieve_ohlc("Y")
+    assert subject.requests[-1] is None
+
+
+@pytest.mark.usefixtures("without_max_age")
+def test_retrieve_ohlc_incrementally_without_overlap(subject):
+    subject.retrieve_ohlc("X")
+
+    # Too long since the last call: the most recent bars do not include the last one we have
+    subject.upstream = daily_ohlc("2021-10-01", [1, 2, 3, 4, 5, 6, 7, 8, 9])
+
+    assert_frame_equal(subject.retrieve_ohlc("X"), subject.upstream)
+    assert subject.requests == [None, pd.Timestamp("2021-10-05"), None]
+
+
+@pytest.mark.usefixtures("without_max_age")
+def test_retrieve_ohlc_incrementally_disabled(subject, monkeypatch):
+    monkeypatch.setenv("OHLC_FULL_REFRESH_HOURS", "0")
+
+    subject.retrieve_ohlc("X")
+    subject.retrieve_ohlc("X")
+
+    assert subject.requests == [None, None]
+
+
+@pytest.mark.usefixtures("without_max_age")
+def test_retrieve_ohlc_incrementally_keeps_a_copy(subject):
+    expected = subject.upstream.copy()
+
+    # Callers can modify the dataframes they get (e.g. adding columns) without affecting the history
+    subject.retrieve_ohlc("X")["close"] = 0
+    subject.upstream = expected.copy()
+    subject.retrieve_ohlc("X")["close"] = 0
+
+    assert_frame_equal(subject.retrieve_ohlc("X"), expected)
+
+
+def test_retrieve_ohlc_stored_keeps_a_copy(subject):
+    expected = subject.upstream.copy()
+
+    subject.retrieve_ohlc("X")
+    subject.retrieve_ohlc("X").iloc[0, 0] = 0
+
+    assert_frame_equal(subject.retrieve_ohlc("X"), expected)
+
+
+def test_retrieve_prices(subject, monkeypatch):
+    def retrieve_price(source_id: str) -> Price:
+        if source_id == "unknown":
+            raise RuntimeError("Unknown asset")
+
+        return Price(last=float(source_id), change=0, change_pct=0)
+
+    monkeypatch.setattr(subject, "retrieve_price", retrieve_price)
+
+    prices = subject.retrieve_prices(["1", "unknown", "2", "1"])
+
+    # Assets that failed are left out
+    assert prices == {"1": Price(last=1, change=0, change_pct=0), "2": Price(last=2, change=0, change_pct=0)}
+
+
+class DailyFeed(IncrementalFeed):
+    """
+    Only retrieves daily bars, deriving the other resolutions from them
+    """
+
+    def retrieve_ohlc(
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution = TimeResolution.day,
+        instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
+    ) -> pd.DataFrame:
+        return self._retrieve_ohlc_from_daily(source_id, resolution=resolution, min_bars=min_bars)
+
+    def _retrieve_daily_ohlc_from_source(
+        self, source_id: str, *, instrument_type: Optional[str] = None, since: Optional[pd.Timestamp] = None
+    ) -> pd.DataFrame:
+        return self._retrieve_all() if since is None else self._retrieve_since(since)
+
+
+def test_retrieve_ohlc_from_daily():
+    subject = DailyFeed(daily_ohlc("2021-01-01", [float(close) for close in range(1, 61)]))
+
+    weekly = subject.retrieve_ohlc("1", resolution=TimeResolution.week)
+    monthly = subject.retrieve_ohlc("1", resolution=TimeResolution.month)
+    daily = subject.retrieve_ohlc("1", resolution=TimeResolution.day)
+
+    # A single download, shared by all the resolutions
+    assert subject.requests == [None]
+    assert_frame_equal(daily, subject.upstream)
+    assert list(monthly["close"]) == [31, 59, 60]
+    assert weekly.index[0] == pd.Timestamp("2020-12-28")
+
+
+def test_retrieve_ohlc_min_bars():
+    subject = DailyFeed(daily_ohlc("2021-01-01", [float(close) for close in range(1, 61)]))
+    start = lookback_start(TimeResolution.week, 2)
+
+    subject.retrieve_ohlc("1", resolution=TimeResolution.week, min_bars=2)
+    subject.retrieve_ohlc("1", resolution=TimeResolution.day, min_bars=1)
+
+    # Only the bars needed are retrieved, and the stored history is enough for a shorter lookback
+    assert subject.requests == [start]
+
+    # A longer lookback needs a longer history, which is kept on the next retrievals
+    subject.retrieve_ohlc("1", resolution=TimeResolution.month)
+    subject.retrieve_ohlc("1", resolution=TimeResolution.day, min_bars=1)
+
+    assert subject.requests == [start, None]
+
+
+class BlockingDailyFeed(DailyFeed):
+    """
+    The first download waits for a concurrent call to join it
+    """
+
+    def __init__(self, upstream: pd.DataFrame):
+        super().__init__(upstream)
+        self.downloading = threading.Event()
+
+    def _retrieve_daily_ohlc_from_source(
+        self, source_id: str, *, instrument_type: Optional[str] = None, since: Optional[pd.Timestamp] = None
+    ) -> pd.DataFrame:
+        if not self.requests:
+            self.downloading.set()
+            wait_for_coalesced_call("BlockingDailyFeed._retrieve_stored_daily_ohlc")
+
+        return super()._retrieve_daily_ohlc_from_source(source_id, instrument_type=instrument_type, since=since)
+
+
+def wait_for_coalesced_call(operation: str) -> None:
+    while not data_feed_single_flight.stats().get(operation, {}).get("coalesced"):
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def single_flight_stats(monkeypatch):
+    monkeypatch.setattr(data_feed_single_flight, "coalesced", Counter())
+    monkeypatch.setattr(data_feed_single_flight, "executed", Counter())
+
+
+@pytest.mark.usefixtures("single_flight_stats")
+@pytest.mark.parametrize(
+    "first, second, expected_requests",
+    [
+        [(TimeResolution.month, 3), (TimeResolution.day, 1), ["month"]],
+        # The first download is already running with a shorter lookback
+        [(TimeResolution.day, 1), (TimeResolution.month, 3), ["day", "month"]],
+    ],
+    ids=["longest_first", "shortest_first"],
+)
+def test_retrieve_ohlc_min_bars_concurrently(first, second, expected_requests):
+    subject = BlockingDailyFeed(daily_ohlc("2021-01-01", [float(close) for close in range(1, 61)]))
+    starts = {resolution.value: lookback_start(resolution, bars) for resolution, bars in [first, second]}
+
+    def retrieve(resolution: TimeResolution, bars: int) -> None:
+        subject.retrieve_ohlc("1", resolution=resolution, min_bars=bars)
+
+    leader = threading.Thread(target=retrieve, args=first)
+    leader.start()
+
+    # Joins the call of the leader, once it is downloading
+    subject.downloading.wait()
+    retrieve(*second)
+    leader.join()
+
+    assert subject.requests == [starts[resolution] for resolution in expected_requests]
+
+    # The longest history is the one kept
+    assert ohlc_store.get(("BlockingDailyFeed", "1", TimeResolution.day, None)).start == starts["month"]
+
+
+@pytest.mark.parametrize(
+    "resolution, bars, expected",
+    [
+        [TimeResolution.day, 3, "2021-10-08"],  # Business days
+        [TimeResolution.week, 2, "2021-09-27"],  # Monday
+        [TimeResolution.month, 2, "2021-08-01"],
+    ],
+    ids=["day", "week", "month"],
+)
+def test_lookback_start(resolution, bars, expected):
+    # Wednesday
+    now = datetime(2021, 10, 13, 15, 30)
+
+    assert lookback_start(resolution, bars, now=now) == pd.Timestamp(expected)
+
+
+@pytest.mark.parametrize(
+    "since_days, expected", [[None, "long"], [10, "short"], [40, "medium"], [1000, "long"]], ids=str
+)
+def test_smallest_time_range(since_days, expected):
+    time_ranges = [
+        ("short", pd.DateOffset(months=1)),
+        ("medium", pd.DateOffset(years=1)),
+        ("long", pd.DateOffset(years=2)),
+    ]
+    since = pd.Timestamp(datetime.utcnow()).normalize() - pd.Timedelta(days=since_days) if since_days else None
+
+    assert DataFeed._smallest_time_range(since, time_ranges) == expected
@@ -1,9 +1,13 @@
+from types import SimpleNamespace
+
 import pytest
+from degiro_connector.quotecast.actions.action_get_chart import ActionGetChart
 
 from investmentstk.data_feeds import DegiroFeed
 from investmentstk.data_feeds.data_feed import TimeResolution
 from investmentstk.models.asset import Asset
 from investmentstk.models.source import Source
+from investmentstk.persistence.product_index import ProductIndex
 
 
 @pytest.mark.manual
@@ -44,7 +48,169 @@ class TestDegiroFeed:
 
         assert name == msft.name
 
-    def test__retrieve_vwd_id_from_product_id(self, subject, msft):
-        vwd_id = subject._retrieve_vwd_id_from_product_id(int(msft.source_id))
+    def test__retrieve_vwd_ids_from_product_ids(self, subject, msft):
+        vwd_ids = subject._retrieve_vwd_ids_from_product_ids([int(msft.source_id)])
+
+        assert vwd_ids == {int(msft.source_id): "350015444"}
+
+
+class FakeTradingAPI:
+    def __init__(self, products_info: dict[str, dict]):
+        self.products_info = products_info
+        self.requests: list[list[int]] = []
+        self.connections = 0
+        self.session_expired = False
+
+    def connect(self):
+        self.connections += 1
+        self.session_expired = False
+
+    def get_products_info(self, request, raw):
+        """
+        Unknown products are left out of the response. Like the connector, returns None on errors
+        """
+        self.requests.append(list(request.products))
+
+        if self.session_expired:
+            return None
+
+        product_ids = [str(product_id) for product_id in request.products]
+
+        return dict(
+            data={
+                product_id: self.products_info[product_id]
+                for product_id in product_ids
+                if product_id in self.products_info
+            }
+        )
+
+
+class FakeQuotecastAPI:
+    """
+    Answers with one series per requested series, except for the issue ids in `missing`
+    """
+
+    def __init__(self, missing: tuple[str, ...] = ()):
+        self.missing = missing
+        self.requests: list[list[str]] = []
+
+    def get_chart(self, request, raw):
+        self.requests.append(list(request.series))
+
+        series = [self._serie(serie_id) for serie_id in request.series if serie_id.split(":")[-1] not in self.missing]
+        payload = dict(requestid="1", resolution="P1D", series=series)
+
+        return payload if raw else ActionGetChart.api_to_chart(payload)
+
+    @staticmethod
+    def _serie(serie_id: str) -> dict:
+        issue_id = int(serie_id.split(":")[-1])
+
+        if serie_id.startswith("ohlc:"):
+            data = [
+                [0, issue_id, issue_id + 2, issue_id - 1, issue_id + 1],
+                [1, issue_id + 1, issue_id + 3, issue_id, 5],
+            ]
+            return dict(id=serie_id, type="ohlc", times="2021-10-04/P1D", data=data)
+
+        return dict(id=serie_id, type="object", data=dict(lastPrice=issue_id, absDiff=None, relDiff=0.01))
+
+
+@pytest.fixture
+def trading_api() -> FakeTradingAPI:
+    return FakeTradingAPI(
+        {
+            "332111": dict(id="332111", symbol="MSFT", vwdIdSecondary="350015444", isin="US5949181045"),
+            "331868": dict(id="331868", symbol="AAPL", vwdIdSecondary="350015372", isin="US0378331005"),
+        }
+    )
+
+
+@pytest.fixture
+def quotecast_api() -> FakeQuotecastAPI:
+    return FakeQuotecastAPI(missing=("350015372",))
+
+
+@pytest.fixture
+def offline_subject(trading_api, quotecast_api, tmp_path) -> DegiroFeed:
+    """
+    A feed that does not connect to Degiro (the constructor requires credentials)
+    """
+    feed = object.__new__(DegiroFeed)
+    feed.broker_client = SimpleNamespace(api_client=trading_api)
+    feed.quotecast_api = quotecast_api
+    feed.product_index = ProductIndex("degiro", folder=tmp_path)
+
+    return feed
+
+
+def test_retrieve_products_info_batches_misses(offline_subject, trading_api):
+    offline_subject._retrieve_products_info([332111])
+
+    products_info = offline_subject._retrieve_products_info([332111, 331868, 332111])
+
+    assert products_info == {
+        332111: dict(symbol="MSFT", vwdIdSecondary="350015444"),
+        331868: dict(symbol="AAPL", vwdIdSecondary="350015372"),
+    }
+    assert trading_api.requests == [[332111], [331868]]
+
+
+def test_retrieve_products_info_leaves_unknown_products_out(offline_subject, trading_api):
+    products_info = offline_subject._retrieve_products_info([332111, 1])
+
+    assert list(products_info) == [332111]
+
+    with pytest.raises(RuntimeError):
+        offline_subject.retrieve_asset_name("1")
+
+
+def test_retrieve_products_info_logs_in_again_when_the_session_expired(offline_subject, trading_api):
+    trading_api.session_expired = True
+
+    assert offline_subject.retrieve_asset_name("332111") == "MSFT"
+    assert trading_api.connections == 1
+    assert trading_api.requests == [[332111], [332111]]
+
+
+def test_retrieve_asset_name_uses_product_index(offline_subject, trading_api):
+    assert offline_subject.retrieve_asset_name("332111") == "MSFT"
+    assert offline_subject._retrieve_vwd_ids_from_product_ids([332111]) == {332111: "350015444"}
+
+    assert trading_api.requests == [[332111]]
+
+
+def test_retrieve_prices_single_chart_request(offline_subject, quotecast_api):
+    prices = offline_subject.retrieve_prices(["332111", "331868"])
+
+    # AAPL is not in the response
+    assert list(prices) == ["332111"]
+    assert prices["332111"].last == 350015444
+    assert prices["332111"].change == 0
+    assert prices["332111"].change_pct == 1
+    assert quotecast_api.requests == [["issueid:350015444", "issueid:350015372"]]
+
+    assert offline_subject.retrieve_price("332111") == prices["332111"]
+
+    with pytest.raises(RuntimeError):
+        offline_subject.retrieve_price("331868")
+
+
+def test_retrieve_ohlc(offline_subject, quotecast_api):
+    quotecast_api.missing = ()
+
+    dataframe = offline_subject.retrieve_ohlc("332111")
+
+    assert list(dataframe["close"]) == [350015445, 5]
+    assert quotecast_api.requests == [["ohlc:issueid:350015444"]]
+
+
+def test_retrieve_prices_leaves_unknown_products_out(offline_subject, quotecast_api):
+    prices = offline_subject.retrieve_prices(["332111", "1"])
+
+    assert list(prices) == ["332111"]
+    assert quotecast_api.requests == [["issueid:350015444"]]
 
-        assert vwd_id == "350015444"
+    # Nothing to request when none of the products is known
+    assert offline_subject.retrieve_prices(["1"]) == {}
+    assert len(quotecast_api.requests) == 1
@@ -1,8 +1,11 @@
 import pytest
+from pandas.testing import assert_frame_equal
 
 from investmentstk.data_feeds import KrakenFeed
 from investmentstk.data_feeds.data_feed import TimeResolution
 from investmentstk.models.asset import Asset
+from investmentstk.models.barset import barset_to_ohlc_dataframe
+from investmentstk.models.price import Price
 from investmentstk.models.source import Source
 
 
@@ -45,3 +48,103 @@ def test_retrieve_price(subject, bitcoin):
     assert 30000 <= price.last <= 80000
     assert -2000 <= price.change <= 2000
     assert -10 <= price.change_pct <= 10
+
+
+@pytest.fixture
+def ohlc_rows() -> list[list]:
+    """
+    Daily rows in the format returned by the OHLC API: [time, open, high, low, close, vwap, volume, count]
+    """
+    return [
+        [1633132800, "40552.4", "41456.9", "40135.0", "41085.9", "40827.1", "1480.65", 21000],
+        [1633046400, "37553.8", "41072.4", "37271.1", "40552.4", "39232.7", "3520.18", 35112],
+        [1633219200, "41086.0", "42100.0", "40800.1", "41999", "41470.3", "1291.44", 19822],
+    ]
+
+
+def test_ohlc_to_dataframe_same_as_bars(ohlc_rows):
+    bars = {KrakenFeed._ohlc_to_bar(row) for row in ohlc_rows}
+
+    dataframe = KrakenFeed._ohlc_to_dataframe(ohlc_rows)
+
+    assert_frame_equal(dataframe, barset_to_ohlc_dataframe(bars))
+    assert [str(time) for time in dataframe.index] == [
+        "2021-10-01 00:00:00",
+        "2021-10-02 00:00:00",
+        "2021-10-03 00:00:00",
+    ]
+
+
+def test_retrieve_ohlc_incrementally(subject, ohlc_rows, monkeypatch):
+    monkeypatch.setenv("OHLC_STORE_MAX_AGE_MINUTES", "0")
+    requests = []
+
+    def retrieve_ohlc_rows(source_id, *, resolution, since=0):
+        requests.append(since)
+        return [row for row in ohlc_rows if row[0] > since]
+
+    monkeypatch.setattr(subject, "_retrieve_ohlc_rows", retrieve_ohlc_rows)
+
+    subject.retrieve_ohlc("XXBTZEUR")
+
+    # The last bar (still open) is updated and a new one is added
+    ohlc_rows[2] = [1633219200, "41086.0", "42200.0", "40800.1", "42100", "41470.3", "1391.44", 20822]
+    ohlc_rows.append([1633305600, "42100", "42500.0", "41800.1", "42000", "42170.3", "1291.44", 19822])
+
+    dataframe = subject.retrieve_ohlc("XXBTZEUR")
+
+    assert requests == [0, 1633219199]
+    assert_frame_equal(dataframe, KrakenFeed._ohlc_to_dataframe(ohlc_rows))
+
+
+@pytest.fixture
+def public_api(subject, monkeypatch) -> list[tuple[str, dict]]:
+    """
+    Replaces the public API with two pairs, recording the requests
+    """
+    requests = []
+    asset_pairs = {"XXBTZEUR": {"altname": "XBTEUR"}, "XETHZEUR": {"altname": "ETHEUR"}}
+    tickers = {
+        "XXBTZEUR": {"c": ["41000.0", "0.001"], "o": "40000.0"},
+        "XETHZEUR": {"c": ["2970.0", "0.1"], "o": "3000.0"},
+    }
+
+    def get_public(endpoint: str, params: dict, *, cached: bool = False) -> dict:
+        requests.append((endpoint, params))
+        pairs = params["pair"].split(",")
+        result = {"AssetPairs": asset_pairs, "Ticker": tickers}[endpoint]
+
+        if any(pair not in result and pair not in ["XBTEUR", "ETHEUR"] for pair in pairs):
+            raise RuntimeError("Something went wrong: ['EQuery:Unknown asset pair']")
+
+        return result
+
+    monkeypatch.setattr(subject, "_get_public", get_public)
+
+    return requests
+
+
+def test_retrieve_prices(subject, public_api):
+    prices = subject.retrieve_prices(["XXBTZEUR", "XETHZEUR"])
+
+    assert prices == {
+        "XXBTZEUR": Price(last=41000, change=1000, change_pct=2.5),
+        "XETHZEUR": Price(last=2970, change=-30, change_pct=-1),
+    }
+    assert public_api == [("Ticker", {"pair": "XXBTZEUR,XETHZEUR"})]
+
+
+def test_retrieve_prices_alternative_names(subject, public_api):
+    prices = subject.retrieve_prices(["XBTEUR", "XETHZEUR"])
+
+    assert prices.keys() == {"XBTEUR", "XETHZEUR"}
+    assert prices["XBTEUR"].last == 41000
+    assert [endpoint for endpoint, _ in public_api] == ["Ticker", "AssetPairs"]
+
+
+def test_retrieve_prices_unknown_pair(subject, public_api):
+    prices = subject.retrieve_prices(["XXBTZEUR", "UNKNOWN"])
+
+    # Falls back to one request per pair
+    assert prices.keys() == {"XXBTZEUR"}
+    assert len(public_api) == 3
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from investmentstk.models.bar import Bar
+from investmentstk.models.bar_array import BarArray
+from investmentstk.models.barset import barset_to_ohlc_dataframe
+
+
+def bar_array(days: list[str], closes: list[float], tz=None) -> BarArray:
+    return BarArray(pd.DatetimeIndex(days, tz=tz), closes, closes, closes, closes)
+
+
+def test_from_csv_string():
+    bars = BarArray.from_csv_string(
+        """
+        2021-01-02 00:00:00,11,13,10,12
+        2021-01-01 00:00:00,10,12,9,11
+        """
+    )
+
+    assert list(bars) == [
+        Bar(time="2021-01-01 00:00:00", open=10, close=11, low=9, high=12),
+        Bar(time="2021-01-02 00:00:00", open=11, close=12, low=10, high=13),
+    ]
+
+
+def test_deduplicates_by_time_keeping_the_last():
+    bars = bar_array(["2021-01-02", "2021-01-01", "2021-01-02", "2021-01-03"], [1, 2, 3, 4])
+
+    assert len(bars) == 3
+    assert list(bars.time) == list(pd.DatetimeIndex(["2021-01-01", "2021-01-02", "2021-01-03"]).to_numpy())
+    assert list(bars.close) == [2, 3, 4]
+
+
+def test_from_bars_same_as_set_of_bars():
+    bars = {
+        Bar(time="2021-01-02", open=11, high=13, low=10, close=12),
+        Bar(time="2021-01-01", open=10, high=12, low=9, close=11),
+    }
+
+    assert list(BarArray.from_bars(bars)) == sorted(bars, key=lambda bar: bar.time)
+
+
+def test_mismatched_columns():
+    with pytest.raises(ValueError):
+        BarArray(pd.DatetimeIndex(["2021-01-01", "2021-01-02"]), [1], [1], [1], [1])
+
+
+def test_to_dataframe_does_not_copy():
+    bars = bar_array(["2021-01-01", "2021-01-02"], [1, 2])
+
+    dataframe = bars.to_dataframe()
+
+    assert np.shares_memory(dataframe["close"].to_numpy(), bars.close)
+    assert_frame_equal(
+        dataframe,
+        pd.DataFrame(
+            dict(open=[1.0, 2.0], high=[1.0, 2.0], low=[1.0, 2.0], close=[1.0, 2.0]),
+            index=pd.DatetimeIndex(["2021-01-01", "2021-01-02"], name="time"),
+        ),
+    )
+
+
+def test_immutable():
+    bars = bar_array(["2021-01-01", "2021-01-02"], [1, 2])
+
+    with pytest.raises(ValueError):
+        bars.to_dataframe().iloc[0, 0] = 0
+
+    with pytest.raises(ValueError):
+        bars.close[0] = 0
+
+    # A copy of the dataframe can be modified, as well as the dataframes from `barset_to_ohlc_dataframe()`
+    dataframe = bars.to_dataframe().copy()
+    dataframe.iloc[0, 0] = 0
+    barset_to_ohlc_dataframe(bars).iloc[0, 0] = 0
+
+    assert bars.open[0] == 1
+
+
+def test_dataframe_round_trip_keeps_timezone():
+    dataframe = bar_array(["2021-01-01", "2021-01-02"], [1, 2], tz="Europe/Stockholm").to_dataframe()
+
+    assert_frame_equal(BarArray.from_dataframe(dataframe).to_dataframe(), dataframe)
+    assert list(BarArray.from_dataframe(dataframe))[0].time == pd.Timestamp("2021-01-01", tz="Europe/Stockholm")
+
+
+def test_merge():
+    bars = bar_array(["2021-01-01", "2021-01-03"], [1, 3]).merge(bar_array(["2021-01-02", "2021-01-03"], [2, 4]))
+
+    assert list(bars.close) == [1, 2, 4]
+
+
+def test_append_replaces_the_most_recent_bars():
+    bars = bar_array(["2021-01-01", "2021-01-02", "2021-01-03"], [1, 2, 3]).append(
+        bar_array(["2021-01-02", "2021-01-04"], [5, 6])
+    )
+
+    assert list(bars.close) == [1, 5, 6]
+    assert_frame_equal(
+        barset_to_ohlc_dataframe(bars), bar_array(["2021-01-01", "2021-01-02", "2021-01-04"], [1, 5, 6]).to_dataframe()
+    )
+
+
+def test_combining_different_timezones():
+    with pytest.raises(ValueError):
+        bar_array(["2021-01-01"], [1]).merge(bar_array(["2021-01-02"], [2], tz="UTC"))
@@ -0,0 +1,47 @@
+import threading
+
+from investmentstk import data_feeds
+from investmentstk.models import source as source_module
+from investmentstk.models.source import Source, build_data_feed_from_source
+
+
+def test_build_data_feed_from_source_reuses_instances():
+    avanza_feed = build_data_feed_from_source(Source.Avanza)
+
+    assert build_data_feed_from_source(Source.Avanza) is avanza_feed
+    assert build_data_feed_from_source(Source.Nordnet) is avanza_feed
+    assert build_data_feed_from_source(Source.Kraken) is not avanza_feed
+
+
+def test_slow_feed_does_not_block_other_sources(monkeypatch):
+    building = threading.Event()
+    released = threading.Event()
+
+    class SlowFeed:
+        """
+        Like a feed logging in on construction
+        """
+
+        def __init__(self):
+            building.set()
+            released.wait()
+
+    monkeypatch.setattr(source_module, "_data_feeds", {})
+    monkeypatch.setattr(data_feeds, "KrakenFeed", SlowFeed)
+
+    thread = threading.Thread(target=build_data_feed_from_source, args=(Source.Kraken,))
+    thread.start()
+    building.wait()
+
+    other_thread = threading.Thread(target=build_data_feed_from_source, args=(Source.Avanza,))
+    other_thread.start()
+    other_thread.join(timeout=5)
+    other_finished = not other_thread.is_alive()
+
+    released.set()
+    thread.join()
+    other_thread.join()
+
+    assert other_finished
+
+    assert isinstance(build_data_feed_from_source(Source.Kraken), SlowFeed)
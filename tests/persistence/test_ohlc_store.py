@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from investmentstk.data_feeds.data_feed import TimeResolution
+from investmentstk.persistence.ohlc_store import OhlcStore
+
+
+@pytest.fixture
+def subject(tmp_path) -> OhlcStore:
+    return OhlcStore(tmp_path)
+
+
+@pytest.fixture
+def dataframe() -> pd.DataFrame:
+    close = np.array([1.5, 2.5, 3.5])
+
+    return pd.DataFrame(
+        dict(open=close - 0.5, high=close + 1, low=close - 1, close=close),
+        index=pd.DatetimeIndex(["1965-01-04", "2021-10-01", "2021-10-04"], name="time"),
+    )
+
+
+def test_get_and_set(subject, dataframe):
+    key = ("AvanzaFeed", "5269", TimeResolution.day, "stock")
+
+    assert subject.get(key) is None
+
+    subject.set(key, dataframe, retrieved_at=100)
+    stored = subject.get(key)
+
+    assert_frame_equal(stored.dataframe, dataframe)
+    assert stored.retrieved_at == stored.refreshed_at == 100
+    assert stored.start is None
+    assert subject.get(("AvanzaFeed", "5269", TimeResolution.week, "stock")) is None
+
+
+def test_timezone_aware(subject, dataframe):
+    dataframe.index = dataframe.index.tz_localize("Europe/Stockholm")
+
+    subject.set("key", dataframe, retrieved_at=100, refreshed_at=200)
+    stored = subject.get("key")
+
+    assert_frame_equal(stored.dataframe, dataframe)
+    assert stored.refreshed_at == 200
+
+
+def test_start(subject, dataframe):
+    subject.set("key", dataframe, retrieved_at=100, start=pd.Timestamp("2021-09-01"))
+
+    assert subject.get("key").start == pd.Timestamp("2021-09-01")
+
+
+def test_loaded_dataframes_are_independent(subject, dataframe):
+    subject.set("key", dataframe, retrieved_at=100)
+
+    subject.get("key").dataframe.iloc[0, 0] = 0
+
+    assert_frame_equal(subject.get("key").dataframe, dataframe)
+
+
+def test_clear(subject, dataframe):
+    subject.set("key", dataframe, retrieved_at=100)
+    subject.clear()
+
+    assert subject.get("key") is None
+
+
+def test_metadata_not_matching_the_array(subject, dataframe):
+    subject.set("key", dataframe, retrieved_at=100)
+
+    # Like a concurrent `set()` that replaced the array, but not the metadata yet
+    other = OhlcStore(subject.folder / "other")
+    other.set("key", dataframe.tail(2), retrieved_at=200)
+    other._path("key", ".npy").replace(subject._path("key", ".npy"))
+
+    assert subject.get("key") is None
@@ -0,0 +1,123 @@
+import threading
+
+import pytest
+
+from investmentstk.models.price import Price
+from investmentstk.models.source import Source
+from investmentstk.persistence import price_cache as price_cache_module
+from investmentstk.persistence.price_cache import PriceCache, build_price_cache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(price_cache_module, "time", clock)
+
+    return clock
+
+
+@pytest.fixture
+def subject() -> PriceCache:
+    return PriceCache(default_ttl=10, ttls={Source.Degiro: 0}, max_stale=60)
+
+
+class FakeSource:
+    """
+    Returns a different price on every call, recording the requests
+    """
+
+    def __init__(self):
+        self.requests: list[list[str]] = []
+        self.refreshed = threading.Event()
+
+    def retrieve_prices(self, source_ids: list[str]) -> dict[str, Price]:
+        self.requests.append(source_ids)
+        self.refreshed.set()
+
+        return {
+            source_id: Price(last=len(self.requests), change=0, change_pct=0)
+            for source_id in source_ids
+            if source_id != "unknown"
+        }
+
+
+def test_get_many(subject, clock):
+    source = FakeSource()
+
+    subject.get_many(Source.Avanza, ["1", "2"], source.retrieve_prices)
+    clock.now += 5
+    cached = subject.get_many(Source.Avanza, ["1", "3", "unknown"], source.retrieve_prices)
+
+    # Only the assets not in the cache are retrieved
+    assert source.requests == [["1", "2"], ["3", "unknown"]]
+    assert cached.keys() == {"1", "3"}
+    assert (cached["1"].price.last, cached["1"].age) == (1, 5)
+    assert (cached["3"].price.last, cached["3"].age) == (2, 0)
+
+
+def test_stale_while_revalidate(subject, clock):
+    source = FakeSource()
+
+    subject.get_many(Source.Avanza, ["1"], source.retrieve_prices)
+    source.refreshed.clear()
+    clock.now += 30
+
+    # Served immediately, while being refreshed in the background
+    assert subject.get_many(Source.Avanza, ["1"], source.retrieve_prices)["1"].price.last == 1
+    assert source.refreshed.wait(timeout=5)
+
+    # Once the background refresh is done
+    for _ in range(100):
+        cached = subject.get_many(Source.Avanza, ["1"], source.retrieve_prices)["1"]
+
+        if cached.price.last == 2:
+            break
+
+        threading.Event().wait(0.01)
+
+    assert cached.age == 0
+    assert source.requests == [["1"], ["1"]]
+
+
+def test_too_old(subject, clock):
+    source = FakeSource()
+
+    subject.get_many(Source.Avanza, ["1"], source.retrieve_prices)
+    clock.now += 100
+
+    assert subject.get_many(Source.Avanza, ["1"], source.retrieve_prices)["1"].price.last == 2
+
+
+def test_disabled(subject):
+    source = FakeSource()
+
+    subject.get_many(Source.Degiro, ["1"], source.retrieve_prices)
+    subject.get_many(Source.Degiro, ["1"], source.retrieve_prices)
+
+    assert source.requests == [["1"], ["1"]]
+
+
+def test_get_raises(subject):
+    def retrieve(source_id: str) -> Price:
+        raise RuntimeError("No price returned")
+
+    with pytest.raises(RuntimeError):
+        subject.get(Source.Avanza, "1", retrieve)
+
+
+def test_build_price_cache(monkeypatch):
+    monkeypatch.setenv("PRICE_CACHE_TTL_SECONDS", '{"default": 5, "KR": 0}')
+
+    subject = build_price_cache()
+
+    assert subject.ttl_for(Source.Avanza) == 5
+    assert subject.ttl_for(Source.Kraken) == 0
+    assert subject.ttl_for(Source.Degiro) == 60
@@ -0,0 +1,26 @@
+import pytest
+
+from investmentstk.persistence.product_index import ProductIndex
+
+
+@pytest.fixture
+def subject(tmp_path) -> ProductIndex:
+    return ProductIndex("test", folder=tmp_path)
+
+
+def test_get_and_update(subject):
+    assert subject.get("332111") is None
+
+    subject.update({"332111": {"symbol": "MSFT"}, "331868": {"symbol": "AAPL"}})
+
+    assert subject.get("332111") == {"symbol": "MSFT"}
+    assert subject.get_many(["331868", "1", "332111"]) == {"331868": {"symbol": "AAPL"}, "332111": {"symbol": "MSFT"}}
+
+
+def test_survives_restarts(subject, tmp_path):
+    subject.update({"332111": {"symbol": "MSFT"}})
+
+    restarted = ProductIndex("test", folder=tmp_path)
+
+    assert restarted.get("332111") == {"symbol": "MSFT"}
+    assert ProductIndex("other", folder=tmp_path).get("332111") is None
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from investmentstk.persistence.result_cache import ResultCache
+
+
+@pytest.fixture
+def subject() -> ResultCache:
+    return ResultCache("test", max_bytes=1000)
+
+
+def test_get_and_set(subject):
+    assert subject.get(("a", "b")) is None
+
+    subject.set(("a", "b"), "value")
+
+    assert subject.get(("a", "b")) == "value"
+
+
+def test_evicts_least_recently_used(subject):
+    subject.set("first", "x" * 300)
+    subject.set("second", "y" * 300)
+
+    # Makes "first" the most recently used
+    subject.get("first")
+
+    subject.set("third", "z" * 300)
+
+    assert subject.get("first") is not None
+    assert subject.get("second") is None
+    assert subject.get("third") is not None
+
+
+def test_skips_values_larger_than_the_limit(subject):
+    subject.set("small", "x")
+    subject.set("large", "x" * 2000)
+
+    assert subject.get("small") == "x"
+    assert subject.get("large") is None
+
+
+def test_disk_tier(tmp_path):
+    subject = ResultCache("test", max_bytes=1000, disk_folder=tmp_path)
+    subject.set(("key", 1), "value")
+
+    # A new instance (like after a restart) starts with an empty memory tier
+    restarted = ResultCache("test", max_bytes=1000, disk_folder=tmp_path)
+
+    assert restarted.get(("key", 1)) == "value"
+    assert restarted.get(("key", 2)) is None
+
+
+def test_clear(tmp_path):
+    subject = ResultCache("test", max_bytes=1000, disk_folder=tmp_path)
+    subject.set("key", "value")
+    subject.clear()
+
+    assert subject.get("key") is None
+
+
+def test_disk_tier_deletes_expired_results(tmp_path):
+    subject = ResultCache("test", max_bytes=1000, disk_folder=tmp_path, disk_max_age=60)
+    subject.set("old", "value")
+
+    old_path = subject._disk_path("old")
+    old_time = time.time() - 120
+    os.utime(old_path, (old_time, old_time))
+
+    subject.set("new", "value")
+
+    assert not old_path.exists()
+    assert subject._disk_path("new").exists()
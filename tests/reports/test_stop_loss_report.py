@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from investmentstk.formulas.average_true_range import atr_stop_loss_from_asset, average_true_range_trailing_stop
+from investmentstk.models.asset import Asset
+from investmentstk.models.barset import barset_to_ohlc_dataframe
+from investmentstk.models.source import Source
+from investmentstk.reports.stop_loss_report import BARS_IN_FIGURE, REPORT_LOOKBACK_BARS, format_stop_loss_table
+
+
+def test_format_stop_loss_table(barset_volvo_2_months):
+    dataframe = barset_to_ohlc_dataframe(barset_volvo_2_months)
+    dataframe = average_true_range_trailing_stop(dataframe, periods=3, multiplier=3)
+
+    table = format_stop_loss_table(dataframe)
+    last_rows = table.tail(3)
+
+    # Stops checked in test_average_true_range: 206.97, 205.14, 205.14, 203.05 and then constant
+    assert list(table["stop_change_direction"].tail(12)[1:4]) == ["↘️️", "=️️", "↘️️"]
+    assert list(last_rows["stop_change"]) == ["", "", ""]
+    assert list(last_rows["stop_change_direction"]) == ["=️️", "=️️", "=️️"]
+
+
+def test_stop_in_every_bar_of_the_figure(monkeypatch):
+    def retrieve_ohlc(self, resolution, min_bars=None):
+        # Exactly the bars requested, with the current one not closed yet
+        index = pd.date_range(end=pd.Timestamp.today().normalize(), periods=min_bars, freq="D", name="time")
+        close = 100 + np.sin(np.arange(min_bars)) * 5
+
+        return pd.DataFrame(dict(open=close, high=close + 2, low=close - 2, close=close), index=index)
+
+    monkeypatch.setattr(Asset, "retrieve_ohlc", retrieve_ohlc)
+    monkeypatch.setattr("investmentstk.formulas.average_true_range.is_last_bar_closed", lambda resolution: False)
+
+    dataframe = atr_stop_loss_from_asset(Asset(Source.Avanza, "1"), min_bars=REPORT_LOOKBACK_BARS)
+
+    assert dataframe[-BARS_IN_FIGURE:]["stop"].notna().all()
@@ -0,0 +1,295 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from fastapi.testclient import TestClient
+
+from investmentstk import server
+from investmentstk.brokers.broker import Broker
+from investmentstk.data_feeds.data_feed import DataFeed, TimeResolution
+from investmentstk.models import asset as asset_module
+from investmentstk.models.asset import Asset
+from investmentstk.models.bar_array import BarArray
+from investmentstk.models.broker_balance import BrokerBalance
+from investmentstk.models.price import Price
+from investmentstk.models.stop_loss import StopLoss
+
+HEAVY_MODULES = [
+    "avanza",
+    "degiro_connector",
+    "google.cloud.firestore",
+    "nbconvert",
+    "nbformat",
+    "papermill",
+    "plotly",
+    "scipy",
+]
+
+
+def test_server_does_not_import_heavy_modules():
+    # A new interpreter, as these modules may have been imported by other tests
+    code = f"import sys, investmentstk.server; print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    env = {**os.environ, "CMC_API_KEY": os.environ.get("CMC_API_KEY", "test")}
+
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+    assert result.stdout.split() == []
+
+
+class StubFeed(DataFeed):
+    def __init__(self, calls: Counter):
+        self.calls = calls
+
+    def _retrieve_bars(
+        self, source_id: str, *, resolution: TimeResolution = TimeResolution.day, instrument_type: Optional[str] = None
+    ) -> BarArray:
+        raise NotImplementedError
+
+    def retrieve_ohlc(
+        self,
+        source_id: str,
+        *,
+        resolution: TimeResolution = TimeResolution.day,
+        instrument_type: Optional[str] = None,
+        min_bars: Optional[int] = None,
+    ) -> pd.DataFrame:
+        self.calls[("retrieve_ohlc", source_id, resolution)] += 1
+
+        random = np.random.default_rng(int(source_id))
+        close = 100 + np.cumsum(random.normal(0, 2, 60))
+
+        return pd.DataFrame(
+            dict(open=close, high=close + 1, low=close - 1, close=close),
+            index=pd.date_range("2010-01-01", periods=60, freq="MS" if resolution == TimeResolution.month else "D"),
+        )
+
+    def retrieve_asset_name(self, source_id: str, instrument_type: Optional[str] = None) -> str:
+        return source_id
+
+    def retrieve_price(self, source_id: str, instrument_type: Optional[str] = "stock") -> Price:
+        self.calls[("retrieve_price", source_id)] += 1
+        return Price(last=10, change=1, change_pct=10)
+
+    def retrieve_prices(self, source_ids, **kwargs) -> dict[str, Price]:
+        self.calls[("retrieve_prices", *source_ids)] += 1
+
+        # Source IDs starting with 9 are not found
+        return {source_id: self.retrieve_price(source_id) for source_id in source_ids if not source_id.startswith("9")}
+
+
+@pytest.fixture
+def feed_calls(monkeypatch) -> Counter:
+    calls: Counter = Counter()
+
+    def from_id(fqn_id: str) -> Asset:
+        source, source_id = Asset.parse_fqn_id(fqn_id)
+
+        # Source IDs starting with 8 fail
+        if source_id.startswith("8"):
+            raise requests.exceptions.HTTPError(f"Unknown asset {fqn_id}")
+
+        return Asset(source=source, source_id=source_id, name=f"Asset {source_id}")
+
+    monkeypatch.setattr(Asset, "from_id", from_id)
+    monkeypatch.setattr(asset_module, "build_data_feed_from_source", lambda source: StubFeed(calls))
+    server.correlations_cache.clear()
+
+    return calls
+
+
+class StubBroker(Broker):
+    friendly_name = "Stub"
+
+    def __init__(self, *, skip_cache: bool = False):
+        pass
+
+    def retrieve_balance(self) -> BrokerBalance:
+        return BrokerBalance(balance=100, currency="SEK")
+
+    def retrieve_stop_losses(self) -> list[StopLoss]:
+        return [StopLoss(fqn_id="AV:1", trigger=10, valid_until=date(2021, 10, 29))]
+
+
+class HangingBroker(StubBroker):
+    released = threading.Event()
+
+    def __init__(self, *, skip_cache: bool = False):
+        self.released.wait()
+
+
+class FailingBroker(StubBroker):
+    def __init__(self, *, skip_cache: bool = False):
+        raise ValueError("Login failed")
+
+
+@pytest.fixture
+def brokers(monkeypatch):
+    HangingBroker.released.clear()
+    monkeypatch.setattr(server, "BROKER_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(server, "_brokers", lambda: [HangingBroker, StubBroker, FailingBroker])
+
+    yield
+
+    # Lets the abandoned thread finish
+    HangingBroker.released.set()
+
+
+@pytest.mark.usefixtures("brokers")
+@pytest.mark.parametrize(
+    "endpoint, expected",
+    [
+        ["/balance_brokers", [{"broker": "Stub", "balance": 100, "currency": "SEK"}]],
+        ["/stop_losses_broker", [{"fqn_id": "AV:1", "stop_loss_trigger": 10, "stop_loss_valid_until": "2021-10-29"}]],
+    ],
+    ids=["balance", "stop_losses"],
+)
+def test_brokers_that_hang_or_fail_are_left_out(endpoint, expected):
+    client = TestClient(server.app)
+    start = time.perf_counter()
+
+    response = client.get(endpoint)
+
+    assert response.json() == expected
+    assert time.perf_counter() - start < 2
+
+
+def test_price(feed_calls):
+    client = TestClient(server.app)
+
+    response = client.get("/price/AV:1")
+
+    assert response.json() == {
+        "fqn_id": "AV:1",
+        "name": "Asset 1",
+        "last": 10,
+        "change": 1,
+        "change_pct": 10,
+        "age_seconds": 0,
+    }
+
+
+def test_price_cached(feed_calls):
+    client = TestClient(server.app)
+
+    client.get("/price/AV:1")
+    client.get("/price_bulk", params={"p": "AV:1,AV:2"})
+
+    assert feed_calls[("retrieve_price", "1")] == 1
+    assert feed_calls[("retrieve_prices", "2")] == 1
+
+
+def test_price_bulk(feed_calls):
+    client = TestClient(server.app)
+
+    response = client.get("/price_bulk", params={"p": "AV:1,AV:2"})
+
+    assert [row["fqn_id"] for row in response.json()] == ["AV:1", "AV:2"]
+
+
+def test_price_bulk_one_call_per_source(feed_calls):
+    client = TestClient(server.app)
+
+    response = client.get("/price_bulk", params={"p": "AV:1,KR:2,AV:3,AV:9,AV:1"})
+
+    # Assets without a price are left out
+    assert [row["fqn_id"] for row in response.json()] == ["AV:1", "KR:2", "AV:3", "AV:1"]
+    assert feed_calls[("retrieve_prices", "1", "3", "9")] == 1
+    assert feed_calls[("retrieve_prices", "2")] == 1
+
+
+@pytest.mark.parametrize("failing", ["map_concurrently", "retrieve_prices"])
+def test_price_bulk_failures_resolve_every_future(feed_calls, monkeypatch, failing):
+    def fail(*args, **kwargs):
+        raise RuntimeError("unexpected")
+
+    if failing == "map_concurrently":
+        monkeypatch.setattr(server, "map_concurrently", fail)
+    else:
+        monkeypatch.setattr(Asset, "retrieve_prices", fail)
+
+    futures = server._retrieve_prices_per_source(["AV:1", "KR:2", "AV:3"])
+
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), RuntimeError)
+
+
+def test_correlations_keeps_the_order_of_the_external_assets(feed_calls):
+    client = TestClient(server.app)
+
+    first_output = client.get("/correlations", params={"p": "AV:1,AV:2", "e": "AV:4,AV:3"}).text
+    second_output = client.get("/correlations", params={"p": "AV:2,AV:1", "e": "AV:3,AV:4"}).text
+
+    assert first_output.splitlines()[0].split(";")[-2:] == ["Asset 4", "Asset 3"]
+    assert second_output.splitlines()[0].split(";")[-2:] == ["Asset 3", "Asset 4"]
+
+
+@pytest.mark.parametrize("endpoint", ["/price_bulk", "/stop_loss_atr_bulk"])
+@pytest.mark.parametrize(
+    "params, headers",
+    [[{"stream": "1"}, {}], [{}, {"Accept": "application/x-ndjson"}]],
+    ids=["query", "accept_header"],
+)
+def test_bulk_stream(feed_calls, endpoint, params, headers):
+    client = TestClient(server.app)
+    p = "AV:1,KR:2,AV:8,AV:1"
+
+    listed = client.get(endpoint, params={"p": p}).json()
+    response = client.get(endpoint, params={"p": p, **params}, headers=headers)
+    streamed = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    # The failing asset is left out. Streamed lines are in the order they are completed
+    assert [row["fqn_id"] for row in listed] == ["AV:1", "KR:2", "AV:1"]
+    assert sorted(row["fqn_id"] for row in streamed) == ["AV:1", "AV:1", "KR:2"]
+
+
+def test_batch(feed_calls):
+    client = TestClient(server.app)
+    body = {
+        "assets": ["AV:1", "AV:2", "AV:1"],
+        "computations": ["price", "stop_loss_atr", "stop_loss_atr_series", "correlations"],
+        "external": ["AV:3"],
+    }
+
+    response = client.post("/batch", json=body)
+    output = response.json()
+
+    assert response.status_code == 200
+    assert [row["fqn_id"] for row in output["assets"]] == ["AV:1", "AV:2"]
+    assert output["assets"][0]["price"]["last"] == 10
+    assert output["assets"][0]["stop_loss_atr"] == output["assets"][0]["stop_loss_atr_series"][-1]["stop"]
+    assert output["correlations"].splitlines()[0].split(";")[1:] == ["Asset 1", "Asset 2", "Asset 3"]
+
+    # Each asset (and resolution) is retrieved only once, even if used by more than one computation
+    assert feed_calls == {
+        ("retrieve_price", "1"): 1,
+        ("retrieve_price", "2"): 1,
+        ("retrieve_ohlc", "1", TimeResolution.month): 1,
+        ("retrieve_ohlc", "2", TimeResolution.month): 1,
+        ("retrieve_ohlc", "1", TimeResolution.day): 1,
+        ("retrieve_ohlc", "2", TimeResolution.day): 1,
+        ("retrieve_ohlc", "3", TimeResolution.day): 1,
+    }
+
+
+def test_batch_uses_cached_correlations(feed_calls):
+    client = TestClient(server.app)
+    body = {"assets": ["AV:1", "AV:2"], "computations": ["correlations"]}
+
+    first_output = client.post("/batch", json=body).json()
+    feed_calls.clear()
+    second_output = client.post("/batch", json=body).json()
+
+    assert second_output["correlations"] == first_output["correlations"]
+    assert feed_calls == {}
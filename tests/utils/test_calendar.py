@@ -1,5 +1,8 @@
 import datetime
+
+import pandas as pd
 import pytest
+from pandas.testing import assert_series_equal
 
 from investmentstk.data_feeds.data_feed import TimeResolution
 from investmentstk.utils.calendar import (
@@ -10,6 +13,12 @@ from investmentstk.utils.calendar import (
     round_day,
     is_saturday,
     is_last_bar_closed,
+    last_closed_trading_day,
+    round_day_vectorized,
+    is_saturday_vectorized,
+    is_sunday_vectorized,
+    is_weekend_vectorized,
+    is_end_of_month_vectorized,
 )
 
 
@@ -120,3 +129,49 @@ def test_is_weekend(date, expected):
 )
 def test_is_last_bar_closed(resolution, date, expected):
     assert is_last_bar_closed(resolution, date) == expected
+
+
+@pytest.mark.parametrize(
+    "date, expected",
+    [
+        (datetime.datetime(2021, 11, 23, 10), datetime.date(2021, 11, 22)),  # Tuesday
+        (datetime.datetime(2021, 11, 27, 10), datetime.date(2021, 11, 26)),  # Saturday
+        (datetime.datetime(2021, 11, 28, 10), datetime.date(2021, 11, 26)),  # Sunday
+        (datetime.datetime(2021, 11, 29, 10), datetime.date(2021, 11, 26)),  # Monday
+    ],
+)
+def test_last_closed_trading_day(date, expected):
+    assert last_closed_trading_day(date) == expected
+
+
+@pytest.fixture
+def times() -> pd.DatetimeIndex:
+    """
+    Every 7 hours (so every hour of the day is covered) for a few months, plus a few seconds
+    """
+    return pd.date_range("2021-09-01", "2022-01-31", freq="7H") + pd.Timedelta(seconds=3)
+
+
+@pytest.mark.parametrize(
+    "vectorized, scalar",
+    [
+        (is_saturday_vectorized, is_saturday),
+        (is_sunday_vectorized, is_sunday),
+        (is_weekend_vectorized, is_weekend),
+        (is_end_of_month_vectorized, is_end_of_month),
+    ],
+)
+def test_vectorized_same_as_scalar(times, vectorized, scalar):
+    expected = [scalar(time.to_pydatetime()) for time in times]
+
+    assert list(vectorized(times)) == expected
+    assert list(vectorized(pd.Series(times))) == expected
+
+
+def test_round_day_vectorized(times):
+    expected = [round_day(time.to_pydatetime()) for time in times]
+
+    assert list(round_day_vectorized(times)) == expected
+
+    series = pd.Series(times, name="time")
+    assert_series_equal(round_day_vectorized(series), pd.Series(expected, name="time"))
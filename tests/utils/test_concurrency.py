@@ -0,0 +1,140 @@
+import asyncio
+import operator
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import pytest
+
+from investmentstk.utils.concurrency import (
+    ConcurrencyLimiter,
+    map_concurrently,
+    map_with_timeout,
+    run_in_io_pool,
+    submit_when_done,
+)
+
+
+class TestConcurrencyLimiter:
+    def test_limit_for(self):
+        limiter = ConcurrencyLimiter(default_limit=4, limits={"A": 1})
+
+        assert limiter.limit_for("A") == 1
+        assert limiter.limit_for("B") == 4
+
+
+class TestMapConcurrently:
+    def test_keeps_input_order(self):
+        limiter = ConcurrencyLimiter(default_limit=4)
+
+        def slow_identity(value: int) -> int:
+            time.sleep(0.01 * (5 - value))
+            return value
+
+        futures = map_concurrently(slow_identity, [1, 2, 3, 4], key=lambda value: value % 2, limiter=limiter)
+
+        assert [future.result() for future in futures] == [1, 2, 3, 4]
+
+    def test_respects_limit_per_key(self):
+        limiter = ConcurrencyLimiter(default_limit=3, limits={"A": 1})
+        in_flight = {"A": 0, "B": 0}
+        max_in_flight = {"A": 0, "B": 0}
+        lock = threading.Lock()
+
+        def track(item: str) -> str:
+            with lock:
+                in_flight[item] += 1
+                max_in_flight[item] = max(max_in_flight[item], in_flight[item])
+
+            time.sleep(0.02)
+
+            with lock:
+                in_flight[item] -= 1
+
+            return item
+
+        items = ["A", "B"] * 6
+        futures = map_concurrently(track, items, key=lambda item: item, limiter=limiter)
+
+        assert [future.result() for future in futures] == items
+        assert max_in_flight["A"] == 1
+        assert max_in_flight["B"] > 1
+
+    def test_exceptions_are_raised_on_result(self):
+        limiter = ConcurrencyLimiter(default_limit=2)
+
+        def fail_on_two(value: int) -> int:
+            if value == 2:
+                raise ValueError("two")
+
+            return value
+
+        futures = map_concurrently(fail_on_two, [1, 2, 3], key=lambda value: "key", limiter=limiter)
+
+        assert futures[0].result() == 1
+        assert futures[2].result() == 3
+
+        with pytest.raises(ValueError):
+            futures[1].result()
+
+    def test_empty_input(self):
+        assert map_concurrently(str, [], key=str, limiter=ConcurrencyLimiter(default_limit=1)) == []
+
+
+class TestSubmitWhenDone:
+    def test_pipelines_in_order(self):
+        limiter = ConcurrencyLimiter(default_limit=4)
+        first_stage = map_concurrently(lambda value: (value, 10), [1, 2, 3], key=lambda value: "key", limiter=limiter)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            second_stage = submit_when_done(first_stage, executor, operator.mul)
+
+            assert [future.result() for future in second_stage] == [10, 20, 30]
+
+    def test_propagates_exceptions_from_first_stage(self):
+        limiter = ConcurrencyLimiter(default_limit=4)
+
+        def fail(value: int) -> tuple[int, int]:
+            raise ValueError("first stage")
+
+        first_stage = map_concurrently(fail, [1], key=lambda value: "key", limiter=limiter)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            second_stage = submit_when_done(first_stage, executor, operator.mul)
+
+            with pytest.raises(ValueError):
+                second_stage[0].result()
+
+
+class TestMapWithTimeout:
+    def test_abandons_slow_calls(self):
+        def sleep_and_return(seconds: float) -> float:
+            time.sleep(seconds)
+            return seconds
+
+        start = time.perf_counter()
+        futures = map_with_timeout(sleep_and_return, [0, 0.5, 0.01], timeout=0.1)
+
+        assert time.perf_counter() - start < 0.5
+        assert futures[0].result(timeout=0) == 0
+        assert futures[2].result(timeout=0) == 0.01
+
+        with pytest.raises(FutureTimeoutError):
+            futures[1].result(timeout=0)
+
+
+class TestRunInIOPool:
+    def test_does_not_block_event_loop(self):
+        def blocking_call(value: int, *, delay: float) -> int:
+            time.sleep(delay)
+            return value
+
+        async def gather() -> tuple[list, float]:
+            start = time.perf_counter()
+            results = await asyncio.gather(*[run_in_io_pool(blocking_call, value, delay=0.1) for value in range(10)])
+            return results, time.perf_counter() - start
+
+        results, elapsed = asyncio.run(gather())
+
+        assert results == list(range(10))
+        assert elapsed < 0.5
@@ -2,7 +2,7 @@ import numpy as np
 import pandas as pd
 from pandas.testing import assert_frame_equal
 
-from investmentstk.utils.dataframe import convert_to_pct_change
+from investmentstk.utils.dataframe import append_ohlc, convert_to_pct_change
 
 
 class TestConvertToPctChange:
@@ -15,3 +15,20 @@ class TestConvertToPctChange:
         assert_frame_equal(df, expected)
 
     # TODO: Add a test for dataframes with gaps
+
+
+def test_append_ohlc():
+    history = pd.DataFrame(
+        dict(open=[1.0, 2, 3], high=[1.0, 2, 3], low=[1.0, 2, 3], close=[1.0, 2, 3]),
+        index=pd.DatetimeIndex(["2021-10-01", "2021-10-04", "2021-10-05"], name="time"),
+    )
+    update = pd.DataFrame(
+        dict(open=[3.0, 4], high=[3.5, 4], low=[3.0, 4], close=[3.2, 4]),
+        index=pd.DatetimeIndex(["2021-10-05", "2021-10-06"], name="time"),
+    )
+
+    dataframe = append_ohlc(history, update)
+
+    # The last bar of the history was still open and is replaced
+    assert_frame_equal(dataframe, pd.concat([history.iloc[:2], update]))
+    assert_frame_equal(append_ohlc(history, update.iloc[:0]), history)
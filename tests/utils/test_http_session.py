@@ -0,0 +1,25 @@
+import requests_cache
+
+from investmentstk.persistence.requests_cache import requests_cache_configured
+from investmentstk.utils.http_session import get_http_session
+
+
+def test_reuses_session_per_name():
+    assert get_http_session("TestClient") is get_http_session("TestClient")
+    assert get_http_session("TestClient") is not get_http_session("AnotherTestClient")
+
+
+def test_cached_and_non_cached_share_connection_pool():
+    session = get_http_session("TestClientWithCache")
+    cached_session = get_http_session("TestClientWithCache", cached=True)
+
+    assert not isinstance(session, requests_cache.CachedSession)
+    assert isinstance(cached_session, requests_cache.CachedSession)
+    assert session.get_adapter("https://example.com") is cached_session.get_adapter("https://example.com")
+
+
+def test_non_cached_while_cache_installed():
+    with requests_cache_configured(backend="memory"):
+        session = get_http_session("TestClientCreatedWithCacheInstalled")
+
+    assert not isinstance(session, requests_cache.CachedSession)
@@ -0,0 +1,122 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+from investmentstk.utils.concurrency import StageTimingProcessPoolExecutor
+from investmentstk.utils.dataframe import convert_daily_ohlc_to_weekly
+from investmentstk.utils.metrics import (
+    Counter,
+    Histogram,
+    MetricsRegistry,
+    cpu_stage_duration,
+    data_feed_calls,
+    data_feed_duration,
+    data_feed_errors,
+    record_data_feed_metrics,
+    timed_stage,
+)
+
+
+def test_counter_render():
+    counter = Counter("calls_total", "Calls", ["feed"])
+    counter.inc(feed="A")
+    counter.inc(2, feed="A")
+    counter.inc(feed='B "quoted"')
+
+    assert counter.render() == [
+        "# HELP calls_total Calls",
+        "# TYPE calls_total counter",
+        'calls_total{feed="A"} 3.0',
+        'calls_total{feed="B \\"quoted\\""} 1.0',
+    ]
+
+
+def test_counter_requires_all_labels():
+    counter = Counter("calls_total", "Calls", ["feed", "operation"])
+
+    with pytest.raises(ValueError):
+        counter.inc(feed="A")
+
+
+def test_histogram_render():
+    histogram = Histogram("duration_seconds", "Duration", ["stage"], buckets=[0.1, 1])
+    histogram.observe(0.05, stage="atr")
+    histogram.observe(0.5, stage="atr")
+    histogram.observe(5, stage="atr")
+
+    assert histogram.render()[2:] == [
+        'duration_seconds_bucket{stage="atr",le="0.1"} 1',
+        'duration_seconds_bucket{stage="atr",le="1.0"} 2',
+        'duration_seconds_bucket{stage="atr",le="+Inf"} 3',
+        'duration_seconds_sum{stage="atr"} 5.55',
+        'duration_seconds_count{stage="atr"} 3',
+    ]
+
+
+def test_registry_render():
+    registry = MetricsRegistry()
+    registry.register(Counter("a_total", "A")).inc()
+    registry.register(Counter("b_total", "B"))
+
+    assert (
+        registry.render()
+        == "# HELP a_total A\n# TYPE a_total counter\na_total 1.0\n# HELP b_total B\n# TYPE b_total counter\n"
+    )
+
+    with pytest.raises(ValueError):
+        registry.register(Counter("a_total", "A again"))
+
+
+class MetricsTestFeed:
+    @record_data_feed_metrics
+    def retrieve_price(self, source_id: str) -> float:
+        if source_id == "invalid":
+            raise KeyError(source_id)
+
+        return 1.0
+
+
+def test_record_data_feed_metrics():
+    labels = dict(feed="MetricsTestFeed", operation="retrieve_price")
+    feed = MetricsTestFeed()
+
+    assert feed.retrieve_price("1") == 1.0
+
+    with pytest.raises(KeyError):
+        feed.retrieve_price("invalid")
+
+    assert data_feed_calls.value(**labels) == 2
+    assert data_feed_errors.value(**labels, error="KeyError") == 1
+    assert data_feed_duration.count(**labels) == 2
+
+
+def test_timed_stage():
+    count_before = cpu_stage_duration.count(stage="test")
+
+    @timed_stage("test")
+    def calculate() -> int:
+        return 42
+
+    assert calculate() == 42
+    assert cpu_stage_duration.count(stage="test") == count_before + 1
+
+
+def test_stage_timings_from_process_pool():
+    """
+    Timings recorded on the worker processes are brought back to the main process
+    """
+    dataframe = pd.DataFrame(
+        dict(open=range(14), high=range(14), low=range(14), close=range(14)),
+        index=pd.date_range("2021-09-06", periods=14, freq="D"),
+    )
+    count_before = cpu_stage_duration.count(stage="resampling")
+
+    with StageTimingProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        assert isinstance(executor, ProcessPoolExecutor)
+        weekly = executor.submit(convert_daily_ohlc_to_weekly, dataframe).result()
+
+    assert list(weekly["close"]) == [6, 13]
+    assert cpu_stage_duration.count(stage="resampling") == count_before + 1
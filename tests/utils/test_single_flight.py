@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from investmentstk.utils.single_flight import SingleFlight
+
+
+@pytest.fixture
+def subject() -> SingleFlight:
+    return SingleFlight()
+
+
+def run_concurrently(function, count: int) -> list:
+    results = [None] * count
+
+    def target(index: int) -> None:
+        try:
+            results[index] = function()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=target, args=(index,)) for index in range(count)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+def test_coalesces_concurrent_calls(subject):
+    executions = []
+
+    def slow_fetch() -> list:
+        executions.append(1)
+        time.sleep(0.1)
+        return ["data"]
+
+    results = run_concurrently(lambda: subject.do(("fetch", "A"), slow_fetch), 5)
+
+    assert results == [["data"]] * 5
+    assert len(executions) == 1
+    assert subject.stats() == {"fetch": dict(executed=1, coalesced=4)}
+
+
+def test_results_are_copies(subject):
+    results = run_concurrently(lambda: subject.do(("fetch", "A"), lambda: time.sleep(0.1) or ["data"]), 2)
+
+    results[0].append("modified")
+
+    assert results[1] == ["data"]
+
+
+def test_result_not_copied_without_followers(subject):
+    result = ["data"]
+
+    assert subject.do(("fetch", "A"), lambda: result) is result
+
+
+def test_leader_modifying_its_result_does_not_affect_the_followers(subject):
+    follower_result = []
+
+    def fetch() -> list:
+        # Waits for the follower to join
+        while not subject.stats()["fetch"]["coalesced"]:
+            time.sleep(0.01)
+
+        return ["data"]
+
+    def follow() -> None:
+        while not subject.stats():
+            time.sleep(0.01)
+
+        follower_result.append(subject.do(("fetch", "A"), fetch))
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+
+    leader_result = subject.do(("fetch", "A"), fetch)
+    leader_result.append("modified")
+    follower.join()
+
+    assert follower_result == [["data"]]
+
+
+def test_different_keys_are_not_coalesced(subject):
+    run_concurrently(lambda: subject.do(("fetch", threading.get_ident()), lambda: time.sleep(0.05)), 3)
+
+    assert subject.stats() == {"fetch": dict(executed=3, coalesced=0)}
+
+
+def test_exceptions_are_shared(subject):
+    def failing_fetch() -> None:
+        time.sleep(0.1)
+        raise ValueError("upstream error")
+
+    results = run_concurrently(lambda: subject.do(("fetch", "A"), failing_fetch), 3)
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_sequential_calls_are_executed_again(subject):
+    subject.do(("fetch", "A"), lambda: 1)
+    subject.do(("fetch", "A"), lambda: 1)
+
+    assert subject.stats() == {"fetch": dict(executed=2, coalesced=0)}